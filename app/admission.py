@@ -0,0 +1,331 @@
+import os
+import time
+import hashlib
+import ipaddress
+import logging
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+from .metrics import ADMISSION_CHECK_SECONDS, ADMISSION_REJECTIONS
+from .state import CSAT_STATE_DIR, open_private
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Rate-limit and de-duplicate /api/submit before it does any database or storage work
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+# Token buckets and recent submissions, shared by every gunicorn worker on the
+# host. Keyed by IP and email, so it is private to the app's user (see app/state.py).
+ADMISSION_STORE = os.getenv("ADMISSION_STORE", os.path.join(CSAT_STATE_DIR, "admission.db"))
+# Token buckets: sustained submissions per minute, and how many may come at once.
+# An office behind one NAT address shares the per-IP bucket; 0 disables it.
+ADMISSION_IP_PER_MINUTE = float(os.getenv("ADMISSION_IP_PER_MINUTE", "30"))
+ADMISSION_IP_BURST = int(os.getenv("ADMISSION_IP_BURST", "20"))
+ADMISSION_EMAIL_PER_MINUTE = float(os.getenv("ADMISSION_EMAIL_PER_MINUTE", "2"))
+ADMISSION_EMAIL_BURST = int(os.getenv("ADMISSION_EMAIL_BURST", "5"))
+# The same submission (email, name, rating, description, screenshot name and
+# size) again within this many seconds is a double submit; 0 disables it
+ADMISSION_DUPLICATE_SECONDS = float(os.getenv("ADMISSION_DUPLICATE_SECONDS", "600"))
+# How long an Idempotency-Key header is remembered
+ADMISSION_IDEMPOTENCY_SECONDS = float(os.getenv("ADMISSION_IDEMPOTENCY_SECONDS", "86400"))
+# Longest wait for another worker's transaction on the store; past it the
+# submission is let through (the limiter must never take submissions down)
+ADMISSION_STORE_TIMEOUT_MS = float(os.getenv("ADMISSION_STORE_TIMEOUT_MS", "250"))
+
+# Networks of the reverse proxies in front of the app, comma separated
+# (e.g. 10.0.0.0/8). X-Forwarded-For is only read on connections from them,
+# and the client is the rightmost address in it that is not one of them:
+# everything to its left was written by the client and can be anything.
+# Not needed behind the bundled nginx.conf, where uvicorn already resolves
+# it for connections from 127.0.0.1.
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in os.getenv("TRUSTED_PROXIES", "").split(",") if network.strip()
+]
+
+# Expired rows are deleted from the store once every this many checks
+PRUNE_EVERY = 1000
+# Past this many keys the in-memory maps drop their expired entries
+LOCAL_MAX_KEYS = 50000
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) "
+    "WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS claim (key TEXT PRIMARY KEY, expires REAL NOT NULL) WITHOUT ROWID",
+)
+
+
+def content_key(email: str, name: str, rating: float, description: str = None,
+                screenshot_name: str = None, screenshot_size: int = None) -> str:
+    """sha256 of what makes two submissions the same."""
+    parts = (email.strip().lower(), name.strip(), repr(float(rating)), description or "",
+             screenshot_name or "", str(screenshot_size or ""))
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+def _trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request) -> str:
+    """The submitting client's address, taking X-Forwarded-For only from TRUSTED_PROXIES."""
+    host = request.client.host if request.client else "127.0.0.1"
+    if not _trusted_proxy(host):
+        return host
+    hops = [hop.strip() for value in request.headers.getlist("x-forwarded-for") for hop in value.split(",")]
+    for hop in reversed(hops):
+        if not hop:
+            continue
+        if not _trusted_proxy(hop):
+            return hop
+        host = hop
+    return host
+
+
+class Ticket:
+    """The keys one submission is checked against, and the outcome."""
+
+    __slots__ = ("buckets", "claims", "reason", "retry_after", "path")
+
+    def __init__(self, buckets: list, claims: list):
+        self.buckets = buckets  # (key, tokens per second, burst)
+        self.claims = claims  # (key, seconds to remember it, reason if it is seen again)
+        self.reason = None
+        self.retry_after = 0.0
+        self.path = None
+
+    @property
+    def admitted(self) -> bool:
+        return self.reason is None
+
+    @property
+    def duplicate(self) -> bool:
+        return self.reason in ("duplicate", "idempotency_key")
+
+    def reject(self, reason: str, path: str, retry_after: float = 0.0):
+        self.reason = reason
+        self.path = path
+        self.retry_after = retry_after
+
+
+class AdmissionControl:
+    """Per-IP and per-email token buckets plus duplicate suppression, shared through a SQLite file.
+
+    Every check that gets past memory is one short BEGIN IMMEDIATE transaction
+    on the store, so workers never over-admit. Each worker also remembers the
+    claims it recorded itself, and when a bucket it saw empty can next have a
+    token. Tokens are only ever taken, and a claim is only released by the
+    worker that recorded it, so rejecting on either without asking the store
+    is exact. Claims recorded by other workers are always checked in the store.
+    """
+
+    def __init__(self, path: str = ADMISSION_STORE,
+                 ip_per_minute: float = ADMISSION_IP_PER_MINUTE, ip_burst: int = ADMISSION_IP_BURST,
+                 email_per_minute: float = ADMISSION_EMAIL_PER_MINUTE, email_burst: int = ADMISSION_EMAIL_BURST,
+                 duplicate_seconds: float = ADMISSION_DUPLICATE_SECONDS,
+                 idempotency_seconds: float = ADMISSION_IDEMPOTENCY_SECONDS,
+                 timeout_ms: float = ADMISSION_STORE_TIMEOUT_MS):
+        self.path = path
+        self.limits = {
+            "ip": (ip_per_minute / 60, ip_burst),
+            "email": (email_per_minute / 60, email_burst),
+        }
+        self.duplicate_seconds = duplicate_seconds
+        self.idempotency_seconds = idempotency_seconds
+        self.timeout = timeout_ms / 1000
+        self._conn = None
+        self._pid = None
+        # The store lock is held across SQLite calls; the memory lock only
+        # around the maps and counters, so check_memory never waits on I/O
+        self._store_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._empty_until = {}
+        self._claimed_until = {}
+
+        self.checks = 0
+        self.admitted = 0
+        self.rejected = {}
+        self.memory_rejections = 0
+        self.store_errors = 0
+
+    def ticket(self, ip: str, email: str, content: str = None, idempotency_key: str = None) -> Ticket:
+        buckets = []
+        for kind, value in (("ip", ip), ("email", email.strip().lower())):
+            rate, burst = self.limits[kind]
+            if rate > 0:
+                buckets.append((f"{kind}:{value}", rate, burst))
+        claims = []
+        if content and self.duplicate_seconds > 0:
+            claims.append((f"content:{content}", self.duplicate_seconds, "duplicate"))
+        if idempotency_key:
+            digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+            claims.append((f"idempotency:{digest}", self.idempotency_seconds, "idempotency_key"))
+        return Ticket(buckets, claims)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily and per process: a connection must not cross a fork
+        if self._conn is None or self._pid != os.getpid():
+            # Created 0600 up front; SQLite gives its -wal and -shm files the same mode
+            os.close(open_private(self.path, os.O_RDWR))
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            # Losing this state in a crash only resets the limits
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _count(self, ticket: Ticket):
+        self.rejected[ticket.reason] = self.rejected.get(ticket.reason, 0) + 1
+        ADMISSION_REJECTIONS.labels(ticket.reason, ticket.path).inc()
+
+    def check_memory(self, ticket: Ticket) -> bool:
+        """Reject from what this worker already knows; True when rejected. Cheap enough for the event loop."""
+        started = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            self.checks += 1
+            for key, _, reason in ticket.claims:
+                if self._claimed_until.get(key, 0) > now:
+                    ticket.reject(reason, "memory")
+                    break
+            else:
+                for key, _, _ in ticket.buckets:
+                    until = self._empty_until.get(key, 0)
+                    if until > now:
+                        ticket.reject(f"{key.split(':', 1)[0]}_rate", "memory", until - now)
+                        break
+            if ticket.reason:
+                self.memory_rejections += 1
+                self._count(ticket)
+        ADMISSION_CHECK_SECONDS.labels("memory").observe(time.perf_counter() - started)
+        return not ticket.admitted
+
+    def check_store(self, ticket: Ticket) -> Ticket:
+        """Take a token from every bucket and record the claims, or reject, in one transaction."""
+        started = time.perf_counter()
+        now = time.time()
+        empty, claimed = {}, {}
+        with self._store_lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._take(conn, ticket, now, empty, claimed)
+                except BaseException:
+                    self._rollback()
+                    raise
+                conn.execute("COMMIT")
+            except (sqlite3.Error, OSError) as e:
+                logger.error("Admission store unavailable, letting the submission through: %s", e)
+                ticket.reject(None, None)
+                empty, claimed = {}, {}
+                with self._lock:
+                    self.store_errors += 1
+            prune = self.checks % PRUNE_EVERY == 0
+            if prune:
+                self._prune_store(now)
+
+        with self._lock:
+            self._empty_until.update(empty)
+            self._claimed_until.update(claimed)
+            if ticket.admitted:
+                self.admitted += 1
+            else:
+                self._count(ticket)
+            if prune:
+                self._prune_memory(now)
+        ADMISSION_CHECK_SECONDS.labels("store").observe(time.perf_counter() - started)
+        return ticket
+
+    def _take(self, conn: sqlite3.Connection, ticket: Ticket, now: float, empty: dict, claimed: dict):
+        for key, _, reason in ticket.claims:
+            row = conn.execute("SELECT expires FROM claim WHERE key = ?", (key,)).fetchone()
+            if row and row[0] > now:
+                # Not remembered: the worker that recorded it may still release it
+                ticket.reject(reason, "store")
+                return
+        remaining = []
+        for key, rate, burst in ticket.buckets:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+            if tokens < 1:
+                empty[key] = now + (1 - tokens) / rate
+                ticket.reject(f"{key.split(':', 1)[0]}_rate", "store", (1 - tokens) / rate)
+                return
+            remaining.append((key, tokens - 1, rate))
+        # Only an admitted submission takes tokens, so a flood from one IP
+        # does not also use up the email buckets it names
+        for key, tokens, rate in remaining:
+            conn.execute("INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            if tokens < 1:
+                empty[key] = now + (1 - tokens) / rate
+        for key, ttl, _ in ticket.claims:
+            conn.execute("INSERT OR REPLACE INTO claim (key, expires) VALUES (?, ?)", (key, now + ttl))
+            claimed[key] = now + ttl
+
+    def _rollback(self):
+        try:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            # Start over on a fresh connection rather than inside a stuck transaction
+            self._conn.close()
+            self._conn = None
+
+    def check(self, ticket: Ticket) -> Ticket:
+        if not self.check_memory(ticket):
+            self.check_store(ticket)
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Forget the claims of an admitted submission that was not stored, so a retry is not taken for a duplicate."""
+        if not ticket.admitted or not ticket.claims:
+            return
+        keys = [(key,) for key, _, _ in ticket.claims]
+        with self._lock:
+            for (key,) in keys:
+                self._claimed_until.pop(key, None)
+        with self._store_lock:
+            try:
+                self._connect().executemany("DELETE FROM claim WHERE key = ?", keys)
+            except (sqlite3.Error, OSError) as e:
+                logger.error("Failed to release admission claims: %s", e)
+                with self._lock:
+                    self.store_errors += 1
+
+    def _prune_store(self, now: float):
+        # A bucket untouched for long enough to refill is the same as no row
+        refill = max((burst / rate for rate, burst in self.limits.values() if rate > 0), default=0)
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM claim WHERE expires <= ?", (now,))
+            conn.execute("DELETE FROM bucket WHERE updated < ?", (now - refill,))
+        except (sqlite3.Error, OSError) as e:
+            logger.error("Failed to prune the admission store: %s", e)
+
+    def _prune_memory(self, now: float):
+        for local in (self._empty_until, self._claimed_until):
+            if len(local) > LOCAL_MAX_KEYS:
+                for key in [key for key, until in local.items() if until <= now]:
+                    del local[key]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ADMISSION_CONTROL,
+            "checks": self.checks,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "memory_rejections": self.memory_rejections,
+            "store_errors": self.store_errors,
+        }
+
+
+admission_control = AdmissionControl()
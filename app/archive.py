@@ -0,0 +1,336 @@
+import os
+import re
+import uuid
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import Session
+
+from .models import Feedback, ArchiveSegment, ArchivedRater, as_naive_utc, utc_now
+from .exporter import EXPORT_CHUNK_SIZE, EXPORT_COLUMNS, EXPORT_FORMATS, iter_chunks, parquet_schema, parquet_table
+from .storage import S3Client
+from . import rollups
+
+load_dotenv()
+
+# scripts/archive_feedback.py moves rows older than this out of feedback
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "730"))
+# Rows per segment file, and per Parquet row group: the unit that is read
+# back, and skipped whole when its min/max statistics rule it out
+ARCHIVE_SEGMENT_ROWS = int(os.getenv("ARCHIVE_SEGMENT_ROWS", "250000"))
+ARCHIVE_ROW_GROUP_ROWS = int(os.getenv("ARCHIVE_ROW_GROUP_ROWS", "50000"))
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+# Key prefix of segment files, in the bucket or under LOCAL_STORAGE_PATH
+ARCHIVE_PREFIX = "archive"
+# Local copies of segments stored in S3, fetched on first read; segments
+# never change, so a copy never goes stale
+ARCHIVE_CACHE_PATH = os.getenv(
+    "ARCHIVE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "csat-archive-cache")
+)
+ARCHIVED_RATER_BATCH = 500
+
+
+class ArchiveError(RuntimeError):
+    pass
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ArchiveError("The feedback archive requires the pyarrow package")
+    return pa, pc, pq
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SegmentWriter:
+    """Writes rows (in id order) to one Parquet file and summarizes them as it goes."""
+
+    def __init__(self, path: str):
+        self.pa, _, pq = _pyarrow()
+        self.schema = parquet_schema(self.pa)
+        self.writer = pq.ParquetWriter(path, self.schema, compression=ARCHIVE_COMPRESSION)
+        self.pending = []
+        self.delta = rollups.RollupDelta()
+        self.emails = set()
+        self.first_id = self.last_id = None
+        self.first_created_at = self.last_created_at = None
+
+    @property
+    def count(self) -> int:
+        return self.delta.count
+
+    def add(self, rows):
+        for row in rows:
+            self.delta.add(row.rating)
+            self.emails.add(row.email)
+            if self.first_created_at is None or row.created_at < self.first_created_at:
+                self.first_created_at = row.created_at
+            if self.last_created_at is None or row.created_at > self.last_created_at:
+                self.last_created_at = row.created_at
+        if self.first_id is None:
+            self.first_id = rows[0].id
+        self.last_id = rows[-1].id
+        self.pending.extend(rows)
+        if len(self.pending) >= ARCHIVE_ROW_GROUP_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.writer.write_table(parquet_table(self.pa, self.schema, self.pending))
+            self.pending = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+def _add_raters(db: Session, emails: set):
+    emails = sorted(emails)
+    for i in range(0, len(emails), ARCHIVED_RATER_BATCH):
+        batch = emails[i:i + ARCHIVED_RATER_BATCH]
+        known = set(db.execute(select(ArchivedRater.email).where(ArchivedRater.email.in_(batch))).scalars())
+        missing = [{"email": email} for email in batch if email not in known]
+        if missing:
+            db.execute(insert(ArchivedRater), missing)
+
+
+def _archive_segment(db: Session, before: datetime, segment_rows: int):
+    workdir = tempfile.mkdtemp(prefix="csat-archive-")
+    try:
+        path = os.path.join(workdir, "segment.parquet")
+        writer = SegmentWriter(path)
+        conditions = [Feedback.created_at < before]
+        for rows in iter_chunks(db, conditions, min(EXPORT_CHUNK_SIZE, segment_rows)):
+            writer.add(rows[:segment_rows - writer.count])
+            if writer.count >= segment_rows:
+                break
+        writer.close()
+        if not writer.count:
+            return None
+
+        key = f"{ARCHIVE_PREFIX}/feedback-{writer.first_id:012d}-{writer.last_id:012d}.parquet"
+        size = os.path.getsize(path)
+        storage = S3Client(max_bytes=size)
+        with open(path, "rb") as f:
+            location = storage.upload_fileobj(f, key, EXPORT_FORMATS["parquet"][0])
+        if not location:
+            raise ArchiveError(f"Could not store archive segment {key}")
+
+        # The file is in place before any row is deleted; if this transaction
+        # fails it is removed again, so the rows are always in exactly one place
+        try:
+            values = {
+                "location": location,
+                "sha256": _sha256(path),
+                "bytes": size,
+                "first_id": writer.first_id,
+                "last_id": writer.last_id,
+                "first_created_at": writer.first_created_at,
+                "last_created_at": writer.last_created_at,
+                "archived_at": utc_now(),
+            }
+            values.update(writer.delta.values())
+            segment_id = db.execute(insert(ArchiveSegment).values(**values)).inserted_primary_key[0]
+            _add_raters(db, writer.emails)
+            deleted = db.execute(
+                delete(Feedback).where(Feedback.id >= writer.first_id, Feedback.id <= writer.last_id, *conditions),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+            if deleted != writer.count:
+                raise ArchiveError(
+                    f"Archived {writer.count} rows with ids {writer.first_id}-{writer.last_id}, "
+                    f"but {deleted} matched the delete"
+                )
+            db.commit()
+        except BaseException:
+            db.rollback()
+            storage.delete(location)
+            raise
+        return db.get(ArchiveSegment, segment_id)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def archive_before(db: Session, before: datetime, segment_rows: int = ARCHIVE_SEGMENT_ROWS, log=print) -> list:
+    """Move every feedback row created before `before` into new segments.
+
+    Each segment is committed on its own (file stored, catalog row added,
+    rows deleted), so an interrupted run keeps what it finished. Rollups
+    and rater sketches are left as they are: they still count the moved
+    rows. Returns the new ArchiveSegment rows.
+    """
+    _pyarrow()
+    before = as_naive_utc(before)
+    written = []
+    while True:
+        segment = _archive_segment(db, before, segment_rows)
+        if segment is None:
+            return written
+        written.append(segment)
+        log(f"  {segment.location}: {segment.count} rows, ids {segment.first_id}-{segment.last_id}, "
+            f"{segment.bytes / 1e6:.1f} MB")
+
+
+def segments_statement(start: datetime = None, end: datetime = None):
+    """Segments holding rows created in [start, end), in id order."""
+    stmt = select(ArchiveSegment).order_by(ArchiveSegment.first_id)
+    if start is not None:
+        stmt = stmt.where(ArchiveSegment.last_created_at >= as_naive_utc(start))
+    if end is not None:
+        stmt = stmt.where(ArchiveSegment.first_created_at < as_naive_utc(end))
+    return stmt
+
+
+def segments(db: Session, start: datetime = None, end: datetime = None) -> list:
+    return db.execute(segments_statement(start, end)).scalars().all()
+
+
+def totals_statement():
+    """Row count, rating sum and histogram over every segment, from the catalog alone."""
+    columns = [
+        func.count(ArchiveSegment.id).label("segments"),
+        func.coalesce(func.sum(ArchiveSegment.count), 0).label("count"),
+        func.coalesce(func.sum(ArchiveSegment.rating_sum), 0.0).label("rating_sum"),
+        func.coalesce(func.sum(ArchiveSegment.bytes), 0).label("bytes"),
+    ]
+    for field in rollups.HIST_FIELDS:
+        columns.append(func.coalesce(func.sum(getattr(ArchiveSegment, field)), 0).label(field))
+    return select(*columns)
+
+
+def local_copy(segment: ArchiveSegment) -> str:
+    """Path of a readable copy of the segment file, downloaded once if it is in S3."""
+    if os.path.exists(segment.location):
+        return segment.location
+    path = os.path.join(ARCHIVE_CACHE_PATH, f"{segment.sha256}.parquet")
+    if os.path.exists(path):
+        return path
+    os.makedirs(ARCHIVE_CACHE_PATH, exist_ok=True)
+    partial = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        with open(partial, "wb") as f:
+            S3Client().download_fileobj(segment.location, f)
+        if _sha256(partial) != segment.sha256:
+            raise ArchiveError(f"Archive segment {segment.location} does not match its checksum")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return path
+
+
+def _term_pattern(term: str) -> str:
+    # Word prefix, like the search index's "term"*; RE2's \b is ASCII-only
+    return f"(?i)(?:^|[^\\pL\\pN_]){re.escape(term)}"
+
+
+def _may_match(metadata, names: dict, start, end, min_rating, max_rating, before_id) -> bool:
+    """False when a row group's min/max statistics rule out every row in it."""
+    def bounds(name):
+        stats = metadata.column(names[name]).statistics
+        if stats is None or not stats.has_min_max:
+            return None, None
+        return stats.min, stats.max
+
+    low, high = bounds("created_at")
+    if low is not None and ((start is not None and high < start) or (end is not None and low >= end)):
+        return False
+    low, high = bounds("rating")
+    if low is not None and ((min_rating is not None and high < min_rating)
+                            or (max_rating is not None and low > max_rating)):
+        return False
+    low, _ = bounds("id")
+    if low is not None and before_id is not None and low >= before_id:
+        return False
+    return True
+
+
+def scan_segment(segment: ArchiveSegment, columns: list, start: datetime = None, end: datetime = None,
+                 min_rating: float = None, max_rating: float = None, before_id: int = None,
+                 terms: list = None, newest_first: bool = False):
+    """Rows of one segment as pyarrow Tables (one per row group), filtered like the live queries.
+
+    Same filters as exporter.filter_conditions, plus id < before_id and,
+    with terms, descriptions containing every term as a word prefix.
+    Tables come in id order, or highest id first with newest_first.
+    """
+    pa, pc, pq = _pyarrow()
+    start, end = as_naive_utc(start), as_naive_utc(end)
+    parquet = pq.ParquetFile(local_copy(segment))
+    names = {name: i for i, name in enumerate(parquet.schema_arrow.names)}
+    needed = list(dict.fromkeys(list(columns) + ["id", "created_at", "rating"] + (["description"] if terms else [])))
+    groups = range(parquet.num_row_groups)
+    for i in (reversed(groups) if newest_first else groups):
+        if not _may_match(parquet.metadata.row_group(i), names, start, end, min_rating, max_rating, before_id):
+            continue
+        table = parquet.read_row_group(i, columns=needed)
+        masks = []
+        if start is not None:
+            masks.append(pc.greater_equal(table["created_at"], pa.scalar(start, pa.timestamp("us"))))
+        if end is not None:
+            masks.append(pc.less(table["created_at"], pa.scalar(end, pa.timestamp("us"))))
+        if min_rating is not None:
+            masks.append(pc.greater_equal(table["rating"], min_rating))
+        if max_rating is not None:
+            masks.append(pc.less_equal(table["rating"], max_rating))
+        if before_id is not None:
+            masks.append(pc.less(table["id"], before_id))
+        for term in terms or []:
+            masks.append(pc.fill_null(pc.match_substring_regex(table["description"], _term_pattern(term)), False))
+        if masks:
+            mask = masks[0]
+            for other in masks[1:]:
+                mask = pc.and_(mask, other)
+            table = table.filter(mask)
+        if newest_first:
+            table = table.sort_by([("id", "descending")])
+        if table.num_rows:
+            yield table.select(columns)
+
+
+def scan(db: Session, columns: list, start: datetime = None, end: datetime = None, **filters):
+    """scan_segment over every segment that may hold rows created in [start, end), in id order."""
+    for segment in segments(db, start, end):
+        yield from scan_segment(segment, columns, start=start, end=end, **filters)
+
+
+def day_batches(db: Session, column: str, days=None):
+    """Lists of (day, value) for archived rows, on the given days or all of them."""
+    start = end = None
+    if days is not None:
+        days = set(days)
+        if not days:
+            return
+        start = datetime.combine(min(days), datetime.min.time())
+        end = datetime.combine(max(days) + timedelta(days=1), datetime.min.time())
+    for table in scan(db, ["created_at", column], start, end):
+        pairs = zip((created_at.date() for created_at in table["created_at"].to_pylist()), table[column].to_pylist())
+        yield [(day, value) for day, value in pairs if days is None or day in days]
+
+
+def iter_archived_chunks(db: Session, start: datetime = None, end: datetime = None, min_rating: float = None,
+                         max_rating: float = None, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Archived rows shaped like exporter.iter_chunks pages: lists of EXPORT_COLUMNS tuples."""
+    for table in scan(db, EXPORT_COLUMNS, start, end, min_rating=min_rating, max_rating=max_rating):
+        for offset in range(0, table.num_rows, chunk_size):
+            part = table.slice(offset, chunk_size)
+            yield list(zip(*(part.column(name).to_pylist() for name in EXPORT_COLUMNS)))
+
+
+def stats(db: Session) -> dict:
+    totals = db.execute(totals_statement()).one()
+    return {"segments": totals.segments, "rows": totals.count, "bytes": totals.bytes}
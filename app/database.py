@@ -1,27 +1,101 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from starlette.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
+from . import db_profiles
 
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Serve the async routes (submit, report) from an asyncio engine
+# (aiosqlite / aiomysql); "false" keeps them on the sync engine through the
+# threadpool
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "true").lower() == "true"
 
 # SQLAlchemy engine args differ for SQLite vs MySQL
 connect_args = {}
 if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_pre_ping=True)
+# Pool sizing, pre-ping strategy and SQLite PRAGMAs come from DATABASE_PROFILE
+engine_profile = db_profiles.load_profile()
+engine_stats = db_profiles.EngineStats()
+engine = create_engine(
+    DATABASE_URL, connect_args=connect_args,
+    **db_profiles.engine_options(DATABASE_URL, engine_profile, engine_stats),
+)
+db_profiles.install(engine, engine_profile, engine_stats)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+
+def async_database_url(url: str) -> str:
+    """The same database through its asyncio driver."""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if dialect in ("mysql", "mariadb"):
+        return f"{dialect}+aiomysql{sep}{rest}"
+    raise ValueError(f"No asyncio driver configured for {scheme}")
+
+
+async_engine = None
+AsyncSessionLocal = None
+async_engine_stats = None
+if DATABASE_ASYNC:
+    async_url = async_database_url(DATABASE_URL)
+    async_engine_stats = db_profiles.EngineStats()
+    async_engine = create_async_engine(
+        async_url, **db_profiles.engine_options(async_url, engine_profile, async_engine_stats, asyncio=True)
+    )
+    db_profiles.install(async_engine.sync_engine, engine_profile, async_engine_stats)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_session():
+    """Session for async routes: an AsyncSession, or a sync Session when DATABASE_ASYNC is off.
+
+    Routes hand their database work to run_db(), which works with both.
+    """
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def database_stats() -> dict:
+    stats = {"profile": db_profiles.DATABASE_PROFILE, "sync": engine_stats.to_dict()}
+    if async_engine_stats is not None:
+        stats["async"] = async_engine_stats.to_dict()
+    return stats
+
+
+async def run_db(db, fn, *args):
+    """Run fn(sync_session, *args) without blocking the event loop.
+
+    On an AsyncSession this goes through run_sync, so the existing sync
+    query code (rollups, sketches, report engine) is reused as is; on a sync
+    Session it runs in the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
@@ -0,0 +1,208 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+load_dotenv()
+
+# Named engine settings; see ENGINE_PROFILES
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "default").lower()
+
+# WAL lets readers run alongside the single writer, and synchronous=NORMAL
+# drops the fsync on every commit (a crash can lose the last transactions,
+# never corrupt the file)
+SQLITE_WAL_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative = KiB, i.e. 64 MiB
+    "temp_store": "MEMORY",
+}
+
+ENGINE_PROFILES = {
+    # What the app has always used: SQLAlchemy's pool defaults, a ping on
+    # every checkout and SQLite's default rollback journal
+    "default": {
+        "pool_size": 5, "max_overflow": 10, "pool_timeout": 30, "pool_recycle": -1,
+        "pre_ping": "always", "sqlite_pragmas": {},
+    },
+    # Web workers: a larger pool, connections recycled well before MySQL's
+    # wait_timeout and only pinged after sitting idle
+    "web": {
+        "pool_size": 10, "max_overflow": 20, "pool_timeout": 10, "pool_recycle": 1800,
+        "pre_ping": "idle", "sqlite_pragmas": SQLITE_WAL_PRAGMAS,
+    },
+    # Scripts and bulk imports: few connections that wait long for locks
+    "batch": {
+        "pool_size": 2, "max_overflow": 0, "pool_timeout": 60, "pool_recycle": 3600,
+        "pre_ping": "always",
+        "sqlite_pragmas": dict(SQLITE_WAL_PRAGMAS, busy_timeout=60000, cache_size=-256 * 1024),
+    },
+}
+
+# "always": ping on every checkout; "idle": only connections idle longer than
+# DB_PING_IDLE_SECONDS; "none": rely on pool_recycle alone
+PRE_PING_STRATEGIES = ("always", "idle", "none")
+DB_PING_IDLE_SECONDS = float(os.getenv("DB_PING_IDLE_SECONDS", "30"))
+
+_OVERRIDES = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", float),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pre_ping": ("DB_PRE_PING", str),
+}
+
+
+def _parse_pragmas(value: str) -> dict:
+    # "busy_timeout=10000,cache_size=-32768"
+    pragmas = {}
+    for item in value.split(","):
+        if item.strip():
+            name, _, setting = item.partition("=")
+            pragmas[name.strip()] = setting.strip()
+    return pragmas
+
+
+def load_profile(name: str = DATABASE_PROFILE) -> dict:
+    """The named profile with DB_* environment overrides applied."""
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DATABASE_PROFILE '{name}', expected one of: {', '.join(ENGINE_PROFILES)}")
+    profile = dict(ENGINE_PROFILES[name])
+    for key, (env, cast) in _OVERRIDES.items():
+        if os.getenv(env):
+            profile[key] = cast(os.getenv(env))
+    if os.getenv("SQLITE_PRAGMAS"):
+        profile["sqlite_pragmas"] = dict(profile["sqlite_pragmas"], **_parse_pragmas(os.getenv("SQLITE_PRAGMAS")))
+    if profile["pre_ping"] not in PRE_PING_STRATEGIES:
+        raise ValueError(f"Unknown DB_PRE_PING '{profile['pre_ping']}', expected one of: {', '.join(PRE_PING_STRATEGIES)}")
+    return profile
+
+
+class EngineStats:
+    """Counters for one engine: pool checkouts that had to wait, and SQLite lock errors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_waits = 0
+        self.checkout_wait_ms_total = 0.0
+        self.checkout_wait_ms_max = 0.0
+        self.checkout_timeouts = 0
+        self.idle_pings = 0
+        self.stale_connections = 0
+        self.sqlite_busy_errors = 0
+
+    def record_checkout(self, waited: bool, elapsed_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            if waited:
+                self.checkout_waits += 1
+                self.checkout_wait_ms_total += elapsed_ms
+                self.checkout_wait_ms_max = max(self.checkout_wait_ms_max, elapsed_ms)
+
+    def count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_waits": self.checkout_waits,
+                "checkout_wait_ms_avg": self.checkout_wait_ms_total / self.checkout_waits if self.checkout_waits else 0.0,
+                "checkout_wait_ms_max": self.checkout_wait_ms_max,
+                "checkout_timeouts": self.checkout_timeouts,
+                "idle_pings": self.idle_pings,
+                "stale_connections": self.stale_connections,
+                "sqlite_busy_errors": self.sqlite_busy_errors,
+            }
+
+
+def _instrumented_pool(pool_class, stats: EngineStats):
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            # Same test QueuePool uses to decide whether it will block
+            will_wait = (
+                self._max_overflow > -1
+                and self._overflow >= self._max_overflow
+                and self._pool.empty()
+            )
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                stats.count("checkout_timeouts")
+                raise
+            stats.record_checkout(will_wait, (time.perf_counter() - started) * 1000)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":"))
+
+
+def engine_options(url: str, profile: dict, stats: EngineStats, asyncio: bool = False) -> dict:
+    """Keyword arguments for create_engine/create_async_engine."""
+    options = {"pool_pre_ping": profile["pre_ping"] == "always"}
+    if _is_memory_sqlite(url):
+        # In-memory databases live in a single connection; keep SQLAlchemy's pool
+        return options
+    options.update(
+        poolclass=_instrumented_pool(AsyncAdaptedQueuePool if asyncio else QueuePool, stats),
+        pool_size=profile["pool_size"],
+        max_overflow=profile["max_overflow"],
+        pool_timeout=profile["pool_timeout"],
+        pool_recycle=profile["pool_recycle"],
+    )
+    return options
+
+
+def install(sync_engine, profile: dict, stats: EngineStats):
+    """Attach the profile's connect/checkout hooks to an Engine (an AsyncEngine's .sync_engine)."""
+    is_sqlite = sync_engine.dialect.name == "sqlite"
+    pragmas = profile["sqlite_pragmas"] if is_sqlite else {}
+
+    if pragmas:
+        @event.listens_for(sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+    if profile["pre_ping"] == "idle":
+        @event.listens_for(sync_engine, "checkin")
+        def remember_checkin(dbapi_connection, connection_record):
+            connection_record.info["checked_in_at"] = time.monotonic()
+
+        @event.listens_for(sync_engine, "checkout")
+        def ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+            checked_in_at = connection_record.info.get("checked_in_at")
+            if checked_in_at is None or time.monotonic() - checked_in_at < DB_PING_IDLE_SECONDS:
+                return
+            stats.count("idle_pings")
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            except Exception:
+                stats.count("stale_connections")
+                # The pool discards this connection and checks out another
+                raise exc.DisconnectionError()
+            finally:
+                cursor.close()
+
+    if is_sqlite:
+        @event.listens_for(sync_engine, "handle_error")
+        def count_busy(context):
+            message = str(context.original_exception).lower()
+            if "database is locked" in message or "database is busy" in message:
+                stats.count("sqlite_busy_errors")
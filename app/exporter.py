@@ -0,0 +1,169 @@
+import io
+import os
+import csv
+import json
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Feedback, as_naive_utc
+
+load_dotenv()
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+
+EXPORT_COLUMNS = ["id", "name", "email", "rating", "description", "ip_address", "screenshot", "created_at"]
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportFormatUnavailable(RuntimeError):
+    pass
+
+
+def filter_conditions(start: datetime = None, end: datetime = None,
+                      min_rating: float = None, max_rating: float = None) -> list:
+    """WHERE conditions for a [start, end) date range and an inclusive rating band."""
+    conditions = []
+    if start is not None:
+        conditions.append(Feedback.created_at >= as_naive_utc(start))
+    if end is not None:
+        conditions.append(Feedback.created_at < as_naive_utc(end))
+    if min_rating is not None:
+        conditions.append(Feedback.rating >= min_rating)
+    if max_rating is not None:
+        conditions.append(Feedback.rating <= max_rating)
+    return conditions
+
+
+def iter_chunks(db: Session, conditions: list = (), chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield lists of feedback rows in id order, one keyset page at a time.
+
+    Each page is `WHERE id > last_id ... LIMIT chunk_size` read through a
+    server-side cursor, so neither the database driver nor Python ever hold
+    more than one page.
+    """
+    columns = [getattr(Feedback, name) for name in EXPORT_COLUMNS]
+    last_id = 0
+    while True:
+        stmt = (
+            select(*columns)
+            .where(Feedback.id > last_id, *conditions)
+            .order_by(Feedback.id)
+            .limit(chunk_size)
+        )
+        result = db.execute(stmt, execution_options={"stream_results": True, "max_row_buffer": chunk_size})
+        rows = result.all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+        if len(rows) < chunk_size:
+            return
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        for row in rows:
+            writer.writerow([_serialize(value) for value in row])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(chunks):
+    for rows in chunks:
+        lines = [
+            json.dumps({name: _serialize(value) for name, value in zip(EXPORT_COLUMNS, row)}, ensure_ascii=False)
+            for row in rows
+        ]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only stream whose contents are handed out and dropped after every chunk."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def parquet_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("email", pa.string()),
+        ("rating", pa.float64()),
+        ("description", pa.string()),
+        ("ip_address", pa.string()),
+        ("screenshot", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+
+def parquet_table(pa, schema, rows):
+    """pyarrow Table from rows of EXPORT_COLUMNS values."""
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def iter_parquet(chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportFormatUnavailable("Parquet export requires the pyarrow package")
+
+    schema = parquet_schema(pa)
+
+    def generate():
+        sink = _DrainableSink()
+        # One row group per chunk; only the footer waits for the end
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        for rows in chunks:
+            writer.write_table(parquet_table(pa, schema, rows))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    return generate()
+
+
+def iter_export(chunks, fmt: str):
+    """Serialize row chunks into a byte stream in the given format."""
+    if fmt == "csv":
+        return iter_csv(chunks)
+    if fmt == "ndjson":
+        return iter_ndjson(chunks)
+    if fmt == "parquet":
+        return iter_parquet(chunks)
+    raise ValueError(f"Unsupported export format: {fmt}")
@@ -0,0 +1,218 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+from email.utils import formatdate
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli (poetry install -E brotli)
+    brotli = None
+
+load_dotenv()
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "dist")
+# Files up to this size are held in memory with their compressed variants;
+# larger ones are streamed from disk
+STATIC_MEMORY_MAX_BYTES = int(os.getenv("STATIC_MEMORY_MAX_BYTES", str(1024 * 1024)))
+# Total bytes (all variants) held in memory per worker
+STATIC_MEMORY_BUDGET = int(os.getenv("STATIC_MEMORY_BUDGET", str(64 * 1024 * 1024)))
+# Cache lifetime for files without a content hash in their name (favicon etc.)
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+STATIC_BROTLI_QUALITY = int(os.getenv("STATIC_BROTLI_QUALITY", "11"))
+
+# Vite names build output <name>-<hash>.<ext>; those never change content
+HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8,}\.[a-z0-9]+$")
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                      "application/manifest+json", "application/xml", "font/ttf", "font/otf")
+# A compressed variant is only kept when it saves at least this much
+MIN_COMPRESSION_RATIO = 0.9
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("text/css", ".css")
+mimetypes.add_type("image/svg+xml", ".svg")
+
+
+class Variant:
+    """One encoding of an asset: bytes in memory, or a file on disk."""
+
+    __slots__ = ("encoding", "body", "path", "size", "etag")
+
+    def __init__(self, encoding: str, etag: str, body: bytes = None, path: str = None, size: int = None):
+        self.encoding = encoding
+        self.etag = etag
+        self.body = body
+        self.path = path
+        self.size = len(body) if body is not None else size
+
+
+class StaticAsset:
+    __slots__ = ("name", "content_type", "cache_control", "last_modified", "variants")
+
+    def __init__(self, name: str, content_type: str, cache_control: str, last_modified: str):
+        self.name = name
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.last_modified = last_modified
+        self.variants = {}
+
+    def headers(self, variant: Variant) -> dict:
+        headers = {
+            "ETag": variant.etag,
+            "Cache-Control": self.cache_control,
+            "Last-Modified": self.last_modified,
+        }
+        if len(self.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if variant.encoding != "identity":
+            headers["Content-Encoding"] = variant.encoding
+        return headers
+
+
+def _compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class FrontendManifest:
+    """Every file under the frontend build, indexed once at startup.
+
+    Requests are answered from this index (no filesystem checks per request).
+    Compressed variants come from .gz/.br files next to the originals when
+    the build produced them, otherwise they are compressed here once.
+    """
+
+    def __init__(self, directory: str = FRONTEND_DIR, memory_max_bytes: int = STATIC_MEMORY_MAX_BYTES,
+                 memory_budget: int = STATIC_MEMORY_BUDGET):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_budget = memory_budget
+        self.memory_bytes = 0
+        self.assets = {}
+        self._build()
+
+    def _hold(self, size: int) -> bool:
+        if size > self.memory_max_bytes or self.memory_bytes + size > self.memory_budget:
+            return False
+        self.memory_bytes += size
+        return True
+
+    def _build(self):
+        for root, _, files in os.walk(self.directory):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                if filename.endswith((".gz", ".br")) and os.path.exists(path[:-3]):
+                    continue  # picked up as a variant of the original
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                self.assets[name] = self._load(name, path)
+
+    def _load(self, name: str, path: str) -> StaticAsset:
+        stat = os.stat(path)
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        if name.startswith("assets/") and HASHED_NAME.search(name):
+            cache_control = IMMUTABLE
+        elif name == "index.html":
+            cache_control = REVALIDATE
+        else:
+            cache_control = f"public, max-age={STATIC_MAX_AGE}"
+        asset = StaticAsset(name, content_type, cache_control, formatdate(stat.st_mtime, usegmt=True))
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        tag = digest.hexdigest()[:32]
+
+        data = None
+        if self._hold(stat.st_size):
+            with open(path, "rb") as f:
+                data = f.read()
+            asset.variants["identity"] = Variant("identity", f'"{tag}"', body=data)
+        else:
+            asset.variants["identity"] = Variant("identity", f'"{tag}"', path=path, size=stat.st_size)
+
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            etag = f'"{tag}-{suffix[1:]}"'
+            sibling = path + suffix
+            if os.path.exists(sibling):
+                size = os.path.getsize(sibling)
+                if self._hold(size):
+                    with open(sibling, "rb") as f:
+                        asset.variants[encoding] = Variant(encoding, etag, body=f.read())
+                else:
+                    asset.variants[encoding] = Variant(encoding, etag, path=sibling, size=size)
+                continue
+            if data is None or not _compressible(content_type) or (encoding == "br" and brotli is None):
+                continue
+            compressed = _compress(encoding, data)
+            if len(compressed) <= len(data) * MIN_COMPRESSION_RATIO and self._hold(len(compressed)):
+                asset.variants[encoding] = Variant(encoding, etag, body=compressed)
+        return asset
+
+    def get(self, name: str):
+        return self.assets.get(name)
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.assets),
+            "memory_bytes": self.memory_bytes,
+            "variants": sum(len(asset.variants) for asset in self.assets.values()),
+        }
+
+
+def accepted_encodings(header: str) -> dict:
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_variant(asset: StaticAsset, accept_encoding: str) -> Variant:
+    if len(asset.variants) > 1:
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in asset.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return asset.variants[encoding]
+    return asset.variants["identity"]
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def serve(asset: StaticAsset, request: Request) -> Response:
+    variant = choose_variant(asset, request.headers.get("accept-encoding"))
+    headers = asset.headers(variant)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, variant.etag):
+        return Response(status_code=304, headers=headers)
+    if variant.body is not None:
+        return Response(content=variant.body, media_type=asset.content_type, headers=headers)
+    return FileResponse(variant.path, media_type=asset.content_type, headers=headers)
@@ -0,0 +1,78 @@
+import os
+import math
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 2^14 registers: ~0.8% standard error. Stored sketches are only valid for
+# the precision they were built with; rebuild them after changing this.
+HLL_PRECISION = int(os.getenv("HLL_PRECISION", "14"))
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def register_rank(value: str, precision: int = HLL_PRECISION):
+    """(register, rank) for one value: the top bits pick the register, the rank
+    is the position of the first 1-bit in the rest of the hash."""
+    h = _hash64(value)
+    width = 64 - precision
+    rest = h & ((1 << width) - 1)
+    return h >> width, width - rest.bit_length() + 1
+
+
+def standard_error(precision: int = HLL_PRECISION) -> float:
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+def estimate(ranks: dict, precision: int = HLL_PRECISION) -> int:
+    """Cardinality estimate from sparse {register: rank} (missing registers are 0)."""
+    m = 1 << precision
+    zeros = m - len(ranks)
+    harmonic = sum(2.0 ** -rank for rank in ranks.values()) + zeros
+    raw = _alpha(m) * m * m / harmonic
+    if raw <= 2.5 * m and zeros:
+        # Small-range correction (linear counting)
+        return int(round(m * math.log(m / zeros)))
+    return int(round(raw))
+
+
+def merge_ranks(target: dict, ranks: dict) -> dict:
+    """Union of two sketches: the register-wise maximum, written into target."""
+    for register, rank in ranks.items():
+        if rank > target.get(register, 0):
+            target[register] = rank
+    return target
+
+
+class HyperLogLog:
+    """In-memory sketch holding only its non-zero registers."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.ranks = {}
+
+    def add(self, value: str):
+        register, rank = register_rank(value, self.precision)
+        if rank > self.ranks.get(register, 0):
+            self.ranks[register] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        if other.precision != self.precision:
+            raise ValueError("Can't merge sketches of different precision")
+        merge_ranks(self.ranks, other.ranks)
+
+    def count(self) -> int:
+        return estimate(self.ranks, self.precision)
@@ -0,0 +1,161 @@
+import os
+import csv
+import json
+import time
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .models import Feedback, as_naive_utc, utc_now
+from .schemas import FeedbackImport
+from .report_cache import report_cache
+from .report_stream import report_stream
+from . import rollups, sketches
+
+load_dotenv()
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Only the first rejects are kept in the result; all of them are counted
+MAX_REPORTED_REJECTS = 1000
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+def detect_format(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    return "csv"
+
+
+def iter_records(stream, fmt: str):
+    """Yield (line_number, dict) for each record of a text stream, without reading it all.
+
+    A record that can't be parsed yields (line_number, error_message) instead.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "ndjson":
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, "expected a JSON object"
+                continue
+            yield line_number, record
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _to_row(record: dict) -> dict:
+    # CSV has no nulls; an empty optional cell means "not set"
+    cleaned = {k: (None if v == "" else v) for k, v in record.items() if k}
+    row = FeedbackImport.model_validate(cleaned).model_dump()
+    if row["created_at"] is None:
+        row["created_at"] = utc_now()
+    else:
+        row["created_at"] = as_naive_utc(row["created_at"])
+    return row
+
+
+class ImportResult:
+    def __init__(self, resume_after: int = 0):
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self.rejected_count = 0
+        self.rejected = []
+        self.last_committed_line = resume_after
+        self.elapsed = 0.0
+
+    def reject(self, line_number: int, error: str):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTS:
+            self.rejected.append({"line": line_number, "error": error})
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_inserted / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "rows_read": self.rows_read,
+            "rows_inserted": self.rows_inserted,
+            "rows_rejected": self.rejected_count,
+            "rejected": self.rejected,
+            "last_committed_line": self.last_committed_line,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def import_feedback(db: Session, stream, fmt: str, resume_after: int = 0,
+                    chunk_size: int = IMPORT_CHUNK_SIZE, on_checkpoint=None) -> ImportResult:
+    """Validate and insert feedback records from a CSV/NDJSON text stream.
+
+    Rows are inserted with executemany in chunks of chunk_size, each chunk in
+    its own transaction. After every commit on_checkpoint(line_number) is
+    called; passing that number back as resume_after skips everything that
+    was already imported. Rollups, rater sketches (in hll mode) and the
+    report cache are refreshed once, at the end (also when the import stops early).
+    """
+    result = ImportResult(resume_after)
+    started = time.perf_counter()
+    touched_days = set()
+    chunk = []
+    chunk_end = resume_after
+
+    def commit_chunk():
+        db.execute(insert(Feedback), chunk)
+        db.commit()
+        result.rows_inserted += len(chunk)
+        result.last_committed_line = chunk_end
+        touched_days.update(row["created_at"].date() for row in chunk)
+        chunk.clear()
+        if on_checkpoint:
+            on_checkpoint(chunk_end)
+
+    try:
+        for line_number, record in iter_records(stream, fmt):
+            if line_number <= resume_after:
+                continue
+            result.rows_read += 1
+            chunk_end = line_number
+            if isinstance(record, str):
+                result.reject(line_number, record)
+                continue
+            try:
+                chunk.append(_to_row(record))
+            except ValidationError as e:
+                errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                result.reject(line_number, errors)
+                continue
+            if len(chunk) >= chunk_size:
+                commit_chunk()
+        if chunk:
+            commit_chunk()
+        elif chunk_end > result.last_committed_line:
+            # Trailing rejects still move the checkpoint forward
+            result.last_committed_line = chunk_end
+            if on_checkpoint:
+                on_checkpoint(chunk_end)
+    finally:
+        db.rollback()
+        if touched_days:
+            rollups.rebuild(db, touched_days)
+            if sketches.ENABLED:
+                sketches.rebuild(db, touched_days)
+            db.commit()
+            report_cache.invalidate()
+            report_stream.publish_reset("import")
+        result.elapsed = time.perf_counter() - started
+
+    return result
@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+from .database import SessionLocal
+from .models import Feedback
+from .report_cache import report_cache
+from .report_stream import report_stream
+from . import rollups, sketches
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Collect submissions in memory and commit them as multi-row INSERTs
+FEEDBACK_WRITE_BUFFER = os.getenv("FEEDBACK_WRITE_BUFFER", "false").lower() == "true"
+# A batch is flushed once it holds this many rows...
+FEEDBACK_BUFFER_MAX_ROWS = int(os.getenv("FEEDBACK_BUFFER_MAX_ROWS", "500"))
+# ...or once its oldest row has waited this long. This is the durability
+# bound: at most this much accepted feedback is lost if a worker dies.
+FEEDBACK_BUFFER_MAX_DELAY_MS = float(os.getenv("FEEDBACK_BUFFER_MAX_DELAY_MS", "200"))
+# Hold each request until its batch is committed (group commit) instead of
+# answering as soon as the row is buffered (write-behind)
+FEEDBACK_BUFFER_WAIT = os.getenv("FEEDBACK_BUFFER_WAIT", "true").lower() == "true"
+
+
+class BufferTicket:
+    """Lets a request wait for the batch holding its row to be committed."""
+
+    def __init__(self, on_failure=None):
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters = []
+        self.on_failure = on_failure
+        self.error = None
+
+    def resolve(self, error: Exception = None):
+        with self._lock:
+            self.error = error
+            self._done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_done, future)
+        if error is not None and self.on_failure is not None:
+            try:
+                self.on_failure()
+            except Exception as e:
+                logger.error("Buffered feedback failure callback failed: %s", e)
+
+    def wait(self, timeout: float = None) -> bool:
+        """True once the row is committed; False on timeout or a failed flush."""
+        return self._done.wait(timeout) and self.error is None
+
+    async def wait_async(self, timeout: float = None) -> bool:
+        """wait() for async routes, without tying up a thread per waiting request."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._done.is_set():
+                future.set_result(None)
+            else:
+                self._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.error is None
+
+
+def _set_done(future):
+    # The waiter may have timed out (and cancelled the future) meanwhile
+    if not future.done():
+        future.set_result(None)
+
+
+class FeedbackBuffer:
+    """In-process write-behind buffer that group-commits Feedback rows."""
+
+    def __init__(self, session_factory=SessionLocal, max_rows: int = FEEDBACK_BUFFER_MAX_ROWS,
+                 max_delay_ms: float = FEEDBACK_BUFFER_MAX_DELAY_MS):
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self._rows = []
+        self._tickets = []
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.flush_ms_total = 0.0
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="feedback-buffer", daemon=True)
+            self._thread.start()
+
+    def add(self, row: dict, on_failure=None) -> BufferTicket:
+        """Buffer one row (a dict of Feedback columns, created_at included).
+
+        on_failure() is called from the flusher if the row can't be stored.
+        """
+        ticket = BufferTicket(on_failure)
+        with self._cond:
+            self._start()
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(row)
+            self._tickets.append(ticket)
+            # Wake the flusher to start the delay clock or flush a full batch
+            if len(self._rows) == 1 or len(self._rows) >= self.max_rows:
+                self._cond.notify()
+        return ticket
+
+    def _take_batch(self):
+        rows, tickets = self._rows[:self.max_rows], self._tickets[:self.max_rows]
+        del self._rows[:self.max_rows]
+        del self._tickets[:self.max_rows]
+        self._oldest = time.monotonic() if self._rows else None
+        return rows, tickets
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._rows:
+                        due = self._oldest + self.max_delay
+                        if len(self._rows) >= self.max_rows or self._stopping or time.monotonic() >= due:
+                            break
+                        self._cond.wait(due - time.monotonic())
+                    elif self._stopping:
+                        return
+                    else:
+                        self._cond.wait()
+                rows, tickets = self._take_batch()
+            self._flush(rows, tickets)
+
+    def _insert(self, rows: list):
+        """Insert rows with their rollup and sketch updates in one transaction."""
+        deltas = {}
+        raters = {}
+        for row in rows:
+            deltas.setdefault(row["created_at"].date(), rollups.RollupDelta()).add(row["rating"])
+            raters.setdefault(row["created_at"].date(), []).append(row["email"])
+
+        db = self.session_factory()
+        try:
+            db.execute(insert(Feedback).values(rows))
+            rollups.apply_deltas(db, deltas)
+            if sketches.ENABLED:
+                sketches.apply_raters(db, raters)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _flush(self, rows: list, tickets: list):
+        started = time.perf_counter()
+        try:
+            self._insert(rows)
+            stored = list(zip(rows, tickets))
+        except Exception as e:
+            stored, failures = [], []
+            if len(rows) == 1:
+                failures.append((tickets[0], e))
+            else:
+                # Retry one row at a time, so only the bad rows fail and not
+                # everyone batched with them
+                logger.warning("Failed to flush %d buffered feedback rows, retrying one by one: %s", len(rows), e)
+                for row, ticket in zip(rows, tickets):
+                    try:
+                        self._insert([row])
+                        stored.append((row, ticket))
+                    except Exception as row_error:
+                        failures.append((ticket, row_error))
+            for ticket, error in failures:
+                self.failed_rows += 1
+                logger.error("Failed to store buffered feedback row: %s", error)
+                ticket.resolve(error)
+        if not stored:
+            return
+
+        self.flushes += 1
+        self.flushed_rows += len(stored)
+        self.flush_ms_total += (time.perf_counter() - started) * 1000
+        report_cache.invalidate()
+        report_stream.publish_feedback([row for row, _ in stored])
+        for _, ticket in stored:
+            ticket.resolve()
+
+    def drain(self, timeout: float = 30.0):
+        """Flush everything still buffered and stop the flusher (called on shutdown)."""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": FEEDBACK_WRITE_BUFFER,
+            "pending": len(self._rows),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "avg_batch_size": self.flushed_rows / self.flushes if self.flushes else 0.0,
+            "avg_flush_ms": self.flush_ms_total / self.flushes if self.flushes else 0.0,
+        }
+
+
+feedback_buffer = FeedbackBuffer()
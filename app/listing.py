@@ -0,0 +1,76 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+
+from sqlalchemy import select, or_
+from sqlalchemy.orm import Session
+
+from .models import Feedback
+from .exporter import filter_conditions
+
+LISTING_DEFAULT_LIMIT = 50
+LISTING_MAX_LIMIT = 200
+
+LISTING_COLUMNS = ["id", "name", "email", "rating", "description", "created_at"]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, feedback_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), feedback_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, feedback_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(feedback_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def listing_statement(cursor: str = None, limit: int = LISTING_DEFAULT_LIMIT, start: datetime = None,
+                      end: datetime = None, min_rating: float = None, max_rating: float = None,
+                      email: str = None, q: str = None):
+    """Newest-first page of feedback, continuing after `cursor` (keyset, never OFFSET).
+
+    Fetches limit + 1 rows so the caller can tell whether another page exists.
+    """
+    conditions = filter_conditions(start, end, min_rating, max_rating)
+    # Rows without a timestamp (pre created_at schema) can't be ordered by it
+    conditions.append(Feedback.created_at.isnot(None))
+    if email:
+        conditions.append(Feedback.email == email)
+    if q:
+        pattern = f"%{q}%"
+        conditions.append(or_(Feedback.description.like(pattern), Feedback.name.like(pattern)))
+    if cursor:
+        created_at, feedback_id = decode_cursor(cursor)
+        # Same as (created_at, id) < (cursor), but the leading <= gives the
+        # (created_at, id) index a plain range to walk; a bare OR makes SQLite
+        # merge two index scans and sort the result on every page
+        conditions.append(Feedback.created_at <= created_at)
+        conditions.append(or_(Feedback.created_at < created_at, Feedback.id < feedback_id))
+
+    columns = [getattr(Feedback, name) for name in LISTING_COLUMNS]
+    return (
+        select(*columns)
+        .where(*conditions)
+        .order_by(Feedback.created_at.desc(), Feedback.id.desc())
+        .limit(limit + 1)
+    )
+
+
+def list_feedback(db: Session, limit: int = LISTING_DEFAULT_LIMIT, **filters) -> dict:
+    """One page as {"items": [...], "next_cursor": str or None}."""
+    limit = max(1, min(limit, LISTING_MAX_LIMIT))
+    rows = db.execute(listing_statement(limit=limit, **filters)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return {"items": [row._asdict() for row in rows], "next_cursor": next_cursor}
@@ -1,14 +1,36 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from .database import engine, Base
-from .routes import public, reports, admin
+from fastapi.responses import Response
+from .database import async_engine
+from .replicas import read_router
+from .report_stream import report_stream
+from .routes import public, reports, admin, feedback
+from .uploads import ASYNC_SCREENSHOT_UPLOADS, upload_queue
+from .ingest import feedback_buffer
+from .metrics import METRICS_ENABLED, MetricsMiddleware, install_query_hooks, render_metrics
+from .frontend import FRONTEND_DIR, FrontendManifest, serve
+from .responses import API_GZIP_MIN_BYTES, APIGZipMiddleware
+from contextlib import asynccontextmanager
 import os
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="CSAT API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if ASYNC_SCREENSHOT_UPLOADS:
+        # Queue again the uploads a previous worker left unfinished
+        upload_queue.start_recovery()
+    yield
+    report_stream.close()
+    # Commit buffered feedback and let queued screenshot uploads finish
+    # before the worker exits
+    feedback_buffer.drain()
+    upload_queue.drain()
+    if async_engine is not None:
+        await async_engine.dispose()
+    await read_router.dispose_async()
+
+
+app = FastAPI(title="CSAT API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,24 +41,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if API_GZIP_MIN_BYTES:
+    # Added before MetricsMiddleware so response sizes are recorded as sent
+    app.add_middleware(APIGZipMiddleware)
+
+if METRICS_ENABLED:
+    # Per-route latency, payload sizes and query counts (see app/metrics.py)
+    install_query_hooks()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
+
 app.include_router(public.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
 app.include_router(reports.router, prefix="/api")
+app.include_router(feedback.router, prefix="/api")
 
-# Serve frontend static files
-FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "dist")
-
+# Serve frontend static files from an in-memory manifest of the build, with
+# precompressed variants and cache headers (see app/frontend.py)
 if os.path.isdir(FRONTEND_DIR):
-    # Serve static assets (JS, CSS, images)
-    app.mount("/assets", StaticFiles(directory=os.path.join(FRONTEND_DIR, "assets")), name="static-assets")
+    frontend_manifest = FrontendManifest(FRONTEND_DIR)
 
     # Catch-all: serve index.html for any non-API route (React Router support)
-    @app.get("/{full_path:path}")
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
     async def serve_frontend(request: Request, full_path: str):
         # Don't serve index.html for API routes
         if full_path.startswith("api"):
             return
-        file_path = os.path.join(FRONTEND_DIR, full_path)
-        if os.path.isfile(file_path):
-            return FileResponse(file_path)
-        return FileResponse(os.path.join(FRONTEND_DIR, "index.html"))
+        asset = frontend_manifest.get(full_path)
+        if asset is None and not full_path.startswith("assets/"):
+            asset = frontend_manifest.get("index.html")
+        if asset is None:
+            # A missing bundle file must not come back as HTML
+            raise HTTPException(status_code=404, detail="Not Found")
+        return serve(asset, request)
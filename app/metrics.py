@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+import contextvars
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Set for gunicorn so /metrics adds up every worker (see gunicorn.conf.py);
+# prometheus_client reads it itself, it must be set before the app starts
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Requests slower than this are logged with the queries they ran; 0 disables
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+# Queries kept per request for the slow-request log
+SLOW_REQUEST_MAX_QUERIES = int(os.getenv("SLOW_REQUEST_MAX_QUERIES", "50"))
+
+logger = logging.getLogger("app.slow_requests")
+
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608, float("inf"))
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100, float("inf"))
+
+REQUEST_SECONDS = Histogram(
+    "csat_http_request_duration_seconds", "Time to the last response byte, per route",
+    ["method", "route", "status"],
+)
+REQUEST_BYTES = Histogram(
+    "csat_http_request_size_bytes", "Request body size", ["route"], buckets=SIZE_BUCKETS,
+)
+RESPONSE_BYTES = Histogram(
+    "csat_http_response_size_bytes", "Response body size", ["route"], buckets=SIZE_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "csat_http_request_db_queries", "Database queries run by one request", ["route"], buckets=COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "csat_http_request_db_seconds", "Time one request spent in database queries", ["route"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "csat_db_query_duration_seconds", "Every database query, including background work",
+)
+STORAGE_UPLOAD_SECONDS = Histogram(
+    "csat_storage_upload_duration_seconds", "Screenshot uploads", ["backend", "outcome"],
+)
+STORAGE_UPLOAD_BYTES = Histogram(
+    "csat_storage_upload_size_bytes", "Screenshot upload size", ["backend"], buckets=SIZE_BUCKETS,
+)
+JWT_VERIFY_SECONDS = Histogram(
+    "csat_jwt_verify_duration_seconds", "Admin token verification",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, float("inf")),
+)
+SLOW_REQUESTS = Counter("csat_http_slow_requests", "Requests slower than SLOW_REQUEST_MS", ["route"])
+ADMISSION_REJECTIONS = Counter(
+    "csat_admission_rejections", "Submissions turned away before any database or storage work",
+    ["reason", "path"],
+)
+ADMISSION_CHECK_SECONDS = Histogram(
+    "csat_admission_check_duration_seconds", "Admission check per submission", ["path"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.025, float("inf")),
+)
+
+
+class RequestTimings:
+    """Database work done on behalf of one request."""
+
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = []
+
+
+# Set by MetricsMiddleware; copied into threadpool calls and run_sync greenlets
+_current_request = contextvars.ContextVar("csat_request_timings", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._csat_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._csat_started
+    DB_QUERY_SECONDS.observe(elapsed)
+    timings = _current_request.get()
+    if timings is None:
+        return
+    timings.queries += 1
+    timings.db_seconds += elapsed
+    if SLOW_REQUEST_MS and len(timings.statements) < SLOW_REQUEST_MAX_QUERIES:
+        timings.statements.append((elapsed, statement))
+
+
+def install_query_hooks():
+    """Time every query on every engine (sync, async, replicas)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        # Unmatched paths share one label so scanners can't blow up the series count
+        return "unmatched"
+    path = scope["path"]
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    # Routes of an included router can carry their own path only; put the
+    # router prefix back from the request path
+    for i, char in enumerate(path):
+        if char == "/" and i and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+def _log_slow_request(method, route, path, status, elapsed, timings):
+    lines = [
+        f"Slow request: {method} {path} ({route}) {status} in {elapsed * 1000:.0f} ms, "
+        f"{timings.queries} queries in {timings.db_seconds * 1000:.0f} ms"
+    ]
+    for query_seconds, statement in timings.statements:
+        lines.append(f"  {query_seconds * 1000:8.1f} ms  {' '.join(statement.split())[:300]}")
+    if timings.queries > len(timings.statements):
+        lines.append(f"  ... {timings.queries - len(timings.statements)} more")
+    logger.warning("\n".join(lines))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, payload sizes and database work per route.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses pass
+    through untouched and the timing covers the whole body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_request.set(timings)
+        sizes = {"request": 0, "response": 0}
+        response_status = [500]
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                response_status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+            route = _route_template(scope)
+            REQUEST_SECONDS.labels(scope["method"], route, str(response_status[0])).observe(elapsed)
+            REQUEST_BYTES.labels(route).observe(sizes["request"])
+            RESPONSE_BYTES.labels(route).observe(sizes["response"])
+            REQUEST_QUERIES.labels(route).observe(timings.queries)
+            REQUEST_DB_SECONDS.labels(route).observe(timings.db_seconds)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                SLOW_REQUESTS.labels(route).inc()
+                _log_slow_request(scope["method"], route, scope["path"], response_status[0], elapsed, timings)
+
+
+def render_metrics():
+    """(body, content type) for /metrics; in multiprocess mode summed over all workers."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
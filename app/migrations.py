@@ -0,0 +1,353 @@
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, inspect, select, insert
+from sqlalchemy.schema import CreateTable
+
+from .database import engine as default_engine
+from .models import (Feedback, FeedbackDailyRollup, RaterDailySketch, RaterSketch, ReplicaHeartbeat, ArchiveSegment,
+                     ArchivedRater, utc_now)
+from .report_engine import histogram_statement, recent_statement, partial_days_statement
+from .listing import listing_statement
+from . import rollups, sketches, search
+
+# Kept out of Base.metadata so create_all never touches it
+migration_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MYSQL_LOCK_NAME = "csat_schema_migrations"
+MYSQL_LOCK_TIMEOUT = 300
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+class IndexCheck:
+    """Asserts that the planner answers a hot query from a given index."""
+
+    def __init__(self, description: str, statement, index: str = None, primary_key_of: str = None):
+        self.description = description
+        self.statement = statement
+        self.index = index
+        self.primary_key_of = primary_key_of
+
+    def expected_index(self, conn) -> str:
+        if self.primary_key_of is None:
+            return self.index
+        if conn.dialect.name == "mysql":
+            return "PRIMARY"
+        # Composite primary keys are backed by an automatic index on SQLite
+        return f"sqlite_autoindex_{self.primary_key_of}_1"
+
+    def run(self, conn):
+        """Return None when the plan uses the index, otherwise a description of the failure."""
+        index = self.expected_index(conn)
+        used = explain_indexes(conn, self.statement())
+        if index in used:
+            return None
+        return f"{self.description}: expected index {index}, plan uses {sorted(used) or 'no index'}"
+
+
+class Migration:
+    def __init__(self, version: int, name: str, upgrade, checks=()):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+        self.checks = list(checks)
+
+
+def explain_indexes(conn, stmt) -> set:
+    """Names of the indexes the database would use for stmt, read from EXPLAIN."""
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params).fetchall()
+        # e.g. "SEARCH feedback USING COVERING INDEX ix_feedback_created_at_id (created_at>?)"
+        return {m.group(1) for row in rows for m in [re.search(r"USING (?:COVERING )?INDEX (\w+)", row[-1])] if m}
+    if conn.dialect.name == "mysql":
+        rows = conn.exec_driver_sql("EXPLAIN " + compiled.string, params).mappings().all()
+        return {row["key"] for row in rows if row["key"]}
+    raise MigrationError(f"EXPLAIN checks are not supported on {conn.dialect.name}")
+
+
+def _columns(conn, table: str) -> dict:
+    return {c["name"]: c for c in inspect(conn).get_columns(table)}
+
+
+def _has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def _add_column(conn, table: str, column: str, ddl: str):
+    if column in _columns(conn, table):
+        return
+    if conn.dialect.name == "mysql":
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}, ALGORITHM=INPLACE, LOCK=NONE")
+    else:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _create_index(conn, index):
+    existing = {ix["name"] for ix in inspect(conn).get_indexes(index.table.name)}
+    if index.name in existing:
+        return
+    if conn.dialect.name == "mysql":
+        # Online build: writes keep going while the index is populated. MySQL
+        # refuses the statement rather than silently taking a table lock.
+        columns = ", ".join(c.name for c in index.columns)
+        conn.exec_driver_sql(
+            f"CREATE INDEX {index.name} ON {index.table.name} ({columns}) ALGORITHM=INPLACE LOCK=NONE"
+        )
+    else:
+        # SQLite has no online index build; the write lock is held for the
+        # build, readers are not blocked under WAL.
+        index.create(bind=conn)
+
+
+def _rebuild_sqlite_table(conn, table):
+    """Recreate a SQLite table from its model definition, keeping rows and indexes.
+
+    SQLite can't change a column's constraints in place, so the rows are
+    copied into a fresh table that then takes the old one's name.
+    """
+    existing = _columns(conn, table.name)
+    indexes = inspect(conn).get_indexes(table.name)
+    rebuilt = table.to_metadata(MetaData(), name=f"{table.name}_rebuild")
+    conn.execute(CreateTable(rebuilt))
+    columns = ", ".join(c.name for c in table.columns if c.name in existing)
+    conn.exec_driver_sql(f"INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    conn.exec_driver_sql(f"ALTER TABLE {rebuilt.name} RENAME TO {table.name}")
+    for index in indexes:
+        unique = "UNIQUE " if index["unique"] else ""
+        conn.exec_driver_sql(
+            f"CREATE {unique}INDEX {index['name']} ON {table.name} ({', '.join(index['column_names'])})"
+        )
+
+
+# --- Migrations. Each one must be safe to run against a database that
+# already has some or all of its changes (databases set up by create_all or
+# by the old one-off scripts have no schema_version rows).
+
+def _feedback_table(conn):
+    if not _has_table(conn, "feedback"):
+        conn.execute(CreateTable(Feedback.__table__))
+        for index in Feedback.__table__.indexes:
+            if index.name == "ix_feedback_id":
+                index.create(bind=conn)
+        return
+    # Columns added after the first release (formerly scripts/fix_schema.py
+    # and scripts/add_created_at_mysql.py)
+    _add_column(conn, "feedback", "ip_address", "VARCHAR(100) NULL")
+    _add_column(conn, "feedback", "screenshot", "VARCHAR(500) NULL")
+    if conn.dialect.name == "mysql":
+        _add_column(conn, "feedback", "created_at", "DATETIME NULL DEFAULT CURRENT_TIMESTAMP")
+    else:
+        # SQLite can't add a column with a non-constant default; old rows stay NULL
+        _add_column(conn, "feedback", "created_at", "DATETIME")
+
+
+def _description_nullable(conn):
+    # Formerly scripts/make_description_optional.py
+    if _columns(conn, "feedback")["description"]["nullable"]:
+        return
+    if conn.dialect.name == "mysql":
+        conn.exec_driver_sql(
+            "ALTER TABLE feedback MODIFY COLUMN description VARCHAR(1000) NULL, ALGORITHM=INPLACE, LOCK=NONE"
+        )
+    else:
+        _rebuild_sqlite_table(conn, Feedback.__table__)
+
+
+def _daily_rollups(conn):
+    if _has_table(conn, FeedbackDailyRollup.__tablename__):
+        return
+    conn.execute(CreateTable(FeedbackDailyRollup.__table__))
+    # Nothing can be archived before migration 8
+    rollups.rebuild(conn, archived=False)
+
+
+def _feedback_indexes(conn):
+    for index in Feedback.__table__.indexes:
+        _create_index(conn, index)
+
+
+def _rater_sketches(conn):
+    created = False
+    for model in (RaterDailySketch, RaterSketch):
+        if not _has_table(conn, model.__tablename__):
+            conn.execute(CreateTable(model.__table__))
+            created = True
+    if created and sketches.ENABLED:
+        sketches.rebuild(conn, archived=False)
+
+
+def _replica_heartbeat(conn):
+    if not _has_table(conn, ReplicaHeartbeat.__tablename__):
+        conn.execute(CreateTable(ReplicaHeartbeat.__table__))
+    if conn.execute(select(ReplicaHeartbeat.id)).first() is None:
+        conn.execute(insert(ReplicaHeartbeat).values(id=1, beat_at=utc_now()))
+
+
+def _feedback_search(conn):
+    if conn.dialect.name == "mysql":
+        existing = {ix["name"] for ix in inspect(conn).get_indexes("feedback")}
+        if search.FULLTEXT_INDEX not in existing:
+            # InnoDB can't build a FULLTEXT index with LOCK=NONE: writes to
+            # feedback wait for the build, reads carry on. The first one on a
+            # table also rebuilds it to add the hidden FTS_DOC_ID column.
+            conn.exec_driver_sql(
+                f"ALTER TABLE feedback ADD FULLTEXT INDEX {search.FULLTEXT_INDEX} (description), "
+                "ALGORITHM=INPLACE, LOCK=SHARED"
+            )
+        return
+    if not search.fts5_available(conn):
+        # SQLite built without FTS5: /api/feedback/search falls back to LIKE
+        return
+    created = not _has_table(conn, search.FTS_TABLE)
+    search.create_sqlite_index(conn)
+    if created:
+        search.rebuild(conn)
+
+
+def _feedback_archive(conn):
+    for model in (ArchiveSegment, ArchivedRater):
+        if not _has_table(conn, model.__tablename__):
+            conn.execute(CreateTable(model.__table__))
+
+
+MIGRATIONS = [
+    Migration(1, "feedback_table", _feedback_table),
+    Migration(2, "description_nullable", _description_nullable),
+    Migration(3, "daily_rollups", _daily_rollups),
+    Migration(4, "feedback_indexes", _feedback_indexes, checks=[
+        IndexCheck("report: recent feedback", recent_statement, "ix_feedback_created_at_id"),
+        IndexCheck("report: rating histogram", lambda: histogram_statement(utc_now()),
+                   "ix_feedback_rating_created_at"),
+        IndexCheck("report: rolling-window partial days",
+                   lambda: partial_days_statement(utc_now()), "ix_feedback_created_at_id"),
+        IndexCheck("listing: newest first", lambda: listing_statement(), "ix_feedback_created_at_id"),
+        IndexCheck("listing: by email", lambda: listing_statement(email="someone@example.com"),
+                   "ix_feedback_email_created_at"),
+    ]),
+    Migration(5, "rater_sketches", _rater_sketches, checks=[
+        IndexCheck("report: unique raters in a window",
+                   lambda: sketches.sketch_statement(start=utc_now().date()),
+                   primary_key_of=RaterDailySketch.__tablename__),
+    ]),
+    Migration(6, "replica_heartbeat", _replica_heartbeat),
+    Migration(7, "feedback_search", _feedback_search),
+    Migration(8, "feedback_archive", _feedback_archive),
+]
+
+
+@contextmanager
+def _migration_lock(conn):
+    """Keep two deploys from migrating the same database at once."""
+    if conn.dialect.name == "mysql":
+        acquired = conn.exec_driver_sql(
+            f"SELECT GET_LOCK('{MYSQL_LOCK_NAME}', {MYSQL_LOCK_TIMEOUT})"
+        ).scalar()
+        if acquired != 1:
+            raise MigrationError("Timed out waiting for another migration run to finish")
+        try:
+            yield
+        finally:
+            conn.exec_driver_sql(f"SELECT RELEASE_LOCK('{MYSQL_LOCK_NAME}')")
+    else:
+        # Each SQLite migration runs under BEGIN IMMEDIATE, which already
+        # serializes concurrent runs
+        yield
+
+
+@contextmanager
+def _transaction(conn):
+    """One transaction per migration where DDL is transactional (SQLite).
+
+    MySQL commits every DDL statement implicitly, which is why each
+    migration has to tolerate being re-run after a partial failure.
+    """
+    if conn.dialect.name != "sqlite":
+        yield
+        return
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.exec_driver_sql("ROLLBACK")
+        raise
+    conn.exec_driver_sql("COMMIT")
+
+
+def applied_versions(conn) -> set:
+    if not _has_table(conn, schema_version.name):
+        return set()
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def current_version(conn) -> int:
+    return max(applied_versions(conn), default=0)
+
+
+def _connect(engine):
+    # Transactions are managed explicitly, see _transaction
+    return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def upgrade(engine=None, target: int = None, log=print) -> list:
+    """Apply every pending migration up to target (default: all), in order.
+
+    Returns the migrations that were applied.
+    """
+    engine = engine or default_engine
+    applied = []
+    with _connect(engine) as conn, _migration_lock(conn):
+        migration_metadata.create_all(conn)
+        for migration in MIGRATIONS:
+            if target is not None and migration.version > target:
+                break
+            with _transaction(conn):
+                # Re-read inside the transaction; another run may have got here first
+                if migration.version in applied_versions(conn):
+                    continue
+                log(f"Applying {migration.version:03d} {migration.name}...")
+                migration.upgrade(conn)
+                conn.execute(insert(schema_version).values(
+                    version=migration.version, name=migration.name, applied_at=utc_now()
+                ))
+            applied.append(migration)
+    return applied
+
+
+def run_checks(engine=None) -> list:
+    """Run the EXPLAIN checks of every applied migration; returns the failures."""
+    engine = engine or default_engine
+    failures = []
+    with _connect(engine) as conn:
+        done = applied_versions(conn)
+        for migration in MIGRATIONS:
+            if migration.version not in done:
+                continue
+            for check in migration.checks:
+                failure = check.run(conn)
+                if failure:
+                    failures.append(f"{migration.version:03d} {migration.name}: {failure}")
+    return failures
+
+
+def status(engine=None) -> list:
+    """(version, name, applied) for every known migration."""
+    engine = engine or default_engine
+    with _connect(engine) as conn:
+        done = applied_versions(conn)
+    return [(m.version, m.name, m.version in done) for m in MIGRATIONS]
@@ -1,7 +1,21 @@
+from datetime import datetime, timezone
 from sqlalchemy.sql import func
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, Index
 from .database import Base
 
+
+def utc_now() -> datetime:
+    # Naive UTC, matching what SQLite's CURRENT_TIMESTAMP default stores
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def as_naive_utc(value: datetime) -> datetime:
+    """Convert an aware datetime to the naive UTC form stored in the database."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 class Feedback(Base):
     __tablename__ = "feedback"
 
@@ -13,3 +27,103 @@ class Feedback(Base):
     ip_address = Column(String(100), nullable=True)
     screenshot = Column(String(500), nullable=True)  
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Keyset pagination and date-range filters: ORDER BY created_at, id
+        Index("ix_feedback_created_at_id", "created_at", "id"),
+        # Rating band and per-email browsing, newest first
+        Index("ix_feedback_rating_created_at", "rating", "created_at", "id"),
+        Index("ix_feedback_email_created_at", "email", "created_at", "id"),
+    )
+
+
+class FeedbackDailyRollup(Base):
+    """Per-day summary of feedback, maintained alongside every insert.
+
+    hist_<k> counts ratings in the 0.5-step bucket ((k-1)/2, k/2]; hist_0
+    holds ratings <= 0 and hist_10 everything above 4.5.
+    """
+    __tablename__ = "feedback_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    hist_0 = Column(Integer, nullable=False, default=0)
+    hist_1 = Column(Integer, nullable=False, default=0)
+    hist_2 = Column(Integer, nullable=False, default=0)
+    hist_3 = Column(Integer, nullable=False, default=0)
+    hist_4 = Column(Integer, nullable=False, default=0)
+    hist_5 = Column(Integer, nullable=False, default=0)
+    hist_6 = Column(Integer, nullable=False, default=0)
+    hist_7 = Column(Integer, nullable=False, default=0)
+    hist_8 = Column(Integer, nullable=False, default=0)
+    hist_9 = Column(Integer, nullable=False, default=0)
+    hist_10 = Column(Integer, nullable=False, default=0)
+
+
+class RaterDailySketch(Base):
+    """HyperLogLog registers of the emails that left feedback on one day.
+
+    Only non-zero registers are stored; a window's sketch is the per-register
+    MAX over its days.
+    """
+    __tablename__ = "rater_daily_sketch"
+
+    day = Column(Date, primary_key=True)
+    register = Column(Integer, primary_key=True, autoincrement=False)
+    max_rank = Column(Integer, nullable=False)
+
+
+class RaterSketch(Base):
+    """All-time HyperLogLog registers, so the overall count reads at most one row per register."""
+    __tablename__ = "rater_sketch"
+
+    register = Column(Integer, primary_key=True, autoincrement=False)
+    max_rank = Column(Integer, nullable=False)
+
+
+class ArchiveSegment(Base):
+    """One immutable Parquet file of feedback rows moved out of the feedback table.
+
+    count, rating_sum and hist_<k> (same buckets as FeedbackDailyRollup)
+    summarize the file, so all-time figures never have to read it.
+    """
+    __tablename__ = "feedback_archive_segment"
+
+    id = Column(Integer, primary_key=True)
+    location = Column(String(500), nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    bytes = Column(Integer, nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    first_created_at = Column(DateTime, nullable=False)
+    last_created_at = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+    rating_sum = Column(Float, nullable=False)
+    hist_0 = Column(Integer, nullable=False, default=0)
+    hist_1 = Column(Integer, nullable=False, default=0)
+    hist_2 = Column(Integer, nullable=False, default=0)
+    hist_3 = Column(Integer, nullable=False, default=0)
+    hist_4 = Column(Integer, nullable=False, default=0)
+    hist_5 = Column(Integer, nullable=False, default=0)
+    hist_6 = Column(Integer, nullable=False, default=0)
+    hist_7 = Column(Integer, nullable=False, default=0)
+    hist_8 = Column(Integer, nullable=False, default=0)
+    hist_9 = Column(Integer, nullable=False, default=0)
+    hist_10 = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime, nullable=False)
+
+
+class ArchivedRater(Base):
+    """Every distinct email among archived rows, for the exact all-time unique rater count."""
+    __tablename__ = "archived_rater"
+
+    email = Column(String(255), primary_key=True)
+
+
+class ReplicaHeartbeat(Base):
+    """A single row the primary keeps touching; how far behind it a replica's copy is gives its lag."""
+    __tablename__ = "replica_heartbeat"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    beat_at = Column(DateTime, nullable=False)
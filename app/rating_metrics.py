@@ -0,0 +1,80 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Ratings at or above this count as satisfied (CSAT%)
+CSAT_MIN_RATING = float(os.getenv("CSAT_MIN_RATING", "4"))
+# NPS-style bands. A 0.5-step rating doubled is a 0-10 score, so the NPS
+# cut-offs carry over: promoters 9-10 (>= 4.5), detractors 0-6 (<= 3)
+PROMOTER_MIN_RATING = float(os.getenv("PROMOTER_MIN_RATING", "4.5"))
+DETRACTOR_MAX_RATING = float(os.getenv("DETRACTOR_MAX_RATING", "3"))
+
+# Everything here works on the 11-slot histogram of app/rollups.py: slot k
+# holds ratings in ((k-1)/2, k/2], so for ratings on the 0.5 grid it is an
+# exact count of rating == k/2 and every figure below is exact. A rating off
+# the grid counts as the half step above it, as in the distribution.
+
+
+def slot_rating(k: int) -> float:
+    return k / 2
+
+
+def histogram_labels(hist: list) -> dict:
+    """{"0.5": n, "1": n, ..., "5": n}; "0" (ratings <= 0) only when non-empty."""
+    return {f"{slot_rating(k):g}": n for k, n in enumerate(hist) if k or n}
+
+
+def _rating_at(hist: list, rank: int) -> float:
+    """The rank-th smallest rating (1-based)."""
+    seen = 0
+    for k, n in enumerate(hist):
+        seen += n
+        if seen >= rank:
+            return slot_rating(k)
+    raise ValueError(f"Rank {rank} is past the {seen} ratings in the histogram")
+
+
+def median(hist: list) -> float:
+    """Middle rating, or the mean of the two middle ones (as statistics.median)."""
+    count = sum(hist)
+    if count % 2:
+        return _rating_at(hist, count // 2 + 1)
+    return (_rating_at(hist, count // 2) + _rating_at(hist, count // 2 + 1)) / 2
+
+
+def percentile(hist: list, percent: int) -> float:
+    """Nearest-rank percentile: the smallest rating with at least `percent`% of ratings at or below it."""
+    count = sum(hist)
+    # Integer ceil(percent * count / 100), free of float rounding
+    return _rating_at(hist, max(1, -(-percent * count // 100)))
+
+
+def share(hist: list, condition) -> float:
+    """Percentage of ratings whose slot rating satisfies condition."""
+    count = sum(hist)
+    return 100 * sum(n for k, n in enumerate(hist) if condition(slot_rating(k))) / count
+
+
+def summarize(hist: list) -> dict:
+    """Median, p10/p90 and the satisfied, promoter and detractor shares, in one pass per figure over the slots.
+
+    Every figure is None for an empty histogram.
+    """
+    count = sum(hist)
+    if not count:
+        return {"count": 0, "median": None, "p10": None, "p90": None, "csat_pct": None,
+                "promoter_pct": None, "detractor_pct": None, "nps": None}
+    promoters = share(hist, lambda rating: rating >= PROMOTER_MIN_RATING)
+    detractors = share(hist, lambda rating: rating <= DETRACTOR_MAX_RATING)
+    return {
+        "count": count,
+        "median": median(hist),
+        "p10": percentile(hist, 10),
+        "p90": percentile(hist, 90),
+        "csat_pct": round(share(hist, lambda rating: rating >= CSAT_MIN_RATING), 2),
+        "promoter_pct": round(promoters, 2),
+        "detractor_pct": round(detractors, 2),
+        "nps": round(promoters - detractors, 2),
+    }
@@ -0,0 +1,282 @@
+import os
+import time
+import itertools
+import threading
+import logging
+from datetime import timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.concurrency import run_in_threadpool
+
+from . import db_profiles
+from .database import (
+    DATABASE_ASYNC, AsyncSessionLocal, SessionLocal, async_database_url, engine as primary_engine, engine_profile,
+)
+from .models import ReplicaHeartbeat, utc_now
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated read replica URLs; with none, reads go to the primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Reads use a replica at most this many seconds behind the primary
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+# How often each worker re-measures replica lag; the primary's heartbeat
+# advances at the same pace. Keep it well under REPLICA_MAX_LAG_SECONDS: a
+# replica that hasn't applied the newest heartbeat yet counts as lagging by
+# the age of the one it has.
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "3"))
+
+HEARTBEAT_ID = 1
+
+
+def _connect_args(url: str, asyncio: bool = False) -> dict:
+    dialect = make_url(url).get_backend_name()
+    if dialect == "sqlite":
+        return {} if asyncio else {"check_same_thread": False}
+    if dialect in ("mysql", "mariadb"):
+        return {"connect_timeout": REPLICA_CONNECT_TIMEOUT}
+    return {}
+
+
+def _heartbeat_statement():
+    return select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.id == HEARTBEAT_ID)
+
+
+class Replica:
+    """One read replica: its engines, last measured lag and read counters."""
+
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.stats = db_profiles.EngineStats()
+        self.engine = create_engine(
+            url, connect_args=_connect_args(url),
+            **db_profiles.engine_options(url, engine_profile, self.stats),
+        )
+        db_profiles.install(self.engine, engine_profile, self.stats)
+        self._watch(self.engine)
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+        self.async_engine = None
+        self.async_sessions = None
+        if DATABASE_ASYNC:
+            async_url = async_database_url(url)
+            self.async_engine = create_async_engine(
+                async_url, connect_args=_connect_args(url, asyncio=True),
+                **db_profiles.engine_options(async_url, engine_profile, self.stats, asyncio=True),
+            )
+            db_profiles.install(self.async_engine.sync_engine, engine_profile, self.stats)
+            self._watch(self.async_engine.sync_engine)
+            self.async_sessions = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+
+        self._lock = threading.Lock()
+        self.lag = None  # seconds behind the primary; None = unknown or unreachable
+        self.error = None
+        self.reads = 0
+        self.failures = 0
+
+    def _watch(self, sync_engine):
+        @event.listens_for(sync_engine, "handle_error")
+        def mark_unreachable(context):
+            # Lost connections take the replica out of rotation until the next check
+            if context.is_disconnect:
+                self.mark_down(context.original_exception)
+
+    def usable(self, max_lag: float) -> bool:
+        lag = self.lag
+        return lag is not None and lag <= max_lag
+
+    def measure(self, primary_beat, now):
+        """Zero when this replica has the primary's latest heartbeat, otherwise
+        the time since the heartbeat it does have (an upper bound on its lag)."""
+        try:
+            with self.engine.connect() as conn:
+                beat = conn.execute(_heartbeat_statement()).scalar()
+        except Exception as e:
+            self.mark_down(e)
+            return
+        with self._lock:
+            if beat is None or primary_beat is None:
+                self.lag, self.error = None, "no heartbeat row (run scripts/migrate.py on the primary)"
+            else:
+                lag = 0.0 if beat >= primary_beat else max(0.0, (now - beat).total_seconds())
+                self.lag, self.error = lag, None
+
+    def mark_down(self, error):
+        with self._lock:
+            self.lag = None
+            self.error = str(error).splitlines()[0][:200] if str(error) else type(error).__name__
+            self.failures += 1
+
+    def count_read(self):
+        with self._lock:
+            self.reads += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "url": self.name,
+                "lag_seconds": self.lag,
+                "error": self.error,
+                "reads": self.reads,
+                "failures": self.failures,
+                "pool": self.stats.to_dict(),
+            }
+
+
+class ReadRouter:
+    """Picks the engine for read-only work: a replica that is reachable and
+    within the staleness tolerance (round-robin between them), otherwise the
+    primary.
+
+    Lag is re-measured at most every check_seconds, by whichever request
+    finds the measurement due; concurrent requests keep using the previous
+    one instead of waiting.
+    """
+
+    def __init__(self, urls=None, max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 check_seconds: float = REPLICA_CHECK_SECONDS):
+        self.replicas = [Replica(url) for url in (DATABASE_REPLICA_URLS if urls is None else urls)]
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        self._checked_at = None
+        self._check_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._turn = itertools.count()
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    def check_due(self) -> bool:
+        return bool(self.replicas) and (
+            self._checked_at is None or time.monotonic() - self._checked_at >= self.check_seconds
+        )
+
+    def refresh(self, force: bool = False):
+        """Advance the primary's heartbeat and re-measure every replica's lag."""
+        if not self.replicas or not self._check_lock.acquire(blocking=force):
+            return
+        try:
+            if not force and not self.check_due():
+                return
+            primary_beat = self._beat_primary()
+            now = utc_now()
+            for replica in self.replicas:
+                replica.measure(primary_beat, now)
+            self._checked_at = time.monotonic()
+        finally:
+            self._check_lock.release()
+
+    def _beat_primary(self):
+        """Return the heartbeat replicas can already have applied, then move it forward if it's due."""
+        now = utc_now()
+        try:
+            with primary_engine.begin() as conn:
+                beat = conn.execute(_heartbeat_statement()).scalar()
+                if beat is not None and now - beat >= timedelta(seconds=self.check_seconds):
+                    # Only the first worker to get here advances it
+                    conn.execute(
+                        update(ReplicaHeartbeat)
+                        .where(ReplicaHeartbeat.id == HEARTBEAT_ID, ReplicaHeartbeat.beat_at == beat)
+                        .values(beat_at=now)
+                    )
+            return beat
+        except Exception as e:
+            logger.error("Error updating replica heartbeat: %s", e)
+            return None
+
+    def choose(self, max_lag: float = None):
+        max_lag = self.max_lag if max_lag is None else max_lag
+        usable = [replica for replica in self.replicas if replica.usable(max_lag)]
+        if not usable:
+            return None
+        return usable[next(self._turn) % len(usable)]
+
+    def _count(self, field: str):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def session(self, max_lag: float = None):
+        """A sync Session for reads: on a replica within max_lag seconds, or on the primary."""
+        self.refresh()
+        replica = self.choose(max_lag)
+        if replica is not None:
+            db = replica.sessions()
+            try:
+                # Connect up front so an unreachable replica falls back here, not mid-query
+                db.connection()
+                replica.count_read()
+                return db
+            except Exception as e:
+                db.close()
+                replica.mark_down(e)
+                self._count("fallbacks")
+        self._count("primary_reads")
+        return SessionLocal()
+
+    async def async_session(self, max_lag: float = None):
+        """AsyncSession counterpart of session()."""
+        if self.check_due():
+            await run_in_threadpool(self.refresh)
+        replica = self.choose(max_lag)
+        if replica is not None and replica.async_sessions is not None:
+            db = replica.async_sessions()
+            try:
+                await db.connection()
+                replica.count_read()
+                return db
+            except Exception as e:
+                await db.close()
+                replica.mark_down(e)
+                self._count("fallbacks")
+        self._count("primary_reads")
+        return AsyncSessionLocal()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = {
+                "max_lag_seconds": self.max_lag,
+                "primary_reads": self.primary_reads,
+                "fallbacks": self.fallbacks,
+            }
+        stats["replicas"] = [replica.to_dict() for replica in self.replicas]
+        return stats
+
+    async def dispose_async(self):
+        for replica in self.replicas:
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+            replica.engine.dispose()
+
+
+read_router = ReadRouter()
+
+
+def get_read_db():
+    """get_db for read-only routes: a replica when one is fresh enough."""
+    db = read_router.session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_read_session():
+    """get_session for read-only async routes."""
+    if AsyncSessionLocal is None:
+        db = await run_in_threadpool(read_router.session)
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+        return
+    db = await read_router.async_session()
+    try:
+        yield db
+    finally:
+        await db.close()
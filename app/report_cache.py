@@ -0,0 +1,165 @@
+import os
+import time
+import hashlib
+import asyncio
+import tempfile
+import threading
+import logging
+from dotenv import load_dotenv
+
+from .responses import dumps
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds a built report may be served for; 0 disables the cache
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "30"))
+# Shared by every gunicorn worker on the host; bumped on each new submission
+REPORT_CACHE_STAMP = os.getenv(
+    "REPORT_CACHE_STAMP", os.path.join(tempfile.gettempdir(), "csat-report-cache.stamp")
+)
+STAMP_MAX_BYTES = 1024 * 1024
+
+
+class VersionStamp:
+    """A data version shared between processes through one small file.
+
+    Every bump appends a byte with O_APPEND, which is atomic across processes,
+    so (inode, size) changes on each bump and can be read with a single stat().
+    The file is swapped for a fresh one once it grows past STAMP_MAX_BYTES;
+    the new inode is itself a version change.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def current(self) -> tuple:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return (0, 0)
+        return (st.st_ino, st.st_size)
+
+    def bump(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b".")
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size >= STAMP_MAX_BYTES:
+            fresh = f"{self.path}.{os.getpid()}"
+            open(fresh, "wb").close()
+            os.replace(fresh, self.path)
+
+
+class CachedReport:
+    def __init__(self, version: tuple, payload: dict, headers: dict):
+        self.version = version
+        self.built_at = time.monotonic()
+        # Serialized once per build and served as is on every hit
+        self.body = dumps(payload)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.headers = headers
+
+    def matches(self, if_none_match: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags or f"W/{self.etag}" in tags
+
+
+class ReportCache:
+    """Per-worker cache of the built report, invalidated across workers by a VersionStamp."""
+
+    def __init__(self, ttl: float = REPORT_CACHE_TTL, stamp_path: str = REPORT_CACHE_STAMP):
+        self.ttl = ttl
+        self.stamp = VersionStamp(stamp_path)
+        self._entry = None
+        self._lock = threading.Lock()
+        self._async_lock = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _fresh(self, entry, version) -> bool:
+        return (
+            entry is not None
+            and entry.version == version
+            and time.monotonic() - entry.built_at < self.ttl
+        )
+
+    def get_or_build(self, build_fn):
+        """Return (CachedReport, hit). build_fn() -> (payload, headers) runs on a miss."""
+        version = self.stamp.current()
+        entry = self._entry
+        if self.enabled and self._fresh(entry, version):
+            self.hits += 1
+            return entry, True
+
+        # One build per worker at a time; concurrent requests wait for it
+        with self._lock:
+            entry = self._entry
+            if self.enabled and self._fresh(entry, version):
+                self.hits += 1
+                return entry, True
+            self.misses += 1
+            payload, headers = build_fn()
+            entry = CachedReport(version, payload, headers)
+            if self.enabled:
+                self._entry = entry
+            return entry, False
+
+    async def get_or_build_async(self, build_fn):
+        """get_or_build for async routes: build_fn is a coroutine function.
+
+        Waiting for another request's build suspends instead of blocking the
+        event loop (a threading lock held across an await would deadlock it).
+        """
+        version = self.stamp.current()
+        entry = self._entry
+        if self.enabled and self._fresh(entry, version):
+            self.hits += 1
+            return entry, True
+
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            entry = self._entry
+            if self.enabled and self._fresh(entry, version):
+                self.hits += 1
+                return entry, True
+            self.misses += 1
+            payload, headers = await build_fn()
+            entry = CachedReport(version, payload, headers)
+            if self.enabled:
+                self._entry = entry
+            return entry, False
+
+    def invalidate(self):
+        self.invalidations += 1
+        self._entry = None
+        try:
+            self.stamp.bump()
+        except OSError as e:
+            logger.error("Failed to bump report cache stamp: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,198 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, case, or_
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from .models import Feedback, FeedbackDailyRollup, utc_now
+from . import archive, rating_metrics, rollups, sketches
+
+load_dotenv()
+
+# Read aggregates from feedback_daily_rollup instead of scanning feedback.
+# Run scripts/rebuild_rollups.py once before switching this on.
+REPORT_USE_ROLLUPS = os.getenv("REPORT_USE_ROLLUPS", "false").lower() == "true"
+
+# Rolling windows (in days) reported as avg_rating_last_<n>_days
+ROLLING_WINDOWS = (30, 60, 90)
+RECENT_LIMIT = 5
+
+
+class ReportBuild:
+    """A built report payload together with how much it cost to build."""
+
+    def __init__(self):
+        self.payload = None
+        self.query_count = 0
+        self.elapsed_ms = 0.0
+
+    def execute(self, db: Session, stmt):
+        self.query_count += 1
+        return db.execute(stmt)
+
+    def headers(self) -> dict:
+        return {
+            "X-Report-Queries": str(self.query_count),
+            "X-Report-Build-Ms": f"{self.elapsed_ms:.2f}",
+            "Server-Timing": f"report;dur={self.elapsed_ms:.2f}",
+        }
+
+
+def _avg(total: float, count: int) -> float:
+    return total / count if count else 0.0
+
+
+def histogram_statement(now: datetime):
+    """Count and rating sum per distinct rating, all time and in each rolling window.
+
+    Grouped on rating, so it is answered from ix_feedback_rating_created_at
+    without a sort, and returns one row per rating value (eleven at most
+    for 0.5-step ratings) to be folded into the 0.5-step histogram.
+    """
+    columns = [
+        Feedback.rating.label("rating"),
+        func.count().label("count"),
+        func.sum(Feedback.rating).label("rating_sum"),
+    ]
+    for days in ROLLING_WINDOWS:
+        in_window = Feedback.created_at >= now - timedelta(days=days)
+        columns.append(func.count(case((in_window, 1))).label(f"count_{days}"))
+        columns.append(func.coalesce(func.sum(case((in_window, Feedback.rating))), 0.0).label(f"sum_{days}"))
+    return select(*columns).group_by(Feedback.rating)
+
+
+# Only what the report shows; ip_address and screenshot stay in the table
+RECENT_COLUMNS = (Feedback.id, Feedback.name, Feedback.email, Feedback.rating, Feedback.description,
+                  Feedback.created_at)
+
+
+def recent_statement(limit: int = RECENT_LIMIT):
+    return select(*RECENT_COLUMNS).order_by(Feedback.created_at.desc()).limit(limit)
+
+
+def partial_days_statement(now: datetime):
+    """Count, rating sum and histogram of the raw rows between each window's cutoff and the end of that day."""
+    partial_ranges = {}
+    for days in ROLLING_WINDOWS:
+        cutoff = now - timedelta(days=days)
+        day_end = datetime.combine(cutoff.date() + timedelta(days=1), datetime.min.time())
+        partial_ranges[days] = (Feedback.created_at >= cutoff) & (Feedback.created_at < day_end)
+    columns = []
+    for days, in_range in partial_ranges.items():
+        columns.append(func.count(case((in_range, 1))).label(f"count_{days}"))
+        columns.append(func.coalesce(func.sum(case((in_range, Feedback.rating))), 0.0).label(f"sum_{days}"))
+        for k, field in enumerate(rollups.HIST_FIELDS):
+            columns.append(
+                func.count(case((in_range & rollups.histogram_condition(k), 1))).label(f"{field}_{days}")
+            )
+    return select(*columns).where(or_(*partial_ranges.values()))
+
+
+def _unique_raters(build: ReportBuild, db: Session) -> int:
+    if sketches.ENABLED:
+        return sketches.estimate_rows(build.execute(db, sketches.sketch_statement()).all())
+    return build.execute(db, sketches.exact_statement()).scalar() or 0
+
+
+def _add(delta: rollups.RollupDelta, k: int, count: int, rating_sum: float):
+    delta.count += count
+    delta.rating_sum += rating_sum
+    delta.hist[k] += count
+
+
+def _aggregate_raw(build: ReportBuild, db: Session, now: datetime) -> dict:
+    # Archived rows are all older than the rolling windows; the segment
+    # catalog adds them to the all-time figures without reading them
+    archived = build.execute(db, archive.totals_statement()).one()
+    total = rollups.RollupDelta()
+    for k, field in enumerate(rollups.HIST_FIELDS):
+        _add(total, k, getattr(archived, field), 0.0)
+    total.rating_sum = archived.rating_sum
+
+    windows = {days: rollups.RollupDelta() for days in ROLLING_WINDOWS}
+    for row in build.execute(db, histogram_statement(now)):
+        k = rollups.histogram_index(row.rating)
+        _add(total, k, row.count, row.rating_sum)
+        for days, delta in windows.items():
+            _add(delta, k, getattr(row, f"count_{days}"), getattr(row, f"sum_{days}"))
+    return {"total": total, "windows": windows, "unique_raters": _unique_raters(build, db)}
+
+
+def _aggregate_rollups(build: ReportBuild, db: Session, now: datetime) -> dict:
+    # Whole days come from the rollup table; only the partial first day of
+    # each rolling window is read from feedback, so results stay exact.
+    cutoffs = {days: now - timedelta(days=days) for days in ROLLING_WINDOWS}
+
+    columns = [
+        func.coalesce(func.sum(FeedbackDailyRollup.count), 0).label("count"),
+        func.coalesce(func.sum(FeedbackDailyRollup.rating_sum), 0.0).label("rating_sum"),
+    ]
+    for days, cutoff in cutoffs.items():
+        after = FeedbackDailyRollup.day > cutoff.date()
+        columns.append(func.coalesce(func.sum(case((after, FeedbackDailyRollup.count))), 0).label(f"count_{days}"))
+        columns.append(func.coalesce(func.sum(case((after, FeedbackDailyRollup.rating_sum))), 0.0).label(f"sum_{days}"))
+        for field in rollups.HIST_FIELDS:
+            column = getattr(FeedbackDailyRollup, field)
+            columns.append(func.coalesce(func.sum(case((after, column))), 0).label(f"{field}_{days}"))
+    for field in rollups.HIST_FIELDS:
+        columns.append(func.coalesce(func.sum(getattr(FeedbackDailyRollup, field)), 0).label(field))
+    totals = build.execute(db, select(*columns)).one()
+
+    partial = build.execute(db, partial_days_statement(now)).one()
+
+    unique_raters = _unique_raters(build, db)
+
+    total = rollups.RollupDelta()
+    total.count = totals.count
+    total.rating_sum = totals.rating_sum
+    total.hist = [getattr(totals, field) for field in rollups.HIST_FIELDS]
+    windows = {}
+    for days in ROLLING_WINDOWS:
+        delta = windows[days] = rollups.RollupDelta()
+        delta.count = getattr(totals, f"count_{days}") + getattr(partial, f"count_{days}")
+        delta.rating_sum = getattr(totals, f"sum_{days}") + getattr(partial, f"sum_{days}")
+        delta.hist = [
+            getattr(totals, f"{field}_{days}") + getattr(partial, f"{field}_{days}") for field in rollups.HIST_FIELDS
+        ]
+    return {"total": total, "windows": windows, "unique_raters": unique_raters}
+
+
+def build_report(db: Session, now: datetime = None, use_rollups: bool = None) -> ReportBuild:
+    build = ReportBuild()
+    started = time.perf_counter()
+    # created_at is naive UTC (see utc_now), so the windows end at UTC now
+    now = now or utc_now()
+    if use_rollups is None:
+        use_rollups = REPORT_USE_ROLLUPS
+
+    if use_rollups:
+        aggregates = _aggregate_rollups(build, db, now)
+    else:
+        aggregates = _aggregate_raw(build, db, now)
+
+    # Plain rows rather than ORM objects: no identity map, no attribute instrumentation
+    recent_list = []
+    for row in build.execute(db, recent_statement()):
+        item = row._asdict()
+        item["created_at"] = row.created_at.isoformat() if row.created_at else None
+        recent_list.append(item)
+
+    total, windows = aggregates["total"], aggregates["windows"]
+    payload = {
+        "total_avg_rating": round(float(_avg(total.rating_sum, total.count)), 2),
+    }
+    for days in ROLLING_WINDOWS:
+        payload[f"avg_rating_last_{days}_days"] = round(float(_avg(windows[days].rating_sum, windows[days].count)), 2)
+    payload["unique_rating_count"] = aggregates["unique_raters"]
+    payload["distribution"] = rollups.distribution(total.hist)
+    payload["histogram"] = rating_metrics.histogram_labels(total.hist)
+    payload["metrics"] = {"all_time": rating_metrics.summarize(total.hist)}
+    for days in ROLLING_WINDOWS:
+        payload["metrics"][f"last_{days}_days"] = rating_metrics.summarize(windows[days].hist)
+    payload["recent_feedback"] = recent_list
+
+    build.payload = payload
+    build.elapsed_ms = (time.perf_counter() - started) * 1000
+    return build
@@ -0,0 +1,370 @@
+import os
+import json
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+from . import rating_metrics, rollups
+from .responses import dumps
+from .state import CSAT_STATE_DIR, open_private
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Publish a delta for every committed submission to /api/report/stream
+REPORT_STREAM_ENABLED = os.getenv("REPORT_STREAM_ENABLED", "true").lower() == "true"
+# Append-only event log shared by every gunicorn worker on the host. Events
+# carry the submitter's name, email and description, so it is private to the
+# app's user (see app/state.py).
+REPORT_STREAM_LOG = os.getenv("REPORT_STREAM_LOG", os.path.join(CSAT_STATE_DIR, "report-events.log"))
+# Past this size the log moves to <log>.1 and a new one starts; clients can
+# resume from either
+REPORT_STREAM_LOG_MAX_BYTES = int(os.getenv("REPORT_STREAM_LOG_MAX_BYTES", str(8 * 1024 * 1024)))
+# How often each worker checks the log (one stat per worker, whatever the
+# number of connected dashboards)
+REPORT_STREAM_POLL_SECONDS = float(os.getenv("REPORT_STREAM_POLL_SECONDS", "0.25"))
+# Comment frame sent on idle streams so proxies keep them open
+REPORT_STREAM_HEARTBEAT_SECONDS = float(os.getenv("REPORT_STREAM_HEARTBEAT_SECONDS", "15"))
+# Events queued per client; a client that falls further behind gets a single
+# "reset" (refetch /api/report) instead
+REPORT_STREAM_CLIENT_BUFFER = int(os.getenv("REPORT_STREAM_CLIENT_BUFFER", "256"))
+# Streams are closed after this long and the client reconnects with
+# Last-Event-ID. Keep it under gunicorn's graceful timeout (30 s): an open
+# stream would otherwise hold a stopping worker until it is killed.
+REPORT_STREAM_MAX_SECONDS = float(os.getenv("REPORT_STREAM_MAX_SECONDS", "25"))
+# Reconnect delay suggested to EventSource clients
+REPORT_STREAM_RETRY_MS = int(os.getenv("REPORT_STREAM_RETRY_MS", "1000"))
+
+READ_CHUNK = 1024 * 1024
+
+
+def feedback_event(row: dict, feedback_id: int = None) -> dict:
+    """The new row plus what it adds to the report's counters."""
+    delta = rollups.RollupDelta()
+    delta.add(row["rating"])
+    return {
+        "type": "feedback",
+        "feedback": {
+            "id": feedback_id,  # None for rows committed by the write buffer
+            "name": row["name"],
+            "email": row["email"],
+            "rating": row["rating"],
+            "description": row["description"],
+            "created_at": row["created_at"].isoformat(),
+        },
+        "delta": {
+            "count": delta.count,
+            "rating_sum": delta.rating_sum,
+            "distribution": {key: n for key, n in rollups.distribution(delta.hist).items() if n},
+            # Added to the report's histogram, keeps its metrics current
+            "histogram": {key: n for key, n in rating_metrics.histogram_labels(delta.hist).items() if n},
+        },
+    }
+
+
+class EventLog:
+    """Append-only file of JSON lines written by every worker on the host.
+
+    Each append is one write() with O_APPEND, so lines from different
+    processes never interleave. An event's id is "<inode>:<offset after its
+    line>", which every worker derives the same way, so a client can resume
+    on any of them.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def _open(self) -> int:
+        return open_private(self.path, os.O_WRONLY | os.O_APPEND)
+
+    def touch(self):
+        os.close(self._open())
+
+    def append(self, events: list):
+        data = b"".join(dumps(event) + b"\n" for event in events)
+        fd = self._open()
+        try:
+            os.write(fd, data)
+            st = os.fstat(fd)
+        finally:
+            os.close(fd)
+        if st.st_size >= self.max_bytes:
+            self._rotate(st.st_ino)
+
+    def _rotate(self, inode: int):
+        # Only move the file this worker just wrote to; another worker may
+        # have rotated it already
+        try:
+            if os.stat(self.path).st_ino == inode:
+                os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            pass
+
+
+def read_lines(fd: int, start: int, end: int = None):
+    """[(offset after the line, line)] for the complete lines in fd from start (to end)."""
+    lines = []
+    offset = start
+    pending = b""
+    while end is None or offset < end:
+        size = READ_CHUNK if end is None else min(READ_CHUNK, end - offset)
+        chunk = os.pread(fd, size, offset)
+        if not chunk:
+            break
+        offset += len(chunk)
+        pending += chunk
+        position = offset - len(pending)
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            position += len(line) + 1
+            if line:
+                lines.append((position, line))
+    return lines
+
+
+def _frame(event_id: str, line: bytes) -> bytes:
+    event_type = json.loads(line).get("type", "message")
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (event_id.encode(), event_type.encode(), line)
+
+
+def _reset_frame(event_id: str, reason: str) -> bytes:
+    return b"id: %s\nevent: reset\ndata: %s\n\n" % (event_id.encode(), dumps({"reason": reason}))
+
+
+class Subscriber:
+    """One connected client: a bounded queue of ready-to-send frames."""
+
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize)
+
+    def offer(self, event_id: str, frame: bytes) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+        # Too far behind: drop what it hasn't read and have it refetch the
+        # report, resuming after this event
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_reset_frame(event_id, "client too slow"))
+        return False
+
+
+class ReportStream:
+    """Fans report deltas out to the dashboards connected to this worker.
+
+    Submissions in any worker append to the shared EventLog; each worker runs
+    one task that tails it and hands every new event, framed once, to all of
+    its subscribers. Nothing here queries the database.
+    """
+
+    def __init__(self, log: EventLog, poll_seconds: float = REPORT_STREAM_POLL_SECONDS,
+                 client_buffer: int = REPORT_STREAM_CLIENT_BUFFER,
+                 heartbeat_seconds: float = REPORT_STREAM_HEARTBEAT_SECONDS,
+                 max_seconds: float = REPORT_STREAM_MAX_SECONDS, enabled: bool = REPORT_STREAM_ENABLED):
+        self.log = log
+        self.poll_seconds = poll_seconds
+        self.client_buffer = client_buffer
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_seconds = max_seconds
+        self.enabled = enabled
+        self.subscribers = set()
+        self._task = None
+        self._loop = None
+        self._fd = None
+        self._inode = None
+        self._offset = 0
+        self._rotated = False
+        self.published = 0
+        self.publish_errors = 0
+        self.delivered = 0
+        self.resets = 0
+        self.replayed = 0
+        self.connections = 0
+
+    # Publishing (any thread)
+
+    def publish(self, events: list):
+        if not self.enabled or not events:
+            return
+        try:
+            self.log.append(events)
+            self.published += len(events)
+        except OSError as e:
+            self.publish_errors += 1
+            logger.error("Failed to publish report events: %s", e)
+
+    def publish_feedback(self, rows: list, ids: list = None):
+        ids = ids or [None] * len(rows)
+        self.publish([feedback_event(row, feedback_id) for row, feedback_id in zip(rows, ids)])
+
+    def publish_reset(self, reason: str):
+        """Tell every dashboard to refetch the report (bulk changes)."""
+        self.publish([{"type": "reset", "reason": reason}])
+
+    # Tailing (event loop)
+
+    def position(self) -> str:
+        return f"{self._inode or 0}:{self._offset}"
+
+    def _open_current(self, at_end: bool):
+        self.log.touch()
+        fd = os.open(self.log.path, os.O_RDONLY)
+        st = os.fstat(fd)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd, self._inode = fd, st.st_ino
+        self._offset = st.st_size if at_end else 0
+        self._rotated = False
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        if self._fd is None:
+            self._open_current(at_end=True)
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                self._poll()
+            except OSError as e:
+                logger.error("Failed to read report events: %s", e)
+
+    def _poll(self):
+        lines = read_lines(self._fd, self._offset)
+        if lines:
+            self._offset = lines[-1][0]
+            for end, line in lines:
+                self._broadcast(f"{self._inode}:{end}", line)
+        try:
+            current = os.stat(self.log.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != self._inode:
+            # Rotated: read the old file for one more poll, in case a writer
+            # opened it just before the rename, then follow the new one
+            if self._rotated:
+                self._open_current(at_end=False)
+                self._poll()
+            else:
+                self._rotated = True
+
+    def _broadcast(self, event_id: str, line: bytes):
+        if not self.subscribers:
+            return
+        frame = _frame(event_id, line)
+        for subscriber in self.subscribers:
+            if subscriber.offer(event_id, frame):
+                self.delivered += 1
+            else:
+                self.resets += 1
+
+    def _replay(self, last_event_id: str):
+        """Frames the client missed since last_event_id, or None when they can't be replayed."""
+        try:
+            inode, offset = (int(part) for part in last_event_id.split(":"))
+        except ValueError:
+            return None
+        if inode == self._inode:
+            if offset > self._offset:
+                return None
+            lines = [(f"{inode}:{end}", line) for end, line in read_lines(self._fd, offset, self._offset)]
+        else:
+            # Resuming from the previous generation of the log
+            try:
+                fd = os.open(self.log.path + ".1", os.O_RDONLY)
+            except FileNotFoundError:
+                return None
+            try:
+                if os.fstat(fd).st_ino != inode or self._rotated:
+                    return None
+                lines = [(f"{inode}:{end}", line) for end, line in read_lines(fd, offset)]
+            finally:
+                os.close(fd)
+            lines += [(f"{self._inode}:{end}", line) for end, line in read_lines(self._fd, 0, self._offset)]
+        if len(lines) > self.client_buffer:
+            return None
+        return [_frame(event_id, line) for event_id, line in lines]
+
+    def subscribe(self, last_event_id: str = None) -> Subscriber:
+        """Register a client; with last_event_id, queue what it missed first.
+
+        Runs without awaiting, so no event can slip between the replay and
+        the live feed.
+        """
+        self._ensure_started()
+        subscriber = Subscriber(self.client_buffer)
+        if last_event_id:
+            frames = self._replay(last_event_id)
+            if frames is None:
+                subscriber.queue.put_nowait(_reset_frame(self.position(), "last event id no longer available"))
+                self.resets += 1
+            else:
+                for frame in frames:
+                    subscriber.queue.put_nowait(frame)
+                self.replayed += len(frames)
+        else:
+            # Gives the client an id to resume from even if nothing happens
+            subscriber.queue.put_nowait(b"id: %s\nevent: ready\ndata: {}\n\n" % self.position().encode())
+        self.subscribers.add(subscriber)
+        self.connections += 1
+        return subscriber
+
+    async def frames(self, subscriber: Subscriber):
+        """The SSE body for one client: events, heartbeats, then a clean close after max_seconds."""
+        loop = asyncio.get_running_loop()
+        closes_at = loop.time() + self.max_seconds
+        try:
+            yield b"retry: %d\n\n" % REPORT_STREAM_RETRY_MS
+            while True:
+                remaining = closes_at - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    frame = await asyncio.wait_for(
+                        subscriber.queue.get(), min(self.heartbeat_seconds, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    if closes_at - loop.time() > 0:
+                        yield b": ping\n\n"
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.subscribers.discard(subscriber)
+
+    def close(self):
+        """End every open stream and stop tailing (worker shutdown)."""
+        for subscriber in list(self.subscribers):
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "clients": len(self.subscribers),
+            "connections": self.connections,
+            "published": self.published,
+            "publish_errors": self.publish_errors,
+            "delivered": self.delivered,
+            "replayed": self.replayed,
+            "resets": self.resets,
+        }
+
+
+report_stream = ReportStream(EventLog(REPORT_STREAM_LOG, REPORT_STREAM_LOG_MAX_BYTES))
@@ -0,0 +1,86 @@
+import os
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson (poetry install -E orjson)
+    orjson = None
+
+load_dotenv()
+
+# Serialize API payloads with orjson when it is installed; "false" uses
+# pydantic-core's serializer, which is always available
+JSON_ORJSON = os.getenv("JSON_ORJSON", "true").lower() == "true"
+# /api responses at least this large are gzipped for clients that accept it;
+# 0 disables
+API_GZIP_MIN_BYTES = int(os.getenv("API_GZIP_MIN_BYTES", "1024"))
+# Level 1 gets most of the saving on JSON for a third of level 6's CPU
+# (scripts/bench_json.py)
+API_GZIP_LEVEL = int(os.getenv("API_GZIP_LEVEL", "1"))
+
+# Already compressed, or streamed to the client as it is produced
+API_GZIP_EXCLUDED_TYPES = DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/vnd.apache.parquet",)
+
+
+def json_backend() -> str:
+    return "orjson" if orjson is not None and JSON_ORJSON else "pydantic-core"
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON; datetimes become ISO 8601 strings.
+
+    Both backends produce the same bytes for API payloads, so ETags don't
+    change with the backend.
+    """
+    if orjson is not None and JSON_ORJSON:
+        return orjson.dumps(content)
+    return to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for payloads that are already plain dicts and lists.
+
+    Returning one from a route skips FastAPI's response_model validation and
+    jsonable_encoder pass; response_model still documents the shape.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class APIGZipMiddleware:
+    """GZipMiddleware for /api responses only.
+
+    The frontend is served precompressed (app/frontend.py) and /metrics is
+    left to the scraper. Strong ETags become weak on compressed responses,
+    since the bytes on the wire are no longer the ones the tag was computed
+    from; If-None-Match comparisons accept either form.
+    """
+
+    def __init__(self, app, prefix: str = "/api/", minimum_size: int = API_GZIP_MIN_BYTES,
+                 compresslevel: int = API_GZIP_LEVEL):
+        self.app = app
+        self.prefix = prefix
+        self.gzip = GZipMiddleware(
+            app, minimum_size=minimum_size, compresslevel=compresslevel,
+            exclude_content_types=API_GZIP_EXCLUDED_TYPES,
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        async def weaken_etag(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/") and headers.get("content-encoding") == "gzip":
+                    headers["etag"] = "W/" + etag
+            await send(message)
+
+        await self.gzip(scope, receive, weaken_etag)
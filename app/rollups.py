@@ -0,0 +1,175 @@
+import math
+from datetime import date, datetime
+
+from sqlalchemy import select, insert, update, delete, func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import Feedback, FeedbackDailyRollup
+from . import archive
+
+# Ratings are bucketed in 0.5 steps from 0 to 5 -> 11 histogram slots
+HISTOGRAM_SIZE = 11
+HIST_FIELDS = [f"hist_{k}" for k in range(HISTOGRAM_SIZE)]
+
+
+def histogram_index(rating: float) -> int:
+    # Round up to the next half step so (i-1, i] ranges stay intact
+    return min(max(math.ceil(rating * 2), 0), HISTOGRAM_SIZE - 1)
+
+
+def histogram_condition(k: int, rating=Feedback.rating):
+    """SQL condition equivalent to histogram_index(rating) == k."""
+    if k == 0:
+        return rating <= 0
+    if k == HISTOGRAM_SIZE - 1:
+        return rating > (k - 1) / 2
+    return (rating > (k - 1) / 2) & (rating <= k / 2)
+
+
+def distribution(hist: list) -> dict:
+    """Fold the 11 half-step slots into the report's 1-5 distribution.
+
+    hist_{2i-1} and hist_{2i} together cover (i-1, i]; ratings <= 0 are left out.
+    """
+    return {str(i): hist[2 * i - 1] + hist[2 * i] for i in range(1, 6)}
+
+
+def as_date(value) -> date:
+    # DATE() comes back as a string on SQLite and as a date on MySQL
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+class RollupDelta:
+    """Pending change to one day's rollup row."""
+
+    def __init__(self):
+        self.count = 0
+        self.rating_sum = 0.0
+        self.hist = [0] * HISTOGRAM_SIZE
+
+    def add(self, rating: float):
+        self.count += 1
+        self.rating_sum += rating
+        self.hist[histogram_index(rating)] += 1
+
+    def values(self) -> dict:
+        values = {"count": self.count, "rating_sum": self.rating_sum}
+        values.update(zip(HIST_FIELDS, self.hist))
+        return values
+
+
+def _apply_delta(db: Session, day: date, delta: RollupDelta):
+    increments = {
+        field: getattr(FeedbackDailyRollup, field) + amount
+        for field, amount in delta.values().items() if amount
+    }
+    stmt = update(FeedbackDailyRollup).where(FeedbackDailyRollup.day == day).values(**increments)
+    if db.execute(stmt).rowcount:
+        return
+    try:
+        # First row of the day; another worker may race us to the insert
+        with db.begin_nested():
+            db.execute(insert(FeedbackDailyRollup).values(day=day, **delta.values()))
+    except IntegrityError:
+        db.execute(stmt)
+
+
+def apply_deltas(db: Session, deltas: dict):
+    """Add {day: RollupDelta} to the rollup table inside the caller's transaction."""
+    for day in sorted(deltas):
+        _apply_delta(db, day, deltas[day])
+
+
+def record_feedback(db: Session, created_at: datetime, rating: float):
+    delta = RollupDelta()
+    delta.add(rating)
+    apply_deltas(db, {created_at.date(): delta})
+
+
+def raw_daily_statement(days=None):
+    """Per-day aggregates straight from the feedback table."""
+    day = func.date(Feedback.created_at)
+    columns = [
+        day.label("day"),
+        func.count(Feedback.id).label("count"),
+        func.sum(Feedback.rating).label("rating_sum"),
+    ]
+    for k, field in enumerate(HIST_FIELDS):
+        columns.append(func.count(case((histogram_condition(k), 1))).label(field))
+    stmt = select(*columns).where(Feedback.created_at.isnot(None)).group_by(day)
+    if days is not None:
+        stmt = stmt.where(day.in_([d.isoformat() for d in days]))
+    return stmt
+
+
+def archived_deltas(db: Session, days=None):
+    """{day: RollupDelta} batches for archived rows, read back from the segment files."""
+    for pairs in archive.day_batches(db, "rating", days):
+        deltas = {}
+        for day, rating in pairs:
+            deltas.setdefault(day, RollupDelta()).add(rating)
+        yield deltas
+
+
+def rebuild(db: Session, days=None, archived: bool = True) -> int:
+    """Recompute rollups from raw rows, for every day or only the given days.
+
+    Archived rows still count toward their days, so with `archived` they
+    are added back from the segments. Runs in the caller's transaction;
+    returns the number of rollup rows written.
+    """
+    stmt = delete(FeedbackDailyRollup)
+    if days is not None:
+        days = sorted(set(days))
+        if not days:
+            return 0
+        stmt = stmt.where(FeedbackDailyRollup.day.in_(days))
+    db.execute(stmt)
+
+    source = raw_daily_statement(days).subquery()
+    fields = ["day", "count", "rating_sum"] + HIST_FIELDS
+    db.execute(insert(FeedbackDailyRollup).from_select(fields, select(*[source.c[f] for f in fields])))
+    if archived:
+        for deltas in archived_deltas(db, days):
+            apply_deltas(db, deltas)
+
+    written = select(func.count()).select_from(FeedbackDailyRollup)
+    if days is not None:
+        written = written.where(FeedbackDailyRollup.day.in_(days))
+    return db.execute(written).scalar()
+
+
+def check_consistency(db: Session) -> list:
+    """Compare every rollup row with the raw table (and the archive).
+
+    Returns a list of (day, field, rollup_value, raw_value) mismatches;
+    an empty list means the rollups are consistent.
+    """
+    fields = ["count", "rating_sum"] + HIST_FIELDS
+    raw = {as_date(row.day): {field: getattr(row, field) or 0 for field in fields}
+           for row in db.execute(raw_daily_statement())}
+    for deltas in archived_deltas(db):
+        for day, delta in deltas.items():
+            values = raw.setdefault(day, dict.fromkeys(fields, 0))
+            for field, amount in delta.values().items():
+                values[field] += amount
+    rolled = {row.day: row for row in db.execute(select(FeedbackDailyRollup)).scalars()}
+
+    mismatches = []
+    for day in sorted(set(raw) | set(rolled)):
+        raw_row, rollup_row = raw.get(day), rolled.get(day)
+        for field in fields:
+            raw_value = raw_row[field] if raw_row else 0
+            rollup_value = getattr(rollup_row, field) if rollup_row else 0
+            if field == "rating_sum":
+                equal = math.isclose(raw_value or 0.0, rollup_value or 0.0, abs_tol=1e-6)
+            else:
+                equal = (raw_value or 0) == (rollup_value or 0)
+            if not equal:
+                mismatches.append((day, field, rollup_value, raw_value))
+    return mismatches
@@ -1,7 +1,12 @@
 
-from fastapi import APIRouter, Body, HTTPException, status
+from fastapi import APIRouter, Body, Depends, File, Form, HTTPException, UploadFile, status
+from sqlalchemy.orm import Session
 from app.schemas import LoginRequest
 from app.auth import create_token
+from app.database import get_db
+from app.importer import IMPORT_FORMATS, detect_format, import_feedback
+from app.routes.reports import get_current_admin
+import io
 
 router = APIRouter()
 
@@ -15,4 +20,28 @@ def login(login_req: LoginRequest = Body(...)):
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Incorrect username or password",
         headers={"WWW-Authenticate": "Bearer"},
-    )
\ No newline at end of file
+    )
+
+
+@router.post("/import")
+def import_feedback_file(
+    file: UploadFile = File(...),
+    format: str = Form(None),
+    resume_after: int = Form(0),
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_admin)
+):
+    fmt = (format or detect_format(file.filename)).lower()
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format '{fmt}', expected one of: {', '.join(IMPORT_FORMATS)}",
+        )
+
+    # Decode the spooled upload lazily instead of reading it into memory
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        result = import_feedback(db, stream, fmt, resume_after=resume_after)
+    finally:
+        stream.detach()
+    return result.to_dict()
@@ -0,0 +1,106 @@
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+
+from app.replicas import get_read_db, read_router
+from app.exporter import EXPORT_FORMATS, ExportFormatUnavailable, filter_conditions, iter_chunks, iter_export
+from app.archive import iter_archived_chunks
+from app.listing import LISTING_DEFAULT_LIMIT, LISTING_MAX_LIMIT, InvalidCursor, list_feedback
+from app.search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, InvalidSearch, search_feedback
+from app.models import utc_now
+from app.responses import FastJSONResponse
+from app.schemas import FeedbackPage, SearchPage
+from app.routes.reports import get_current_admin
+
+router = APIRouter()
+
+
+@router.get("/feedback", response_model=FeedbackPage)
+def browse_feedback(
+    cursor: Optional[str] = None,
+    limit: int = Query(LISTING_DEFAULT_LIMIT, ge=1, le=LISTING_MAX_LIMIT),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_rating: Optional[float] = None,
+    max_rating: Optional[float] = None,
+    email: Optional[str] = None,
+    q: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_admin)
+):
+    # Rows come straight from typed columns, so the page is serialized as is
+    # instead of being re-validated against FeedbackPage
+    try:
+        page = list_feedback(db, limit=limit, cursor=cursor, start=start, end=end,
+                             min_rating=min_rating, max_rating=max_rating, email=email, q=q)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return FastJSONResponse(page)
+
+
+@router.get("/feedback/search", response_model=SearchPage)
+def search_descriptions(
+    q: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_rating: Optional[float] = None,
+    max_rating: Optional[float] = None,
+    include_archive: bool = True,
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_admin)
+):
+    # Full-text search over descriptions, best match first, then archived
+    # matches (see app/search.py)
+    try:
+        page = search_feedback(db, q, limit=limit, cursor=cursor, include_archive=include_archive, start=start,
+                               end=end, min_rating=min_rating, max_rating=max_rating)
+    except InvalidSearch as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return FastJSONResponse(page)
+
+
+@router.get("/feedback/export")
+def export_feedback(
+    format: str = Query("csv"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_rating: Optional[float] = None,
+    max_rating: Optional[float] = None,
+    include_archive: bool = True,
+    current_user: str = Depends(get_current_admin)
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format '{format}', expected one of: {', '.join(EXPORT_FORMATS)}",
+        )
+    conditions = filter_conditions(start, end, min_rating, max_rating)
+
+    def chunks():
+        # The response outlives request dependencies, so the stream owns its session
+        db = read_router.session()
+        try:
+            # Archived rows are older, so they go first
+            if include_archive:
+                yield from iter_archived_chunks(db, start, end, min_rating, max_rating)
+            yield from iter_chunks(db, conditions)
+        finally:
+            db.close()
+
+    try:
+        body = iter_export(chunks(), format)
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    media_type, ext = EXPORT_FORMATS[format]
+    filename = f"feedback-{utc_now():%Y%m%d-%H%M%S}.{ext}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,55 +1,130 @@
 
-from fastapi import APIRouter, Depends, Request, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.schemas import FeedbackCreate
-from app.models import Feedback
-from app.database import SessionLocal, engine, Base
-from app.storage import S3Client
+from app.models import Feedback, utc_now
+from app import rollups, sketches
+from app.report_cache import report_cache
+from app.report_stream import report_stream
+from app.database import get_session, run_db
+from app.storage import ScreenshotTooLarge
+from app.ingest import FEEDBACK_WRITE_BUFFER, FEEDBACK_BUFFER_WAIT, FEEDBACK_BUFFER_MAX_DELAY_MS, feedback_buffer
+from app.uploads import ASYNC_SCREENSHOT_UPLOADS, SCREENSHOT_PENDING, UploadJob, upload_queue
+from app.admission import ADMISSION_CONTROL, admission_control, client_ip, content_key
 import shutil
+import math
 import os
+from functools import partial
 
 router = APIRouter()
-s3_client = S3Client()
+# Shared with the upload queue so both paths use one content index
+s3_client = upload_queue.storage
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
-# Ensure tables exist (optional here, usually done in main.py)
-# Base.metadata.create_all(bind=engine) 
+def insert_feedback(db: Session, row: dict) -> int:
+    db_feedback = Feedback(**row)
+    db.add(db_feedback)
+    # Keep the daily rollup in the same transaction as the row itself
+    rollups.record_feedback(db, row["created_at"], row["rating"])
+    if sketches.ENABLED:
+        sketches.record_rater(db, row["created_at"], row["email"])
+    # Flush assigns the id, so there is no need to refresh after commit
+    db.flush()
+    feedback_id = db_feedback.id
+    db.commit()
+    return feedback_id
+
 
 @router.post("/submit")
-def submit_feedback(
+async def submit_feedback(
     request: Request,
     name: str = Form(...),
     email: str = Form(...),
     rating: float = Form(...), 
     description: str = Form(None),
     screenshot: UploadFile = File(None),
-    db: Session = Depends(get_db)
+    db = Depends(get_session)
 ):
-    ip = request.client.host if request.client else "127.0.0.1"
+    ip = client_ip(request)
+
+    ticket = None
+    if ADMISSION_CONTROL:
+        # Turn floods and repeats away before any upload or database work
+        ticket = admission_control.ticket(
+            ip, email,
+            content_key(email, name, rating, description,
+                        screenshot.filename if screenshot else None, screenshot.size if screenshot else None),
+            request.headers.get("Idempotency-Key"),
+        )
+        if not admission_control.check_memory(ticket):
+            await run_in_threadpool(admission_control.check_store, ticket)
+        if ticket.duplicate:
+            # The first copy was accepted; the repeat gets the same answer
+            return {"message": "Feedback received"}
+        if not ticket.admitted:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many submissions, please try again later",
+                headers={"Retry-After": str(max(1, math.ceil(ticket.retry_after)))},
+            )
+
+    try:
+        return await store_feedback(ip, name, email, rating, description, screenshot, db,
+                                    partial(admission_control.release, ticket) if ticket is not None else None)
+    except Exception:
+        if ticket is not None:
+            # Nothing was stored, so a retry must not count as a duplicate
+            await run_in_threadpool(admission_control.release, ticket)
+        raise
 
+
+async def store_feedback(ip: str, name: str, email: str, rating: float, description: str,
+                         screenshot: UploadFile, db, release=None) -> dict:
     screenshot_path = None
+    upload_job = None
 
-    if screenshot:
-        # Upload to S3 (with local fallback internally)
-        screenshot_path = s3_client.upload_file(screenshot)
+    try:
+        if screenshot and screenshot.size is not None and screenshot.size > s3_client.max_bytes:
+            raise ScreenshotTooLarge(s3_client.max_bytes)
+        if screenshot and ASYNC_SCREENSHOT_UPLOADS:
+            # Commit the row now and let the upload queue fill in the location
+            spool_path = await run_in_threadpool(upload_queue.spool, screenshot)
+            upload_job = UploadJob(None, spool_path, screenshot.filename, screenshot.content_type)
+            screenshot_path = SCREENSHOT_PENDING
+        elif screenshot:
+            # Upload to S3 (with local fallback internally)
+            screenshot_path = await run_in_threadpool(s3_client.upload_file, screenshot)
+    except ScreenshotTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
 
-    db_feedback = Feedback(
-        name=name,
-        email=email,
-        rating=rating,
-        description=description,
-        ip_address=ip,
-        screenshot=screenshot_path
-    )
+    row = {
+        "name": name,
+        "email": email,
+        "rating": rating,
+        "description": description,
+        "ip_address": ip,
+        "screenshot": screenshot_path,
+        "created_at": utc_now(),
+    }
 
-    db.add(db_feedback)
-    db.commit()
-    db.refresh(db_feedback)
+    if FEEDBACK_WRITE_BUFFER and upload_job is None:
+        # Group commit: the row goes out with others in one multi-row INSERT.
+        # Write-behind answers before the flush, so if the row is lost there
+        # the buffer releases its admission claims instead of this request
+        ticket = feedback_buffer.add(row, on_failure=None if FEEDBACK_BUFFER_WAIT else release)
+        if FEEDBACK_BUFFER_WAIT and not await ticket.wait_async(FEEDBACK_BUFFER_MAX_DELAY_MS / 1000 + 10):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Feedback could not be saved")
+        return {"message": "Feedback received"}
+
+    feedback_id = await run_db(db, insert_feedback, row)
+    report_cache.invalidate()
+    report_stream.publish_feedback([row], [feedback_id])
+
+    if upload_job:
+        await run_in_threadpool(upload_queue.assign, upload_job, feedback_id)
+        if not await run_in_threadpool(upload_queue.submit, upload_job):
+            # Queue is full: apply backpressure by uploading in this request
+            await run_in_threadpool(upload_queue.run_inline, upload_job)
 
     return {"message": "Feedback received"}
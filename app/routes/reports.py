@@ -1,26 +1,29 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
-from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from datetime import date, datetime
 
-from ..database import SessionLocal
-from ..models import Feedback
+from ..database import database_stats, get_session, run_db
+from ..replicas import get_read_db, get_read_session, read_router
+from ..report_engine import build_report
+from ..trend import InvalidTrendRequest, build_trend
+from .. import sketches
+from ..report_cache import report_cache
+from ..report_stream import report_stream
+from ..uploads import upload_queue
+from ..ingest import feedback_buffer
+from ..admission import admission_control
+from ..responses import FastJSONResponse
+from ..schemas import ReportResponse, TrendResponse
 from app.auth import verify_token
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def get_current_admin(token: str = Depends(oauth2_scheme)):
     payload = verify_token(token)
     if payload is None:
@@ -37,56 +40,99 @@ def get_current_admin(token: str = Depends(oauth2_scheme)):
         )
     return username
 
-@router.get("/report", response_model=Dict[str, Any])
-def get_report(db: Session = Depends(get_db), current_user: str = Depends(get_current_admin)):
-    # Total Average Rating
-    total_avg = db.query(func.avg(Feedback.rating)).scalar() or 0.0
+async def get_report_session():
+    # A cached report is served until the next submission invalidates it, so
+    # it is built on the primary, where that submission is already visible; a
+    # replica up to REPLICA_MAX_LAG_SECONDS behind would get its stale build
+    # cached under the new stamp. Uncached builds may still use a replica.
+    sessions = get_session() if report_cache.enabled else get_read_session()
+    db = await sessions.__anext__()
+    try:
+        yield db
+    finally:
+        await sessions.aclose()
 
-    # Helper function for rolling averages
-    def get_avg_rating_days(days: int) -> float:
-        cutoff_date = datetime.now() - timedelta(days=days)
-        avg = db.query(func.avg(Feedback.rating)).filter(Feedback.created_at >= cutoff_date).scalar()
-        return avg or 0.0
+@router.get("/report", response_model=ReportResponse)
+async def get_report(request: Request, db = Depends(get_report_session), current_user: str = Depends(get_current_admin)):
+    # All aggregates come from one conditional-aggregation scan plus the
+    # recent-5 query (see app/report_engine.py), cached until the next
+    # submission or REPORT_CACHE_TTL (see app/report_cache.py)
+    async def build():
+        result = await run_db(db, build_report)
+        return result.payload, result.headers()
 
-    avg_30 = get_avg_rating_days(30)
-    avg_60 = get_avg_rating_days(60)
-    avg_90 = get_avg_rating_days(90)
+    cached, hit = await report_cache.get_or_build_async(build)
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": "private, no-cache",
+        "X-Report-Cache": "HIT" if hit else "MISS",
+    }
+    if cached.matches(request.headers.get("if-none-match")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if not hit:
+        headers.update(cached.headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
 
-    # Unique Ratings (using logic: unique emails)
-    unique_raters = db.query(func.count(distinct(Feedback.email))).scalar() or 0
+@router.get("/report/stream")
+async def stream_report(
+    last_event_id: Optional[str] = Header(None),
+    current_user: str = Depends(get_current_admin)
+):
+    # Server-Sent Events: a "feedback" event (new row plus counter deltas)
+    # for every committed submission, "reset" when the dashboard should
+    # refetch /api/report. Reconnecting with Last-Event-ID replays what was
+    # missed (see app/report_stream.py)
+    subscriber = report_stream.subscribe(last_event_id)
+    return StreamingResponse(
+        report_stream.frames(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    # Rating Distribution (1, 2, 3, 4, 5)
-    # Since ratings can be floats (0.5 steps), we'll group them by floor value
-    distribution = {}
-    for i in range(1, 6):
-        # Count ratings where floor(rating) == i OR (rating > i-1 and rating <= i)
-        # To keep it simple for the chart, we'll group 4.5 with 5, etc., or just count occurrences.
-        # Let's count ratings in ranges: [0.5, 1.5], (1.5, 2.5], etc.
-        count = db.query(func.count(Feedback.id)).filter(
-            Feedback.rating > (i - 1),
-            Feedback.rating <= i
-        ).scalar() or 0
-        distribution[str(i)] = count
+@router.get("/report/trend", response_model=TrendResponse)
+def get_trend(
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tz: str = "UTC",
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_admin)
+):
+    # One grouped query per request, bucketed in SQL (see app/trend.py)
+    try:
+        result = build_trend(db, granularity, start, end, tz)
+    except InvalidTrendRequest as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return FastJSONResponse(result.payload, headers=result.headers())
 
-    # Recent Feedback
-    recent_feedback = db.query(Feedback).order_by(Feedback.created_at.desc()).limit(5).all()
-    recent_list = []
-    for f in recent_feedback:
-        recent_list.append({
-            "id": f.id,
-            "name": f.name,
-            "email": f.email,
-            "rating": f.rating,
-            "description": f.description,
-            "created_at": f.created_at.isoformat() if f.created_at else None
-        })
+@router.get("/report/unique-raters", response_model=Dict[str, Any])
+def get_unique_raters(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    exact: bool = False,
+    db: Session = Depends(get_read_db),
+    current_user: str = Depends(get_current_admin)
+):
+    # Distinct emails that left feedback on days in [start, end) (UTC)
+    if start and end and start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+    exact = exact or not sketches.ENABLED
+    return {
+        "start": start,
+        "end": end,
+        "unique_raters": sketches.unique_raters(db, start, end, exact=exact),
+        "mode": "exact" if exact else "hll",
+    }
 
+@router.get("/stats", response_model=Dict[str, Any])
+def get_stats(current_user: str = Depends(get_current_admin)):
     return {
-        "total_avg_rating": round(float(total_avg), 2),
-        "avg_rating_last_30_days": round(float(avg_30), 2),
-        "avg_rating_last_60_days": round(float(avg_60), 2),
-        "avg_rating_last_90_days": round(float(avg_90), 2),
-        "unique_rating_count": unique_raters,
-        "distribution": distribution,
-        "recent_feedback": recent_list
+        "report_cache": report_cache.stats(),
+        "feedback_buffer": feedback_buffer.stats(),
+        "upload_queue": upload_queue.stats(),
+        "screenshot_storage": upload_queue.storage.stats(),
+        "database": database_stats(),
+        "replicas": read_router.stats(),
+        "report_stream": report_stream.stats(),
+        "admission": admission_control.stats(),
     }
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, List, Optional
+from datetime import datetime
 
 class FeedbackCreate(BaseModel):
     name: str
@@ -7,14 +8,98 @@ class FeedbackCreate(BaseModel):
     rating: int
     description: str
 
+# Schema for one row of a bulk import (CSV or NDJSON)
+class FeedbackImport(BaseModel):
+    name: str = Field(max_length=255)
+    email: EmailStr
+    rating: float = Field(ge=0, le=5)
+    description: Optional[str] = Field(default=None, max_length=1000)
+    ip_address: Optional[str] = Field(default=None, max_length=100)
+    created_at: Optional[datetime] = None
+
 class FeedbackResponse(BaseModel):
     id: int
     name: str
-    rating: int
+    email: str
+    rating: float
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+# One keyset page of /api/feedback; pass next_cursor back to get the next page
+class FeedbackPage(BaseModel):
+    items: List[FeedbackResponse]
+    next_cursor: Optional[str] = None
+
+
+# One ranked page of /api/feedback/search. snippet is HTML: the description
+# around the match, escaped, with the matched words in <mark>
+class SearchResult(BaseModel):
+    id: int
+    name: str
+    email: str
+    rating: float
+    created_at: Optional[datetime] = None
+    score: Optional[float] = None
+    snippet: str
+    archived: bool = False
+
+class SearchPage(BaseModel):
+    items: List[SearchResult]
+    next_cursor: Optional[str] = None
+    backend: str
+
+# /api/report; built as a plain dict by app/report_engine.py and serialized
+# without re-validation, so keep the two in step
+class RecentFeedback(BaseModel):
+    id: int
+    name: str
+    email: str
+    rating: float
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+# app/rating_metrics.py; all None when there are no ratings
+class RatingMetrics(BaseModel):
+    count: int
+    median: Optional[float] = None
+    p10: Optional[float] = None
+    p90: Optional[float] = None
+    csat_pct: Optional[float] = None
+    promoter_pct: Optional[float] = None
+    detractor_pct: Optional[float] = None
+    nps: Optional[float] = None
+
+class ReportResponse(BaseModel):
+    total_avg_rating: float
+    avg_rating_last_30_days: float
+    avg_rating_last_60_days: float
+    avg_rating_last_90_days: float
+    unique_rating_count: int
+    distribution: Dict[str, int]
+    histogram: Dict[str, int]
+    metrics: Dict[str, RatingMetrics]
+    recent_feedback: List[RecentFeedback]
+
+# /api/report/trend (app/trend.py)
+class TrendBucket(BaseModel):
+    start: datetime
+    count: int
+    avg_rating: Optional[float] = None
+    distribution: Dict[str, int]
+    histogram: Dict[str, int]
+    metrics: RatingMetrics
+
+class TrendResponse(BaseModel):
+    granularity: str
+    timezone: str
+    start: datetime
+    end: datetime
+    source: str
+    buckets: List[TrendBucket]
+
 
 # Schema for login request
 class LoginRequest(BaseModel):
@@ -0,0 +1,319 @@
+import re
+import json
+import html
+import base64
+import binascii
+from datetime import datetime
+
+from sqlalchemy import Float, select, and_, or_, func, literal_column, table, column, inspect, type_coerce
+from sqlalchemy.exc import DatabaseError, OperationalError
+from sqlalchemy.orm import Session
+
+from .models import Feedback
+from .exporter import filter_conditions
+from . import archive
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Terms beyond this are ignored; each one is another posting list to intersect
+SEARCH_MAX_TERMS = 8
+# Words of context around the first match in a snippet
+SNIPPET_WORDS = 12
+
+# SQLite: FTS5 table over feedback.description ("external content": it
+# stores only the index and reads the text back from feedback), kept in sync
+# by triggers, so every insert path (submit, write buffer, bulk import) is
+# covered
+FTS_TABLE = "feedback_fts"
+FTS_TOKENIZER = "porter unicode61 remove_diacritics 2"
+FTS_TRIGGERS = {
+    "feedback_fts_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_insert AFTER INSERT ON feedback BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, description) VALUES (new.id, new.description);
+        END""",
+    "feedback_fts_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_delete AFTER DELETE ON feedback BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+        END""",
+    "feedback_fts_update": f"""
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_update AFTER UPDATE OF description ON feedback BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+            INSERT INTO {FTS_TABLE} (rowid, description) VALUES (new.id, new.description);
+        END""",
+}
+# MySQL: an InnoDB FULLTEXT index, maintained by the server itself
+FULLTEXT_INDEX = "ft_feedback_description"
+
+fts = table(FTS_TABLE, column("rowid"), column("description"))
+
+# Snippet highlight markers; control characters that can't occur in a
+# description, swapped for <mark> once the text around them is escaped
+MARK_START, MARK_END = "\x02", "\x03"
+
+SEARCH_COLUMNS = ["id", "name", "email", "rating", "created_at"]
+
+# Cursor "score" once a search has gone past the live rows into the archive
+ARCHIVE_CURSOR = "archive"
+
+_backends = {}
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+def parse_terms(q: str) -> list:
+    terms = re.findall(r"\w+", (q or "").lower())
+    if not terms:
+        raise InvalidSearch("Search query must contain at least one word")
+    return list(dict.fromkeys(terms))[:SEARCH_MAX_TERMS]
+
+
+def fts5_query(terms: list) -> str:
+    # Every term must match, each as a prefix ("crash" finds "crashes")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def boolean_query(terms: list) -> str:
+    return " ".join(f"+{term}*" for term in terms)
+
+
+def fts5_available(conn) -> bool:
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE temp.csat_fts5_probe USING fts5(x)")
+    except OperationalError:
+        return False
+    conn.exec_driver_sql("DROP TABLE temp.csat_fts5_probe")
+    return True
+
+
+def has_sqlite_index(conn) -> bool:
+    return inspect(conn).has_table(FTS_TABLE)
+
+
+def create_sqlite_index(conn):
+    """FTS5 table and triggers; rebuild() fills it from existing rows."""
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"description, content='feedback', content_rowid='id', tokenize='{FTS_TOKENIZER}')"
+    )
+    create_triggers(conn)
+
+
+def create_triggers(conn):
+    for ddl in FTS_TRIGGERS.values():
+        conn.exec_driver_sql(ddl)
+
+
+def drop_triggers(conn):
+    """For bulk loads: insert without them, then create_triggers() and rebuild()."""
+    for name in FTS_TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild(conn):
+    """Re-index every description (backfill, or repair after a bulk load without triggers)."""
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    elif conn.dialect.name == "mysql":
+        # Rebuilds the table, FULLTEXT index included
+        conn.exec_driver_sql("OPTIMIZE TABLE feedback")
+
+
+def check(conn) -> bool:
+    """True when the FTS5 index matches the feedback table."""
+    if conn.dialect.name != "sqlite":
+        return True
+    try:
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('integrity-check', 1)")
+    except DatabaseError:  # SQLITE_CORRUPT_VTAB: index and table disagree
+        return False
+    return True
+
+
+def backend(db: Session) -> str:
+    """"fts5", "fulltext" or "like" for the database behind db (checked once per database)."""
+    bind = db.get_bind()
+    key = bind.url.render_as_string(hide_password=True)
+    if key not in _backends:
+        if bind.dialect.name == "sqlite" and has_sqlite_index(bind):
+            _backends[key] = "fts5"
+        elif bind.dialect.name == "mysql" and FULLTEXT_INDEX in {ix["name"] for ix in inspect(bind).get_indexes("feedback")}:
+            _backends[key] = "fulltext"
+        else:
+            _backends[key] = "like"
+    return _backends[key]
+
+
+def encode_cursor(score, feedback_id: int) -> str:
+    raw = json.dumps([score, feedback_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, feedback_id = json.loads(raw)
+        return score, int(feedback_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidSearch(f"Invalid cursor: {cursor}") from e
+
+
+def search_statement(search_backend: str, terms: list, cursor: str = None, limit: int = SEARCH_DEFAULT_LIMIT,
+                     start: datetime = None, end: datetime = None, min_rating: float = None,
+                     max_rating: float = None):
+    """Best matches first, continuing after `cursor`; fetches limit + 1 rows.
+
+    Each row has a `score` (lower is better for fts5, higher for fulltext,
+    the created_at timestamp for like) and, for fts5, a marked `snippet`.
+    """
+    conditions = filter_conditions(start, end, min_rating, max_rating)
+    columns = [getattr(Feedback, name) for name in SEARCH_COLUMNS]
+    after = decode_cursor(cursor) if cursor else None
+
+    if search_backend == "fts5":
+        score = func.bm25(literal_column(FTS_TABLE))
+        snippet = func.snippet(literal_column(FTS_TABLE), 0, MARK_START, MARK_END, "…", SNIPPET_WORDS)
+        conditions.append(literal_column(FTS_TABLE).op("MATCH")(fts5_query(terms)))
+        if after:
+            conditions.append(or_(score > after[0], and_(score == after[0], Feedback.id > after[1])))
+        return (
+            select(*columns, score.label("score"), snippet.label("snippet"))
+            .select_from(fts.join(Feedback, Feedback.id == fts.c.rowid))
+            .where(*conditions)
+            .order_by(score, Feedback.id)
+            .limit(limit + 1)
+        )
+
+    if search_backend == "fulltext":
+        match = Feedback.description.match(boolean_query(terms))
+        # MATCH ... AGAINST is typed as a boolean; read the relevance as a number
+        score = type_coerce(match, Float)
+        conditions.append(match)
+        if after:
+            conditions.append(or_(score < after[0], and_(score == after[0], Feedback.id > after[1])))
+        return (
+            select(*columns, Feedback.description, score.label("score"))
+            .where(*conditions)
+            .order_by(score.desc(), Feedback.id)
+            .limit(limit + 1)
+        )
+
+    # No index: every term as a substring, newest first (a full scan)
+    for term in terms:
+        conditions.append(Feedback.description.like(f"%{term}%"))
+    conditions.append(Feedback.created_at.isnot(None))
+    if after:
+        try:
+            created_at = datetime.fromisoformat(after[0])
+        except (TypeError, ValueError) as e:
+            raise InvalidSearch(f"Invalid cursor: {cursor}") from e
+        conditions.append(Feedback.created_at <= created_at)
+        conditions.append(or_(Feedback.created_at < created_at, Feedback.id < after[1]))
+    return (
+        select(*columns, Feedback.description, Feedback.created_at.label("score"))
+        .where(*conditions)
+        .order_by(Feedback.created_at.desc(), Feedback.id.desc())
+        .limit(limit + 1)
+    )
+
+
+def mark_snippet(text: str, terms: list, words: int = SNIPPET_WORDS) -> str:
+    """FTS5-style snippet for backends without one: a window around the first match."""
+    tokens = re.split(r"(\w+)", text or "")
+    # tokens alternates separator, word, separator, ...
+    matches = [i for i in range(1, len(tokens), 2) if tokens[i].lower().startswith(tuple(terms))]
+    first = matches[0] if matches else 1
+    begin = max(1, first - (words // 2) * 2)
+    end = min(len(tokens), begin + words * 2 - 1)
+    for i in matches:
+        if begin <= i < end:
+            tokens[i] = f"{MARK_START}{tokens[i]}{MARK_END}"
+    snippet = "".join(tokens[begin:end])
+    return ("…" if begin > 1 else "") + snippet + ("…" if end < len(tokens) - 1 else "")
+
+
+def render_snippet(snippet: str) -> str:
+    """Escape the description text and turn the markers into <mark> tags."""
+    return html.escape(snippet or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def search_archive(db: Session, terms: list, limit: int, before_id: int = None, start: datetime = None,
+                   end: datetime = None, min_rating: float = None, max_rating: float = None) -> list:
+    """Up to `limit` archived matches with id < before_id, highest id first.
+
+    Segments have no search index: each one is scanned a row group at a
+    time (groups the filters rule out are skipped) for descriptions with
+    every term as a word prefix.
+    """
+    found = []
+    for segment in sorted(archive.segments(db, start, end), key=lambda segment: segment.last_id, reverse=True):
+        if before_id is not None and segment.first_id >= before_id:
+            continue
+        # Segments may overlap in ids; none of the rest can beat a full page
+        if len(found) >= limit and segment.last_id < found[limit - 1]["id"]:
+            break
+        taken = 0
+        for table in archive.scan_segment(segment, SEARCH_COLUMNS + ["description"], start=start, end=end,
+                                          min_rating=min_rating, max_rating=max_rating, before_id=before_id,
+                                          terms=terms, newest_first=True):
+            rows = table.slice(0, limit - taken).to_pylist()
+            found.extend(rows)
+            taken += len(rows)
+            if taken >= limit:
+                break
+        found.sort(key=lambda row: row["id"], reverse=True)
+        del found[limit:]
+    return found
+
+
+def _live_item(row, search_backend: str, terms: list) -> dict:
+    item = {name: getattr(row, name) for name in SEARCH_COLUMNS}
+    if search_backend == "fts5":
+        item["score"] = -row.score  # bm25 is negative, lower is better
+        item["snippet"] = render_snippet(row.snippet)
+    else:
+        item["score"] = float(row.score) if search_backend == "fulltext" else None
+        item["snippet"] = render_snippet(mark_snippet(row.description, terms))
+    item["archived"] = False
+    return item
+
+
+def search_feedback(db: Session, q: str, limit: int = SEARCH_DEFAULT_LIMIT, cursor: str = None,
+                    include_archive: bool = True, **filters) -> dict:
+    """One page as {"items": [...], "next_cursor": str or None, "backend": str}.
+
+    Live matches come first, best first; after the last of them, archived
+    matches follow, newest first (unless include_archive is off).
+    """
+    terms = parse_terms(q)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    search_backend = backend(db)
+    after = decode_cursor(cursor) if cursor else None
+
+    items = []
+    if after is None or after[0] != ARCHIVE_CURSOR:
+        rows = db.execute(search_statement(search_backend, terms, cursor=cursor, limit=limit, **filters)).all()
+        items = [_live_item(row, search_backend, terms) for row in rows[:limit]]
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            score = last.score.isoformat() if search_backend == "like" else last.score
+            return {"items": items, "next_cursor": encode_cursor(score, last.id), "backend": search_backend}
+        after = None
+    if not include_archive:
+        return {"items": items, "next_cursor": None, "backend": search_backend}
+
+    room = limit - len(items)
+    archived = search_archive(db, terms, room + 1, before_id=after[1] if after else None, **filters)
+    next_cursor = None
+    if len(archived) > room:
+        # A page that ends exactly on the last live match continues at the newest archived one
+        next_cursor = encode_cursor(ARCHIVE_CURSOR, archived[room - 1]["id"] if room else archived[0]["id"] + 1)
+        archived = archived[:room]
+    for row in archived:
+        item = {name: row[name] for name in SEARCH_COLUMNS}
+        item["score"] = None
+        item["snippet"] = render_snippet(mark_snippet(row["description"], terms))
+        item["archived"] = True
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor, "backend": search_backend}
@@ -0,0 +1,210 @@
+import os
+from datetime import date, datetime
+
+from sqlalchemy import select, insert, update, delete, func, distinct, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from .models import Feedback, RaterDailySketch, RaterSketch, ArchivedRater
+from .hll import register_rank, estimate, merge_ranks
+from .rollups import as_date
+from . import archive
+
+load_dotenv()
+
+# "exact" runs COUNT(DISTINCT email) over feedback; "hll" estimates it from
+# the HyperLogLog sketches (~0.8% error at the default precision). Writes only
+# keep the sketches up to date in "hll" mode: after switching to it, restart
+# and run scripts/rebuild_rollups.py once to backfill them.
+UNIQUE_RATERS_MODE = os.getenv("UNIQUE_RATERS_MODE", "exact").lower()
+ENABLED = UNIQUE_RATERS_MODE == "hll"
+
+
+def ranks_for(emails) -> dict:
+    """Sparse HyperLogLog registers {register: rank} for a set of emails."""
+    ranks = {}
+    for email in emails:
+        register, rank = register_rank(email)
+        if rank > ranks.get(register, 0):
+            ranks[register] = rank
+    return ranks
+
+
+def _raise_ranks(db: Session, model, ranks: dict, **key):
+    """Raise stored registers to at least the given ranks; never lowers one."""
+    if not ranks:
+        return
+    conditions = [getattr(model, column) == value for column, value in key.items()]
+    stored = dict(db.execute(
+        select(model.register, model.max_rank).where(*conditions, model.register.in_(list(ranks)))
+    ).all())
+
+    def raise_stmt(register, rank):
+        # The rank guard makes concurrent raises commute
+        return (
+            update(model)
+            .where(*conditions, model.register == register, model.max_rank < rank)
+            .values(max_rank=rank)
+        )
+
+    missing = []
+    for register, rank in ranks.items():
+        current = stored.get(register)
+        if current is None:
+            missing.append({"register": register, "max_rank": rank, **key})
+        elif current < rank:
+            db.execute(raise_stmt(register, rank))
+    if not missing:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(model), missing)
+    except IntegrityError:
+        # Another worker inserted some of these registers first
+        for row in missing:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(model).values(**row))
+            except IntegrityError:
+                db.execute(raise_stmt(row["register"], row["max_rank"]))
+
+
+def apply_raters(db: Session, emails_by_day: dict):
+    """Add {day: [email, ...]} to the daily and all-time sketches inside the caller's transaction."""
+    total = {}
+    for day in sorted(emails_by_day):
+        ranks = ranks_for(emails_by_day[day])
+        _raise_ranks(db, RaterDailySketch, ranks, day=day)
+        merge_ranks(total, ranks)
+    _raise_ranks(db, RaterSketch, total)
+
+
+def record_rater(db: Session, created_at: datetime, email: str):
+    apply_raters(db, {created_at.date(): [email]})
+
+
+def rebuild(db: Session, days=None, archived: bool = True) -> int:
+    """Recompute the sketches from raw rows, for every day or only the given days.
+
+    With `archived`, emails of archived rows are read back from the
+    segments too. With days, the all-time sketch is only raised (it can't
+    forget an email without a full rebuild). Runs in the caller's
+    transaction; returns the number of daily register rows written.
+    """
+    day = func.date(Feedback.created_at)
+    stmt = select(day.label("day"), Feedback.email).order_by(day)
+    clear = delete(RaterDailySketch)
+    if days is not None:
+        days = sorted(set(days))
+        if not days:
+            return 0
+        stmt = stmt.where(day.in_([d.isoformat() for d in days]))
+        clear = clear.where(RaterDailySketch.day.in_(days))
+    else:
+        db.execute(delete(RaterSketch))
+    db.execute(clear)
+
+    written = 0
+    total = {}
+    current_day, ranks = None, {}
+
+    def write_day():
+        if current_day is None or not ranks:
+            return 0
+        db.execute(insert(RaterDailySketch), [
+            {"day": current_day, "register": register, "max_rank": rank} for register, rank in ranks.items()
+        ])
+        return len(ranks)
+
+    # Ordered by day, so only one day's registers are held at a time
+    for row_day, email in db.execute(stmt, execution_options={"stream_results": True}):
+        row_day = as_date(row_day)
+        if row_day != current_day:
+            written += write_day()
+            merge_ranks(total, ranks)
+            current_day, ranks = row_day, {}
+        register, rank = register_rank(email)
+        if rank > ranks.get(register, 0):
+            ranks[register] = rank
+    written += write_day()
+    merge_ranks(total, ranks)
+
+    if archived:
+        for pairs in archive.day_batches(db, "email", days):
+            emails_by_day = {}
+            for row_day, email in pairs:
+                emails_by_day.setdefault(row_day, []).append(email)
+            for row_day, emails in emails_by_day.items():
+                day_ranks = ranks_for(emails)
+                _raise_ranks(db, RaterDailySketch, day_ranks, day=row_day)
+                merge_ranks(total, day_ranks)
+                written += len(day_ranks)
+
+    if days is not None:
+        _raise_ranks(db, RaterSketch, total)
+    elif total:
+        db.execute(insert(RaterSketch), [
+            {"register": register, "max_rank": rank} for register, rank in total.items()
+        ])
+    return written
+
+
+def sketch_statement(start: date = None, end: date = None):
+    """(register, rank) rows of the sketch covering days in [start, end); all time without bounds."""
+    if start is None and end is None:
+        return select(RaterSketch.register, RaterSketch.max_rank)
+    conditions = []
+    if start is not None:
+        conditions.append(RaterDailySketch.day >= start)
+    if end is not None:
+        conditions.append(RaterDailySketch.day < end)
+    return (
+        select(RaterDailySketch.register, func.max(RaterDailySketch.max_rank))
+        .where(*conditions)
+        .group_by(RaterDailySketch.register)
+    )
+
+
+def _window(stmt, start: date = None, end: date = None):
+    if start is not None:
+        stmt = stmt.where(Feedback.created_at >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        stmt = stmt.where(Feedback.created_at < datetime.combine(end, datetime.min.time()))
+    return stmt
+
+
+def exact_statement(start: date = None, end: date = None):
+    """COUNT(DISTINCT email) over the same [start, end) day window.
+
+    All time, archived raters not seen among the live rows are added in;
+    a window only counts live rows (see unique_raters).
+    """
+    stmt = _window(select(func.count(distinct(Feedback.email))), start, end)
+    if start is None and end is None:
+        archived_only = (
+            select(func.count())
+            .select_from(ArchivedRater)
+            .where(~exists().where(Feedback.email == ArchivedRater.email))
+            .scalar_subquery()
+        )
+        stmt = select(stmt.scalar_subquery() + archived_only)
+    return stmt
+
+
+def estimate_rows(rows) -> int:
+    return estimate({register: rank for register, rank in rows})
+
+
+def unique_raters(db: Session, start: date = None, end: date = None, exact: bool = False) -> int:
+    if exact:
+        bounds = [datetime.combine(day, datetime.min.time()) if day else None for day in (start, end)]
+        if (start is None and end is None) or not archive.segments(db, *bounds):
+            return db.execute(exact_statement(start, end)).scalar() or 0
+        # A window reaching into the archive: its emails are read back and
+        # de-duplicated against the live ones
+        emails = set(db.execute(_window(select(Feedback.email).distinct(), start, end)).scalars())
+        for table in archive.scan(db, ["email"], *bounds):
+            emails.update(table["email"].to_pylist())
+        return len(emails)
+    return estimate_rows(db.execute(sketch_statement(start, end)).all())
@@ -0,0 +1,17 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default home of runtime files holding personal data (the report event log,
+# the admission store, spooled screenshots), shared by the app's workers and
+# readable by no one else
+CSAT_STATE_DIR = os.getenv("CSAT_STATE_DIR", os.path.join(os.path.expanduser("~"), ".csat"))
+
+
+def open_private(path: str, flags: int) -> int:
+    """os.open() a file, creating it (and a missing directory) readable by the app's user only."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    return os.open(path, flags | os.O_CREAT, 0o600)
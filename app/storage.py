@@ -1,22 +1,159 @@
 import os
+import re
+import time
+import uuid
 import boto3
 import shutil
-from botocore.exceptions import NoCredentialsError
+import hashlib
+import logging
+import tempfile
+import threading
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError, NoCredentialsError
 from fastapi import UploadFile
 from dotenv import load_dotenv
+from .metrics import STORAGE_UPLOAD_BYTES, STORAGE_UPLOAD_SECONDS
 
 # Ensure .env is loaded
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 LOCAL_STORAGE_PATH = os.getenv("LOCAL_STORAGE_PATH", "screenshots")
 
+# Uploads are streamed in chunks; nothing holds a whole screenshot in memory
+SCREENSHOT_MAX_BYTES = int(os.getenv("SCREENSHOT_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024)))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "4"))
+# Content hashes already known to be in the bucket, shared by all workers
+SCREENSHOT_INDEX_PATH = os.getenv(
+    "SCREENSHOT_INDEX_PATH", os.path.join(LOCAL_STORAGE_PATH, ".content-index")
+)
+
+
+def _record_upload(backend: str, outcome: str, started: float, size: int = None):
+    STORAGE_UPLOAD_SECONDS.labels(backend, outcome).observe(time.perf_counter() - started)
+    if size is not None:
+        STORAGE_UPLOAD_BYTES.labels(backend).observe(size)
+
+
+class ScreenshotTooLarge(ValueError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Screenshot exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+class LimitedReader:
+    """File wrapper that raises ScreenshotTooLarge once more than max_bytes are read."""
+
+    def __init__(self, fileobj, max_bytes: int):
+        self.fileobj = fileobj
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            # Never read unbounded; one byte past the limit is enough to fail
+            size = self.max_bytes - self.bytes_read + 1
+        chunk = self.fileobj.read(size)
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.max_bytes:
+            raise ScreenshotTooLarge(self.max_bytes)
+        return chunk
+
+
+def remaining_size(fileobj):
+    """Bytes left in a seekable file, or None if it can't be measured without reading."""
+    try:
+        if not fileobj.seekable():
+            return None
+        position = fileobj.tell()
+        end = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(position)
+        return end - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def copy_limited(src, dst, max_bytes: int = SCREENSHOT_MAX_BYTES, chunk_size: int = UPLOAD_CHUNK_SIZE) -> int:
+    """Chunked copy between file objects that aborts past max_bytes."""
+    reader = LimitedReader(src, max_bytes)
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            return reader.bytes_read
+        dst.write(chunk)
+
+
+def content_key(digest: str, filename: str = None) -> str:
+    """Object key for content with the given sha256: <digest>.<ext>"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,8}", ext):
+        ext = ""
+    return f"{digest}{ext}"
+
+
+class ContentIndex:
+    """Set of stored keys, persisted as an append-only file so other workers see them too."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._keys = set()
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        # Pick up complete lines appended since the last read
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        self._keys.update(line.decode() for line in data[:end].split(b"\n") if line)
+        self._offset += end
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._keys:
+                self._refresh()
+            return key in self._keys
+
+    def add(self, key: str):
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            try:
+                directory = os.path.dirname(self.path)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory, exist_ok=True)
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, f"{key}\n".encode())
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.error("Failed to update screenshot index: %s", e)
+
+
 class S3Client:
-    def __init__(self):
+    def __init__(self, max_bytes: int = SCREENSHOT_MAX_BYTES):
         self.s3 = None
+        self.max_bytes = max_bytes
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=S3_MAX_CONCURRENCY,
+            io_chunksize=UPLOAD_CHUNK_SIZE,
+        )
         if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
             try:
                 self.s3 = boto3.client(
@@ -26,49 +163,183 @@ class S3Client:
                     region_name=AWS_REGION
                 )
             except Exception as e:
-                print(f"Failed to initialize S3 client: {e}")
+                logger.error("Failed to initialize S3 client: %s", e)
         self.bucket = AWS_BUCKET_NAME
+        self.index = ContentIndex(SCREENSHOT_INDEX_PATH)
+        self.stored = 0
+        self.deduplicated = 0
 
     def upload_file(self, file: UploadFile, object_name: str = None) -> str:
         if object_name is None:
-            object_name = file.filename
+            return self.store(file.file, file.filename, file.content_type)
+        return self.upload_fileobj(file.file, object_name, file.content_type)
 
-        # Read content once to avoid "closed file" or "consumed stream" issues
+    def _hash_source(self, fileobj):
+        """sha256 of fileobj plus a seekable source positioned at the start of its bytes.
+
+        Seekable files are hashed in a first chunked pass; anything else is
+        hashed while it is spooled to a temporary file. The third value is
+        the spool to close afterwards, if one was needed.
+        """
+        digest = hashlib.sha256()
+        size = remaining_size(fileobj)
+        if size is not None:
+            if size > self.max_bytes:
+                raise ScreenshotTooLarge(self.max_bytes)
+            start = fileobj.tell()
+            for chunk in iter(lambda: fileobj.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+            fileobj.seek(start)
+            return digest.hexdigest(), fileobj, None
+
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_SIZE)
+        reader = LimitedReader(fileobj, self.max_bytes)
         try:
-            file_content = file.file.read()
-        except Exception as e:
-            print(f"Error reading upload file: {e}")
-            return None
+            for chunk in iter(lambda: reader.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return digest.hexdigest(), spool, spool
+
+    def _s3_url(self, key: str) -> str:
+        return f"https://{self.bucket}.s3.{AWS_REGION}.amazonaws.com/{key}"
+
+    def _s3_exists(self, key: str) -> bool:
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def store(self, fileobj, filename: str = None, content_type: str = None) -> str:
+        """Store fileobj under its content hash and return its location.
+
+        Identical bytes map to the same key, so a screenshot that is already
+        stored is not uploaded or written again.
+        """
+        digest, source, spool = self._hash_source(fileobj)
+        try:
+            key = content_key(digest, filename)
+            if self.s3 and self.bucket:
+                index_key = f"s3://{self.bucket}/{key}"
+                # The shared index saves a HEAD request for keys seen before
+                if index_key in self.index or self._s3_exists(key):
+                    self.index.add(index_key)
+                    self.deduplicated += 1
+                    return self._s3_url(key)
+            else:
+                file_path = os.path.join(LOCAL_STORAGE_PATH, key)
+                if os.path.exists(file_path):
+                    self.deduplicated += 1
+                    return file_path
+
+            location = self.upload_fileobj(source, key, content_type)
+            if location:
+                self.stored += 1
+                if location == self._s3_url(key):
+                    self.index.add(f"s3://{self.bucket}/{key}")
+            return location
+        finally:
+            if spool is not None:
+                spool.close()
+
+    def upload_fileobj(self, fileobj, object_name: str, content_type: str = None) -> str:
+        """Stream fileobj to S3 (multipart above S3_MULTIPART_THRESHOLD) or local disk.
+
+        Raises ScreenshotTooLarge past max_bytes, before the whole body is read
+        when the size is known up front.
+        """
+        size = remaining_size(fileobj)
+        if size is not None and size > self.max_bytes:
+            raise ScreenshotTooLarge(self.max_bytes)
+        start = fileobj.tell() if size is not None else None
 
         # Attempt S3 upload if configured
         if self.s3 and self.bucket:
+            started = time.perf_counter()
             try:
-                self.s3.put_object(
-                    Bucket=self.bucket,
-                    Key=object_name,
-                    Body=file_content,
-                    ContentType=file.content_type
+                # Seekable sources are read part by part; others go through the limiter
+                body = fileobj if size is not None else LimitedReader(fileobj, self.max_bytes)
+                self.s3.upload_fileobj(
+                    body,
+                    self.bucket,
+                    object_name,
+                    ExtraArgs={"ContentType": content_type or "application/octet-stream"},
+                    Config=self.transfer_config,
                 )
-                file_url = f"https://{self.bucket}.s3.{AWS_REGION}.amazonaws.com/{object_name}"
-                return file_url
+                _record_upload("s3", "ok", started, size if size is not None else body.bytes_read)
+                return self._s3_url(object_name)
+            except ScreenshotTooLarge:
+                _record_upload("s3", "too_large", started)
+                raise
             except Exception as e:
-                print(f"S3 Upload failed, falling back to local: {e}")
+                _record_upload("s3", "error", started)
+                logger.warning("S3 upload failed, falling back to local: %s", e)
+                if start is None:
+                    logger.error("Upload stream is not seekable, cannot retry locally.")
+                    return None
+                fileobj.seek(start)
         else:
             if not self.bucket:
-                print("AWS_BUCKET_NAME is not set, falling back to local storage.")
+                logger.info("AWS_BUCKET_NAME is not set, falling back to local storage.")
             else:
-                print("S3 credentials not fully configured, falling back to local storage.")
+                logger.info("S3 credentials not fully configured, falling back to local storage.")
 
         # Local fallback logic
+        file_path = os.path.join(LOCAL_STORAGE_PATH, object_name)
+        partial_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        started = time.perf_counter()
         try:
-            if not os.path.exists(LOCAL_STORAGE_PATH):
-                os.makedirs(LOCAL_STORAGE_PATH)
-            
-            file_path = os.path.join(LOCAL_STORAGE_PATH, object_name)
-            with open(file_path, "wb") as buffer:
-                buffer.write(file_content)
-            
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+
+            # Write under a unique temporary name so a rejected upload never leaves
+            # a file behind and concurrent writes of the same key can't interleave
+            with open(partial_path, "wb") as buffer:
+                written = copy_limited(fileobj, buffer, self.max_bytes)
+            os.replace(partial_path, file_path)
+
+            _record_upload("local", "ok", started, written)
             return file_path
+        except ScreenshotTooLarge:
+            _record_upload("local", "too_large", started)
+            os.remove(partial_path)
+            raise
         except Exception as e:
-            print(f"Local storage fallback failed: {e}")
+            _record_upload("local", "error", started)
+            logger.error("Local storage fallback failed: %s", e)
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
             return None
+
+    def _s3_key(self, location: str):
+        prefix = self._s3_url("")
+        return location[len(prefix):] if self.bucket and location.startswith(prefix) else None
+
+    def download_fileobj(self, location: str, fileobj):
+        """Copy a stored object, given the location upload_fileobj returned, into fileobj."""
+        key = self._s3_key(location)
+        if key is None:
+            with open(location, "rb") as f:
+                shutil.copyfileobj(f, fileobj, UPLOAD_CHUNK_SIZE)
+            return
+        if not self.s3:
+            raise FileNotFoundError(f"{location} is in S3, but S3 is not configured")
+        self.s3.download_fileobj(self.bucket, key, fileobj, Config=self.transfer_config)
+
+    def delete(self, location: str):
+        key = self._s3_key(location)
+        if key is None:
+            if os.path.exists(location):
+                os.remove(location)
+        elif self.s3:
+            self.s3.delete_object(Bucket=self.bucket, Key=key)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "s3" if self.s3 and self.bucket else "local",
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+        }
@@ -0,0 +1,255 @@
+import os
+import time
+from datetime import datetime, date, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+from sqlalchemy import select, func, case, literal_column
+from sqlalchemy.orm import Session
+
+from .models import Feedback, FeedbackDailyRollup, as_naive_utc
+from .report_engine import REPORT_USE_ROLLUPS, ReportBuild
+from . import archive, rating_metrics, rollups
+
+load_dotenv()
+
+TREND_GRANULARITIES = ("day", "week", "month")
+# Requests needing more buckets than this are rejected; with rollups each
+# bucket is at most 31 rollup rows, so this also bounds the work per request
+TREND_MAX_BUCKETS = int(os.getenv("TREND_MAX_BUCKETS", "1500"))
+# Range used when the request gives no start, in buckets before the end
+TREND_DEFAULT_BUCKETS = {"day": 30, "week": 12, "month": 12}
+
+
+class InvalidTrendRequest(ValueError):
+    pass
+
+
+def _bucket_floor(day: date, granularity: str) -> date:
+    if granularity == "week":
+        # Weeks start on Monday
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day + timedelta(days=7)
+    if granularity == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def _previous_bucket(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=7)
+    if granularity == "month":
+        return (day - timedelta(days=1)).replace(day=1)
+    return day - timedelta(days=1)
+
+
+def _local_midnight(day: date, tz) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=tz)
+
+
+def bucket_starts(start: datetime, end: datetime, granularity: str, tz) -> list:
+    """Local dates starting each bucket that overlaps [start, end), plus the end of the last one."""
+    first = _bucket_floor(start.astimezone(tz).date(), granularity)
+    end_local = end.astimezone(tz)
+    days = [first]
+    while _local_midnight(days[-1], tz) < end_local:
+        if len(days) > TREND_MAX_BUCKETS:
+            raise InvalidTrendRequest(
+                f"Range needs more than {TREND_MAX_BUCKETS} {granularity} buckets; use a coarser granularity"
+            )
+        days.append(_next_bucket(days[-1], granularity))
+    return days
+
+
+def offset_changes(start: datetime, end: datetime, tz) -> list:
+    """[(utc_instant, offset_seconds)]: the UTC offset in effect from each instant on.
+
+    The first entry is the offset at start; one more follows every DST (or
+    other) transition before end. Found by stepping a day at a time and
+    bisecting down to the second where the offset changes.
+    """
+    def offset(instant):
+        return int(instant.astimezone(tz).utcoffset().total_seconds())
+
+    changes = [(start, offset(start))]
+    step = timedelta(days=1)
+    t = start
+    while t < end:
+        nxt = min(t + step, end)
+        if offset(nxt) != changes[-1][1]:
+            lo, hi = t, nxt
+            while hi - lo > timedelta(seconds=1):
+                mid = lo + (hi - lo) / 2
+                if offset(mid) == changes[-1][1]:
+                    lo = mid
+                else:
+                    hi = mid
+            changes.append((hi.replace(microsecond=0), offset(hi)))
+        t = nxt
+    return changes
+
+
+def _offset_case(changes: list, column, render):
+    """SQL for the offset in effect at column, rendered per change by render(offset)."""
+    if len(changes) == 1:
+        return render(changes[0][1])
+    whens = [
+        (column < as_naive_utc(instant), render(previous))
+        for (_, previous), (instant, _) in zip(changes, changes[1:])
+    ]
+    return case(*whens, else_=render(changes[-1][1]))
+
+
+def local_bucket_expression(dialect: str, granularity: str, column, changes: list = None):
+    """SQL expression giving the local bucket start (a date, or 'YYYY-MM-DD') for a UTC column.
+
+    With changes (see offset_changes) the column is a naive UTC datetime that
+    is shifted to local time first; without, it is already a local date.
+    """
+    if dialect == "sqlite":
+        local = column
+        if changes and any(offset for _, offset in changes):
+            local = func.datetime(column, _offset_case(changes, column, lambda offset: f"{offset:+d} seconds"))
+        if granularity == "week":
+            # Forward to Sunday (or stay), then back to that week's Monday
+            return func.date(local, "weekday 0", "-6 days")
+        if granularity == "month":
+            return func.strftime("%Y-%m-01", local)
+        return func.date(local)
+    if dialect in ("mysql", "mariadb"):
+        local = column
+        if changes and any(offset for _, offset in changes):
+            local = func.timestampadd(literal_column("SECOND"), _offset_case(changes, column, lambda offset: offset), column)
+        if granularity == "week":
+            return func.subdate(func.date(local), func.weekday(local))
+        if granularity == "month":
+            return func.date_format(local, "%Y-%m-01")
+        return func.date(local)
+    raise InvalidTrendRequest(f"Trend bucketing is not supported on {dialect}")
+
+
+def _is_utc(changes: list) -> bool:
+    return all(offset == 0 for _, offset in changes)
+
+
+def _raw_statement(dialect, granularity, start_utc, end_utc, changes):
+    bucket = local_bucket_expression(dialect, granularity, Feedback.created_at, changes)
+    columns = [
+        bucket.label("bucket"),
+        func.count(Feedback.id).label("count"),
+        func.coalesce(func.sum(Feedback.rating), 0.0).label("rating_sum"),
+    ]
+    for k, field in enumerate(rollups.HIST_FIELDS):
+        columns.append(func.count(case((rollups.histogram_condition(k), 1))).label(field))
+    return (
+        select(*columns)
+        .where(Feedback.created_at >= start_utc, Feedback.created_at < end_utc)
+        .group_by(bucket)
+    )
+
+
+def _rollup_statement(dialect, granularity, first_day, end_day):
+    bucket = local_bucket_expression(dialect, granularity, FeedbackDailyRollup.day)
+    columns = [
+        bucket.label("bucket"),
+        func.sum(FeedbackDailyRollup.count).label("count"),
+        func.sum(FeedbackDailyRollup.rating_sum).label("rating_sum"),
+    ]
+    for field in rollups.HIST_FIELDS:
+        columns.append(func.sum(getattr(FeedbackDailyRollup, field)).label(field))
+    return (
+        select(*columns)
+        .where(FeedbackDailyRollup.day >= first_day, FeedbackDailyRollup.day < end_day)
+        .group_by(bucket)
+    )
+
+
+def build_trend(db: Session, granularity: str = "day", start: datetime = None, end: datetime = None,
+                tz_name: str = "UTC", use_rollups: bool = None) -> ReportBuild:
+    """Count, average and rating histogram per day/week/month bucket in tz_name.
+
+    Naive start/end are taken as local time in tz_name. Buckets cover the
+    range rounded out to whole buckets, empty ones included. Everything
+    comes from one grouped query: on the rollup table when the zone is UTC
+    throughout (rollup days are UTC days), otherwise on feedback.
+    """
+    if granularity not in TREND_GRANULARITIES:
+        raise InvalidTrendRequest(
+            f"Unsupported granularity '{granularity}', expected one of: {', '.join(TREND_GRANULARITIES)}"
+        )
+    try:
+        tz = ZoneInfo(tz_name)
+    except (ValueError, KeyError):
+        raise InvalidTrendRequest(f"Unknown time zone '{tz_name}'")
+    if use_rollups is None:
+        use_rollups = REPORT_USE_ROLLUPS
+
+    build = ReportBuild()
+    started = time.perf_counter()
+
+    end = end.replace(tzinfo=tz) if end and end.tzinfo is None else end
+    start = start.replace(tzinfo=tz) if start and start.tzinfo is None else start
+    end = end or datetime.now(timezone.utc)
+    if start is None:
+        first = _bucket_floor(end.astimezone(tz).date(), granularity)
+        for _ in range(TREND_DEFAULT_BUCKETS[granularity] - 1):
+            first = _previous_bucket(first, granularity)
+        start = _local_midnight(first, tz)
+    if start >= end:
+        raise InvalidTrendRequest("start must be before end")
+
+    days = bucket_starts(start, end, granularity, tz)
+    range_start = _local_midnight(days[0], tz)
+    range_end = _local_midnight(days[-1], tz)
+    changes = offset_changes(range_start, range_end, tz)
+    dialect = db.get_bind().dialect.name
+
+    if use_rollups and _is_utc(changes):
+        source = "rollups"
+        stmt = _rollup_statement(dialect, granularity, days[0], days[-1])
+    else:
+        source = "raw"
+        stmt = _raw_statement(dialect, granularity, as_naive_utc(range_start), as_naive_utc(range_end), changes)
+    found = {}
+    for row in build.execute(db, stmt):
+        delta = found[rollups.as_date(row.bucket)] = rollups.RollupDelta()
+        delta.count = int(row.count)
+        delta.rating_sum = float(row.rating_sum or 0.0)
+        delta.hist = [int(getattr(row, field) or 0) for field in rollups.HIST_FIELDS]
+    if source == "raw":
+        # Rollups still count archived rows; feedback doesn't, so those are
+        # read back from the segments covering the range (if any)
+        for table in archive.scan(db, ["created_at", "rating"], as_naive_utc(range_start), as_naive_utc(range_end)):
+            for created_at, rating in zip(table["created_at"].to_pylist(), table["rating"].to_pylist()):
+                local_day = created_at.replace(tzinfo=timezone.utc).astimezone(tz).date()
+                found.setdefault(_bucket_floor(local_day, granularity), rollups.RollupDelta()).add(rating)
+
+    buckets = []
+    for day in days[:-1]:
+        delta = found.get(day) or rollups.RollupDelta()
+        buckets.append({
+            "start": _local_midnight(day, tz).isoformat(),
+            "count": delta.count,
+            "avg_rating": round(delta.rating_sum / delta.count, 2) if delta.count else None,
+            "distribution": rollups.distribution(delta.hist),
+            "histogram": rating_metrics.histogram_labels(delta.hist),
+            "metrics": rating_metrics.summarize(delta.hist),
+        })
+
+    build.payload = {
+        "granularity": granularity,
+        "timezone": tz_name,
+        "start": range_start.isoformat(),
+        "end": range_end.isoformat(),
+        "source": source,
+        "buckets": buckets,
+    }
+    build.elapsed_ms = (time.perf_counter() - started) * 1000
+    return build
@@ -0,0 +1,313 @@
+import os
+import re
+import time
+import uuid
+import queue
+import mimetypes
+import threading
+import logging
+from datetime import timedelta
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from sqlalchemy import select, update
+
+from .database import SessionLocal
+from .models import Feedback, utc_now
+from .state import CSAT_STATE_DIR, open_private
+from .storage import S3Client, ScreenshotTooLarge, copy_limited
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Commit feedback first and upload screenshots from a background pool
+ASYNC_SCREENSHOT_UPLOADS = os.getenv("ASYNC_SCREENSHOT_UPLOADS", "false").lower() == "true"
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", "100"))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "3"))
+UPLOAD_RETRY_BACKOFF = float(os.getenv("UPLOAD_RETRY_BACKOFF", "0.5"))
+# How long a request waits for queue space before uploading inline instead
+UPLOAD_ENQUEUE_TIMEOUT = float(os.getenv("UPLOAD_ENQUEUE_TIMEOUT", "0.1"))
+UPLOAD_SPOOL_PATH = os.getenv("UPLOAD_SPOOL_PATH", os.path.join(CSAT_STATE_DIR, "upload-spool"))
+# On startup, pending uploads older than this are taken to be lost with the
+# worker that queued them: their spooled screenshots are queued again
+UPLOAD_RECOVERY_GRACE_SECONDS = float(os.getenv("UPLOAD_RECOVERY_GRACE_SECONDS", "3600"))
+# Screenshots whose upload failed are kept (and retried on startup) this long
+UPLOAD_SPOOL_KEEP_DAYS = float(os.getenv("UPLOAD_SPOOL_KEEP_DAYS", "7"))
+
+# Values stored in Feedback.screenshot while the upload is not done
+SCREENSHOT_PENDING = "pending"
+SCREENSHOT_FAILED = "failed"
+
+# Spool files of committed rows: feedback-<id>[-<claim>][.<ext>]
+_ASSIGNED = re.compile(r"feedback-(\d+)(?:-[0-9a-f]+)?(\.[a-z0-9]{1,10})?")
+_EXTENSION = re.compile(r"\.[a-z0-9]{1,10}")
+
+
+class UploadJob:
+    def __init__(self, feedback_id: int, spool_path: str, filename: str, content_type: str):
+        self.feedback_id = feedback_id
+        self.spool_path = spool_path
+        self.filename = filename
+        self.content_type = content_type
+        self.enqueued_at = time.monotonic()
+
+
+class UploadQueue:
+    """Bounded pool of threads that upload spooled screenshots and fill in Feedback.screenshot."""
+
+    def __init__(self, storage, session_factory=SessionLocal, workers: int = UPLOAD_WORKERS,
+                 maxsize: int = UPLOAD_QUEUE_SIZE, max_retries: int = UPLOAD_MAX_RETRIES,
+                 retry_backoff: float = UPLOAD_RETRY_BACKOFF, spool_path: str = UPLOAD_SPOOL_PATH):
+        self.storage = storage
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spool_path = spool_path
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.inline = 0
+        self.latency_count = 0
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"upload-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def spool(self, upload: UploadFile) -> str:
+        """Copy the request's upload to disk so it outlives the request.
+
+        Raises ScreenshotTooLarge (and removes the partial copy) past the storage limit.
+        """
+        path = os.path.join(self.spool_path, uuid.uuid4().hex)
+        try:
+            with os.fdopen(open_private(path, os.O_WRONLY | os.O_TRUNC), "wb") as buffer:
+                copy_limited(upload.file, buffer, self.storage.max_bytes)
+        except ScreenshotTooLarge:
+            os.remove(path)
+            raise
+        return path
+
+    def assign(self, job: UploadJob, feedback_id: int):
+        """Tie a spooled screenshot to its committed row, so recover() can find it after a crash."""
+        job.feedback_id = feedback_id
+        ext = os.path.splitext(job.filename or "")[1].lower()
+        if not _EXTENSION.fullmatch(ext):
+            ext = ""
+        path = os.path.join(self.spool_path, f"feedback-{feedback_id}{ext}")
+        try:
+            os.rename(job.spool_path, path)
+            job.spool_path = path
+        except OSError as e:
+            logger.error("Could not rename spooled screenshot %s: %s", job.spool_path, e)
+
+    def submit(self, job: UploadJob, timeout: float = UPLOAD_ENQUEUE_TIMEOUT) -> bool:
+        """Queue a job; False means the queue stayed full and the caller should run it inline."""
+        self.start()
+        try:
+            self._queue.put(job, timeout=timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def run_inline(self, job: UploadJob):
+        with self._stats_lock:
+            self.inline += 1
+        self._process(job)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._process(job)
+            except Exception as e:
+                logger.error("Screenshot upload worker error: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _upload(self, job: UploadJob) -> str:
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            try:
+                with open(job.spool_path, "rb") as f:
+                    location = self.storage.store(f, job.filename, job.content_type)
+            except ScreenshotTooLarge as e:
+                logger.warning("Spooled screenshot %s rejected: %s", job.spool_path, e)
+                return None
+            except OSError as e:
+                logger.error("Error reading spooled screenshot %s: %s", job.spool_path, e)
+                location = None
+            if location:
+                return location
+        return None
+
+    def _process(self, job: UploadJob):
+        location = self._upload(job)
+
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(Feedback)
+                .where(Feedback.id == job.feedback_id,
+                       Feedback.screenshot.in_([SCREENSHOT_PENDING, SCREENSHOT_FAILED]))
+                .values(screenshot=location or SCREENSHOT_FAILED)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        elapsed_ms = (time.monotonic() - job.enqueued_at) * 1000
+        with self._stats_lock:
+            if location:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.latency_count += 1
+            self.latency_total_ms += elapsed_ms
+            self.latency_max_ms = max(self.latency_max_ms, elapsed_ms)
+
+        if location:
+            _remove(job.spool_path)
+        else:
+            # Keep the bytes around so the screenshot can be recovered by hand
+            logger.error("Screenshot upload for feedback %s failed; kept %s", job.feedback_id, job.spool_path)
+
+    def recover(self, grace: float = UPLOAD_RECOVERY_GRACE_SECONDS, keep_days: float = UPLOAD_SPOOL_KEEP_DAYS):
+        """Startup sweep for uploads lost with a previous worker.
+
+        Rows left pending longer than grace seconds get their spooled
+        screenshot queued again, or are marked failed when it is gone;
+        screenshots that failed before are retried until keep_days old.
+        Spool files of uncommitted or finished rows are removed. Each file
+        is claimed by renaming it, so workers starting together split the
+        work instead of repeating it. Returns the number of jobs queued.
+        """
+        now = time.time()
+        files = {}
+        try:
+            names = os.listdir(self.spool_path)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            path = os.path.join(self.spool_path, name)
+            try:
+                age = now - os.path.getmtime(path)
+            except OSError:
+                continue
+            if age < grace:
+                continue
+            match = _ASSIGNED.fullmatch(name)
+            if match is None:
+                # Spooled for a request that never committed its row
+                _remove(path)
+                continue
+            files[int(match.group(1))] = (path, match.group(2) or "", age)
+
+        cutoff = utc_now() - timedelta(seconds=grace)
+        db = self.session_factory()
+        try:
+            states = dict(db.execute(
+                select(Feedback.id, Feedback.screenshot).where(Feedback.id.in_(list(files)))
+            ).all()) if files else {}
+            pending = set(db.execute(
+                select(Feedback.id).where(
+                    Feedback.created_at >= cutoff - timedelta(days=keep_days),
+                    Feedback.created_at < cutoff,
+                    Feedback.screenshot == SCREENSHOT_PENDING,
+                )
+            ).scalars())
+            lost = pending - set(files)
+            if lost:
+                db.execute(
+                    update(Feedback)
+                    .where(Feedback.id.in_(lost), Feedback.screenshot == SCREENSHOT_PENDING)
+                    .values(screenshot=SCREENSHOT_FAILED)
+                )
+                db.commit()
+                logger.error("Marked %d screenshot uploads failed: spool files missing", len(lost))
+        finally:
+            db.close()
+
+        jobs = []
+        for feedback_id, (path, ext, age) in sorted(files.items()):
+            state = states.get(feedback_id)
+            if state not in (SCREENSHOT_PENDING, SCREENSHOT_FAILED) or (
+                    state == SCREENSHOT_FAILED and age > keep_days * 86400):
+                _remove(path)
+                continue
+            claimed = os.path.join(self.spool_path, f"feedback-{feedback_id}-{uuid.uuid4().hex[:8]}{ext}")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                # Another worker claimed it first
+                continue
+            jobs.append(UploadJob(feedback_id, claimed, f"screenshot{ext}", mimetypes.guess_type(f"x{ext}")[0]))
+
+        if jobs:
+            logger.warning("Re-queueing %d screenshot uploads from the spool", len(jobs))
+            self.start()
+        for job in jobs:
+            self._queue.put(job)
+        return len(jobs)
+
+    def start_recovery(self):
+        """recover() on a background thread, so startup doesn't wait for the queue."""
+        def run():
+            try:
+                self.recover()
+            except Exception as e:
+                logger.error("Screenshot upload recovery failed: %s", e)
+
+        threading.Thread(target=run, name="upload-recovery", daemon=True).start()
+
+    def drain(self, timeout: float = 30.0):
+        """Finish queued uploads and stop the workers (called on shutdown)."""
+        threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "enabled": ASYNC_SCREENSHOT_UPLOADS,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "workers": len(self._threads),
+                "completed": self.completed,
+                "failed": self.failed,
+                "retries": self.retries,
+                "inline": self.inline,
+                "latency_avg_ms": self.latency_total_ms / self.latency_count if self.latency_count else 0.0,
+                "latency_max_ms": self.latency_max_ms,
+            }
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+upload_queue = UploadQueue(S3Client())
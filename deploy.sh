@@ -26,10 +26,11 @@ echo "Checking dependencies..."
 # Use full path for poetry if needed, or assume it's in PATH now
 poetry install --no-interaction || /home/ec2-user/.local/bin/poetry install --no-interaction
 
-# Update database tables (just in case model changed)
-echo "Syncing database tables..."
-poetry run python -c "from app.database import engine, Base; from app.models import Feedback; Base.metadata.create_all(bind=engine)" || \
-/home/ec2-user/.local/bin/poetry run python -c "from app.database import engine, Base; from app.models import Feedback; Base.metadata.create_all(bind=engine)"
+# Apply pending schema migrations (once per deploy, not in every worker)
+echo "Migrating database schema..."
+poetry run python scripts/migrate.py || \
+/home/ec2-user/.local/bin/poetry run python scripts/migrate.py || \
+{ echo "Error: Database migration failed, not restarting the service"; exit 1; }
 
 # Restart the service
 echo "Restarting Service..."
@@ -0,0 +1,11 @@
+# Loaded automatically by gunicorn from the working directory
+import os
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live series from the shared metrics directory;
+    # without one (a single-process setup) there is nothing to clean up
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,72 @@
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import SessionLocal, engine
+from app.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_SEGMENT_ROWS, archive_before, segments, stats
+from app.models import utc_now
+from app.report_engine import ROLLING_WINDOWS
+
+
+def archive(days, segment_rows, vacuum):
+    if days <= max(ROLLING_WINDOWS):
+        # The rolling report windows are read from live rows
+        print(f"Error: only rows older than {max(ROLLING_WINDOWS)} days can be archived")
+        return False
+    # Cut at a UTC midnight so whole days move together
+    before = datetime.combine((utc_now() - timedelta(days=days)).date(), datetime.min.time())
+    db = SessionLocal()
+    try:
+        print(f"Archiving feedback created before {before:%Y-%m-%d} (UTC)...")
+        written = archive_before(db, before, segment_rows)
+        rows = sum(segment.count for segment in written)
+        size = sum(segment.bytes for segment in written)
+        print(f"Done. {rows} rows moved into {len(written)} segments ({size / 1e6:.1f} MB).")
+    except Exception as e:
+        db.rollback()
+        print(f"Error archiving feedback: {e}")
+        return False
+    finally:
+        db.close()
+
+    if vacuum and written:
+        # Deleted rows leave free pages behind; this hands them back to the filesystem
+        print("Reclaiming space...")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if conn.dialect.name == "sqlite":
+                conn.exec_driver_sql("VACUUM")
+            elif conn.dialect.name == "mysql":
+                conn.exec_driver_sql("OPTIMIZE TABLE feedback")
+        print("Done.")
+    return True
+
+
+def list_segments():
+    db = SessionLocal()
+    try:
+        for segment in segments(db):
+            print(f"{segment.id:>5}  {segment.first_created_at:%Y-%m-%d} - {segment.last_created_at:%Y-%m-%d}  "
+                  f"ids {segment.first_id}-{segment.last_id}  {segment.count} rows  "
+                  f"{segment.bytes / 1e6:.1f} MB  {segment.location}")
+        totals = stats(db)
+        print(f"{totals['segments']} segments, {totals['rows']} rows, {totals['bytes'] / 1e6:.1f} MB")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old feedback rows into compressed Parquet archive segments")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive rows older than this many days")
+    parser.add_argument("--segment-rows", type=int, default=ARCHIVE_SEGMENT_ROWS)
+    parser.add_argument("--vacuum", action="store_true", help="reclaim the freed space afterwards (locks the database)")
+    parser.add_argument("--list", action="store_true", help="only list the archive segments")
+    args = parser.parse_args()
+
+    if args.list:
+        list_segments()
+        sys.exit(0)
+    sys.exit(0 if archive(args.days, args.segment_rows, args.vacuum) else 1)
@@ -0,0 +1,116 @@
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def run_load(app, requests, concurrency, report_share):
+    import httpx
+
+    latencies = []
+    counter = iter(range(requests))
+    errors = 0
+
+    async def worker(client):
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            if i % 100 < report_share:
+                response = await client.get("/api/report")
+            else:
+                response = await client.post("/api/submit", data={
+                    "name": "Bench", "email": f"bench{i % 500}@example.com", "rating": str(i % 5 + 1),
+                })
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    # App errors (e.g. "database is locked" under heavy write contention)
+    # come back as 500s and are counted instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    # Dependency cleanup (closing sessions) can still be running after the
+    # last response; let it finish before the next run
+    while len(asyncio.all_tasks()) > 1:
+        await asyncio.sleep(0.01)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": requests / elapsed,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def child(args):
+    # Runs in a fresh interpreter: DATABASE_ASYNC is read at import
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='csat-bench-')}/bench.db"
+    os.environ["REPORT_CACHE_STAMP"] = os.path.join(tempfile.mkdtemp(prefix="csat-bench-stamp-"), "stamp")
+    # Every report request should reach the database
+    os.environ["REPORT_CACHE_TTL"] = "0"
+    # Every request comes from one client; measure the write path, not the rate limit
+    os.environ["ADMISSION_CONTROL"] = "false"
+    from app import migrations
+    migrations.upgrade(log=lambda message: None)
+
+    from app.main import app
+    from app.routes.reports import get_current_admin
+    app.dependency_overrides[get_current_admin] = lambda: "bench"
+
+    from app.database import engine, async_engine
+
+    async def run_all():
+        results = {}
+        for concurrency in args.concurrency:
+            results[concurrency] = await run_load(app, args.requests, concurrency, args.report_share)
+        if async_engine is not None:
+            await async_engine.dispose()
+        return results
+
+    results = asyncio.run(run_all())
+    engine.dispose()
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit/report throughput: async engine vs sync engine in the threadpool")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--report-share", type=int, default=20, help="percent of requests that read the report")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    print(f"{args.requests} requests per run, {args.report_share}% report reads, SQLite, report cache off")
+    print(f"{'mode':<6} {'concurrency':>11} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in ("sync", "async"):
+        env = dict(os.environ, DATABASE_ASYNC="true" if mode == "async" else "false")
+        command = [sys.executable, __file__, "--child", "--requests", str(args.requests),
+                   "--report-share", str(args.report_share), "--concurrency", *map(str, args.concurrency)]
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+        for concurrency, r in results.items():
+            print(f"{mode:<6} {concurrency:>11} {r['rps']:>9.1f} {r['p50']:>8.2f} {r['p99']:>8.2f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run_writers(threads, seconds):
+    from app.database import SessionLocal
+    from app.models import utc_now
+    from app.routes.public import insert_feedback
+
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + seconds
+
+    def writer(n):
+        i = 0
+        while time.monotonic() < deadline:
+            i += 1
+            row = {
+                "name": "Bench", "email": f"bench{n}-{i % 200}@example.com", "rating": i % 5 + 1,
+                "description": None, "ip_address": "127.0.0.1", "screenshot": None, "created_at": utc_now(),
+            }
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                # The same transaction a submit runs: row + rollup + rater sketch
+                insert_feedback(db, row)
+                latencies.append((time.perf_counter() - started) * 1000)
+            except Exception:
+                db.rollback()
+                errors.append(1)
+            finally:
+                db.close()
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "commits": len(latencies),
+        "errors": len(errors),
+        "per_second": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50) if latencies else 0.0,
+        "p99": percentile(latencies, 99) if latencies else 0.0,
+    }
+
+
+def child(args):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='csat-bench-')}/bench.db"
+    os.environ["DATABASE_ASYNC"] = "false"
+    os.environ["REPORT_CACHE_STAMP"] = os.path.join(tempfile.mkdtemp(prefix="csat-bench-stamp-"), "stamp")
+    from app import migrations
+    migrations.upgrade(log=lambda message: None)
+    from app.database import engine, engine_stats
+
+    results = {}
+    for threads in args.threads:
+        before = engine_stats.to_dict()
+        result = run_writers(threads, args.seconds)
+        after = engine_stats.to_dict()
+        result["checkout_waits"] = after["checkout_waits"] - before["checkout_waits"]
+        result["busy_errors"] = after["sqlite_busy_errors"] - before["sqlite_busy_errors"]
+        results[threads] = result
+    engine.dispose()
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent submit-transaction throughput per DATABASE_PROFILE (SQLite)")
+    parser.add_argument("--profiles", nargs="+", default=["default", "web", "batch"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    print(f"Submit transactions (feedback row + rollup + sketch) for {args.seconds:.0f}s per run, SQLite file")
+    print(f"{'profile':<8} {'threads':>7} {'commits/s':>10} {'p50 ms':>8} {'p99 ms':>9} "
+          f"{'errors':>7} {'busy':>5} {'pool waits':>10}")
+    for profile in args.profiles:
+        env = dict(os.environ, DATABASE_PROFILE=profile)
+        command = [sys.executable, __file__, "--child", "--seconds", str(args.seconds),
+                   "--threads", *map(str, args.threads)]
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        for threads, r in json.loads(output.strip().splitlines()[-1]).items():
+            print(f"{profile:<8} {threads:>7} {r['per_second']:>10.1f} {r['p50']:>8.2f} {r['p99']:>9.2f} "
+                  f"{r['errors']:>7} {r['busy_errors']:>5} {r['checkout_waits']:>10}")
+
+
+if __name__ == "__main__":
+    main()
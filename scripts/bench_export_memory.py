@@ -0,0 +1,81 @@
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+MB = 1024 * 1024
+
+
+def seed(total):
+    from sqlalchemy import insert, func, select
+    from app.database import SessionLocal
+    from app.models import Feedback, utc_now
+
+    db = SessionLocal()
+    try:
+        have = db.execute(select(func.count(Feedback.id))).scalar()
+        now = utc_now()
+        batch = []
+        for i in range(have, total):
+            batch.append({
+                "name": f"Export {i}", "email": f"export{i % 5000}@example.com",
+                "rating": (i % 10 + 1) / 2, "description": "Streaming export benchmark " * 4,
+                "ip_address": "127.0.0.1", "screenshot": None, "created_at": now,
+            })
+            if len(batch) == 10000:
+                db.execute(insert(Feedback), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Feedback), batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(fmt, chunk_size):
+    from app.database import SessionLocal
+    from app.exporter import iter_chunks, iter_export
+
+    db = SessionLocal()
+    tracemalloc.start()
+    started = time.perf_counter()
+    written = 0
+    try:
+        for data in iter_export(iter_chunks(db, [], chunk_size), fmt):
+            written += len(data)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, written, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of streaming exports as the table grows")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson", "parquet"])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='csat-bench-')}/bench.db"
+    from app.database import Base, engine
+    from app import models  # noqa: F401 (registers the tables)
+    Base.metadata.create_all(bind=engine)
+
+    print(f"{'rows':>9} {'format':<8} {'py peak MB':>11} {'output MB':>10} {'rows/s':>10}")
+    for total in sorted(args.rows):
+        seed(total)
+        for fmt in args.formats:
+            peak, written, elapsed = measure(fmt, args.chunk_size)
+            print(f"{total:>9} {fmt:<8} {peak / MB:>11.2f} {written / MB:>10.1f} {total / elapsed:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def make_row(i):
+    from app.models import utc_now
+    return {
+        "name": f"Bench {i}",
+        "email": f"bench{i % 1000}@example.com",
+        "rating": (i % 10 + 1) / 2,
+        "description": "Group commit benchmark",
+        "ip_address": "127.0.0.1",
+        "screenshot": None,
+        "created_at": utc_now(),
+    }
+
+
+def run_threads(threads, rows_per_thread, target):
+    workers = [threading.Thread(target=target, args=(t, rows_per_thread)) for t in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def per_row_commits(threads, rows_per_thread):
+    from app.database import SessionLocal
+    from app.models import Feedback
+    from app import rollups
+
+    def submit(t, n):
+        for i in range(n):
+            row = make_row(t * n + i)
+            db = SessionLocal()
+            try:
+                db.add(Feedback(**row))
+                rollups.record_feedback(db, row["created_at"], row["rating"])
+                db.commit()
+            finally:
+                db.close()
+
+    return run_threads(threads, rows_per_thread, submit)
+
+
+def group_commits(threads, rows_per_thread, max_rows, max_delay_ms, wait=True):
+    from app.ingest import FeedbackBuffer
+
+    buffer = FeedbackBuffer(max_rows=max_rows, max_delay_ms=max_delay_ms)
+
+    def submit(t, n):
+        for i in range(n):
+            ticket = buffer.add(make_row(t * n + i))
+            # Same contract as /api/submit with FEEDBACK_BUFFER_WAIT=true
+            if wait and not ticket.wait(30):
+                raise RuntimeError("buffered row was not committed")
+
+    started = time.perf_counter()
+    run_threads(threads, rows_per_thread, submit)
+    # Write-behind rows only count once they are committed too
+    buffer.drain()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inserts/sec: per-row commits vs group commits")
+    parser.add_argument("--rows", type=int, default=4000)
+    parser.add_argument("--threads", type=int, default=40, help="concurrent submitters (FastAPI's threadpool size)")
+    parser.add_argument("--max-rows", type=int, default=500)
+    parser.add_argument("--max-delay-ms", type=float, default=10)
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='csat-bench-')}/bench.db"
+    from app.database import Base, engine
+    from app import models  # noqa: F401 (registers the tables)
+    Base.metadata.create_all(bind=engine)
+
+    per_thread = args.rows // args.threads
+    total = per_thread * args.threads
+
+    elapsed = per_row_commits(args.threads, per_thread)
+    print(f"per-row commits: {total} rows in {elapsed:.2f}s -> {total / elapsed:,.0f} inserts/s")
+
+    elapsed = group_commits(args.threads, per_thread, args.max_rows, args.max_delay_ms)
+    print(f"group commits:   {total} rows in {elapsed:.2f}s -> {total / elapsed:,.0f} inserts/s")
+
+    elapsed = group_commits(args.threads, per_thread, args.max_rows, args.max_delay_ms, wait=False)
+    print(f"write-behind:    {total} rows in {elapsed:.2f}s -> {total / elapsed:,.0f} inserts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import gzip
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import seed_dataset
+
+
+def per_call_us(fn, repeat):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def payloads(db):
+    from app.listing import LISTING_MAX_LIMIT, list_feedback
+    from app.report_engine import build_report
+    from app.trend import build_trend
+    from app.schemas import FeedbackPage, ReportResponse, TrendResponse
+
+    now = datetime.now()
+    return [
+        ("listing, 200 rows", list_feedback(db, limit=LISTING_MAX_LIMIT), FeedbackPage),
+        ("report", build_report(db).payload, ReportResponse),
+        ("trend, 365 days", build_trend(db, "day", now - timedelta(days=365), now).payload, TrendResponse),
+    ]
+
+
+def serializers(response_model):
+    from pydantic import TypeAdapter
+    from pydantic_core import to_json
+    from app.responses import orjson
+
+    adapter = TypeAdapter(response_model)
+    candidates = {
+        # What FastAPI does for a route returning a dict with response_model set
+        "validate + dump": lambda payload: adapter.dump_json(adapter.validate_python(payload)),
+        # JSONResponse / the report cache before
+        "json.dumps": lambda payload: json.dumps(
+            payload, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=datetime.isoformat
+        ).encode("utf-8"),
+        "pydantic-core": to_json,
+    }
+    if orjson is not None:
+        candidates["orjson"] = orjson.dumps
+    return candidates
+
+
+async def wire(app, path, requests, encoding):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(5):
+            await client.get(path, headers={"Accept-Encoding": encoding})
+        started = time.perf_counter()
+        for _ in range(requests):
+            # Raw body: httpx would otherwise decompress it
+            async with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+                size = 0
+                async for chunk in response.aiter_raw():
+                    size += len(chunk)
+        elapsed = time.perf_counter() - started
+    return requests / elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API payload serialization time and bytes on the wire")
+    parser.add_argument("--rows", default="10k", help="dataset size (see seed_dataset.py)")
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="csat-bench-"), "bench.db")
+    seed_dataset.build(path, seed_dataset.parse_rows(args.rows), seed=1, years=1.0, log=lambda *a: None)
+    os.environ["REPORT_CACHE_TTL"] = "0"
+    os.environ["REPORT_CACHE_STAMP"] = path + ".stamp"
+
+    from app.database import SessionLocal
+    from app.responses import json_backend
+
+    print(f"JSON backend: {json_backend()}")
+    db = SessionLocal()
+    try:
+        cases = payloads(db)
+    finally:
+        db.close()
+
+    print(f"{'':<20} {'serializer':<16} {'us/call':>9} {'bytes':>8}")
+    for label, payload, response_model in cases:
+        for name, fn in serializers(response_model).items():
+            print(f"{label:<20} {name:<16} {per_call_us(lambda: fn(payload), args.repeat):>9.1f} {len(fn(payload)):>8}")
+
+    print(f"\n{'':<20} {'gzip level':<16} {'us/call':>9} {'bytes':>8}")
+    from app.responses import dumps
+    for label, payload, _ in cases:
+        body = dumps(payload)
+        for level in (1, 6, 9):
+            compressed = gzip.compress(body, compresslevel=level)
+            print(f"{label:<20} {level:<16} {per_call_us(lambda: gzip.compress(body, compresslevel=level), args.repeat):>9.1f} "
+                  f"{len(compressed):>8}")
+
+    from app.main import app
+    from app.routes.reports import get_current_admin
+    app.dependency_overrides[get_current_admin] = lambda: "bench"
+    print(f"\n{'endpoint':<36} {'encoding':<10} {'req/s':>8} {'bytes':>8}")
+    for endpoint in ("/api/feedback?limit=200", "/api/report", "/api/report/trend?granularity=day"):
+        for encoding in ("identity", "gzip"):
+            rate, size = asyncio.run(wire(app, endpoint, args.requests, encoding))
+            print(f"{endpoint:<36} {encoding:<10} {rate:>8.0f} {size:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import timedelta
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def seed(total):
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import Feedback, utc_now
+
+    db = SessionLocal()
+    try:
+        now = utc_now()
+        batch = []
+        for i in range(total):
+            batch.append({
+                "name": f"Listing {i}", "email": f"listing{i % 5000}@example.com",
+                "rating": (i % 10 + 1) / 2, "description": "Listing benchmark",
+                "ip_address": "127.0.0.1", "screenshot": None,
+                "created_at": now - timedelta(seconds=total - i),
+            })
+            if len(batch) == 10000:
+                db.execute(insert(Feedback), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Feedback), batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentile(samples, 50), percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Listing latency: keyset cursor vs OFFSET, first vs deep pages")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000, 3000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='csat-bench-')}/bench.db"
+    from sqlalchemy import select
+    from app.database import Base, SessionLocal, engine
+    from app.listing import list_feedback
+    from app.models import Feedback
+    Base.metadata.create_all(bind=engine)
+    seed(args.rows)
+
+    db = SessionLocal()
+    # Walk the keyset pages once to collect the cursor that starts each measured page
+    cursors, cursor = {1: None}, None
+    for page in range(2, max(args.pages) + 1):
+        cursor = list_feedback(db, limit=args.limit, cursor=cursor)["next_cursor"]
+        cursors[page] = cursor
+
+    def offset_page(page):
+        stmt = (
+            select(Feedback.id, Feedback.name, Feedback.email, Feedback.rating,
+                   Feedback.description, Feedback.created_at)
+            .where(Feedback.created_at.isnot(None))
+            .order_by(Feedback.created_at.desc(), Feedback.id.desc())
+            .offset((page - 1) * args.limit)
+            .limit(args.limit)
+        )
+        return db.execute(stmt).all()
+
+    print(f"{args.rows} rows, {args.limit} per page")
+    print(f"{'page':>6} {'keyset p50':>11} {'keyset p99':>11} {'offset p50':>11} {'offset p99':>11}  (ms)")
+    for page in args.pages:
+        k50, k99 = timed(lambda: list_feedback(db, limit=args.limit, cursor=cursors[page]), args.repeat)
+        o50, o99 = timed(lambda: offset_page(page), args.repeat)
+        print(f"{page:>6} {k50:>11.2f} {k99:>11.2f} {o50:>11.2f} {o99:>11.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import seed_dataset
+
+LIMIT = 50
+
+
+def timed(db, stmt, repeat):
+    db.execute(stmt).all()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = db.execute(stmt).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), len(rows)
+
+
+def insert_overhead(rows):
+    """Per-row cost of insert_feedback with the FTS triggers on and off."""
+    import tempfile
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import migrations, search
+    from app.models import utc_now
+    from app.routes.public import insert_feedback
+
+    results = {}
+    for label, triggers in (("without search index", False), ("with search index", True)):
+        path = os.path.join(tempfile.mkdtemp(prefix="csat-bench-"), "insert.db")
+        engine = create_engine(f"sqlite:///{path}")
+        migrations.upgrade(engine, log=lambda message: None)
+        if not triggers:
+            with engine.begin() as conn:
+                search.drop_triggers(conn)
+        sessions = sessionmaker(bind=engine)
+        started = time.perf_counter()
+        for i in range(rows):
+            db = sessions()
+            try:
+                insert_feedback(db, {
+                    "name": "Bench", "email": f"bench{i}@example.com", "rating": 2,
+                    "description": "The checkout keeps crashing when I pay. Order 12345678.",
+                    "ip_address": "127.0.0.1", "screenshot": None, "created_at": utc_now(),
+                })
+            finally:
+                db.close()
+        results[label] = (time.perf_counter() - started) / rows * 1000
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search vs the LIKE scan on a seeded dataset")
+    parser.add_argument("--rows", default="1m", help="dataset size (see seed_dataset.py)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--inserts", type=int, default=2000, help="rows for the insert overhead check")
+    args = parser.parse_args()
+
+    rows = seed_dataset.parse_rows(args.rows)
+    path = seed_dataset.dataset_path(rows, args.seed)
+    subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), "seed_dataset.py"),
+                    "--rows", str(rows), "--seed", str(args.seed)], check=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from datetime import datetime, timedelta
+    from sqlalchemy import text
+    from app.database import SessionLocal
+    from app.listing import listing_statement
+    from app.search import parse_terms, search_statement, fts5_query
+
+    db = SessionLocal()
+    try:
+        # The oldest quoted order number: the LIKE scan, newest first, has to
+        # read nearly the whole table to reach it
+        needle = db.execute(text(
+            "SELECT description FROM feedback WHERE description LIKE '%Order %' ORDER BY id LIMIT 1"
+        )).scalar().split("Order ")[1].rstrip(".")
+        month_ago = datetime.now() - timedelta(days=30)
+        cases = [
+            ("order number (1 match)", needle, {}),
+            ("topic + complaint", "refund charged twice", {}),
+            ("misspelt, no match", "refnud", {}),
+            ("rare word", "wishlist", {}),
+            ("common word", "support", {}),
+            ("word, rating <= 2, 30 days", "crashing", {"max_rating": 2, "start": month_ago}),
+        ]
+        print(f"{rows:,} rows, first page of {LIMIT}, median of {args.repeat}")
+        print(f"{'query':<28} {'matches':>8} {'listing q= ms':>14} {'LIKE terms ms':>14} {'FTS5 ms':>9} {'vs LIKE':>8}")
+        for label, q, filters in cases:
+            terms = parse_terms(q)
+            matches = db.execute(
+                text("SELECT count(*) FROM feedback_fts WHERE feedback_fts MATCH :q"), {"q": fts5_query(terms)}
+            ).scalar()
+            listing_ms, _ = timed(db, listing_statement(limit=LIMIT, q=q, **filters), args.repeat)
+            like_ms, _ = timed(db, search_statement("like", terms, limit=LIMIT, **filters), args.repeat)
+            fts_ms, _ = timed(db, search_statement("fts5", terms, limit=LIMIT, **filters), args.repeat)
+            print(f"{label:<28} {matches:>8} {listing_ms:>14.1f} {like_ms:>14.1f} {fts_ms:>9.1f} "
+                  f"{min(listing_ms, like_ms) / fts_ms:>7.1f}x")
+
+        try:
+            size = db.execute(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'feedback_fts%'"
+            )).scalar()
+            print(f"\nSearch index size: {size / 1e6:.1f} MB (database {os.path.getsize(path) / 1e6:.0f} MB)")
+        except Exception:
+            pass
+    finally:
+        db.close()
+
+    print(f"\ninsert_feedback, {args.inserts} rows:")
+    for label, ms in insert_overhead(args.inserts).items():
+        print(f"  {label:<22} {ms:.3f} ms/row")
+
+
+if __name__ == "__main__":
+    main()
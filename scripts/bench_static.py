@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def previous_app(directory):
+    """The frontend serving as it was: StaticFiles for /assets, isfile + FileResponse otherwise."""
+    from fastapi import FastAPI, Request
+    from fastapi.staticfiles import StaticFiles
+    from fastapi.responses import FileResponse
+
+    app = FastAPI()
+    app.mount("/assets", StaticFiles(directory=os.path.join(directory, "assets")), name="static-assets")
+
+    @app.get("/{full_path:path}")
+    async def serve_frontend(request: Request, full_path: str):
+        if full_path.startswith("api"):
+            return
+        file_path = os.path.join(directory, full_path)
+        if os.path.isfile(file_path):
+            return FileResponse(file_path)
+        return FileResponse(os.path.join(directory, "index.html"))
+
+    return app
+
+
+async def measure(app, path, requests, headers):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        wire = 0
+        status = None
+        for _ in range(10):
+            await client.get(path, headers=headers)
+        started = time.perf_counter()
+        for _ in range(requests):
+            # Read the raw body: httpx would otherwise decompress it
+            async with client.stream("GET", path, headers=headers) as response:
+                status = response.status_code
+                wire = 0
+                async for chunk in response.aiter_raw():
+                    wire += len(chunk)
+        elapsed = time.perf_counter() - started
+    return requests / elapsed, wire, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frontend serving: previous FileResponse path vs the in-memory manifest")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='csat-bench-')}/bench.db")
+    from app.frontend import FRONTEND_DIR, FrontendManifest
+
+    started = time.perf_counter()
+    manifest = FrontendManifest(FRONTEND_DIR)
+    built_ms = (time.perf_counter() - started) * 1000
+    print(f"Manifest: {manifest.stats()['files']} files, {manifest.stats()['variants']} variants, "
+          f"{manifest.memory_bytes / 1024:.0f} KiB in memory, built in {built_ms:.0f} ms")
+
+    from app.main import app
+    old = previous_app(FRONTEND_DIR)
+    bundle = next(name for name in manifest.assets if name.endswith(".js"))
+    revalidate = {"Accept-Encoding": "gzip, br", "If-None-Match": manifest.get(bundle).variants["br"].etag
+                  if "br" in manifest.get(bundle).variants else manifest.get(bundle).variants["gzip"].etag}
+    cases = [
+        (f"/{bundle}", {"Accept-Encoding": "gzip, br"}, "bundle, br/gzip accepted"),
+        (f"/{bundle}", revalidate, "bundle, revalidated"),
+        ("/", {"Accept-Encoding": "gzip, br"}, "index.html"),
+        ("/dashboard", {"Accept-Encoding": "gzip, br"}, "SPA route fallback"),
+    ]
+    print(f"{'':<28} {'before req/s':>12} {'bytes':>9} {'after req/s':>12} {'bytes':>9} {'status':>7}")
+    for path, headers, label in cases:
+        before_rps, before_bytes, before_status = asyncio.run(measure(old, path, args.requests, headers))
+        after_rps, after_bytes, after_status = asyncio.run(measure(app, path, args.requests, headers))
+        print(f"{label:<28} {before_rps:>12.0f} {before_bytes:>9} {after_rps:>12.0f} {after_bytes:>9} "
+              f"{before_status}->{after_status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+
+import os
+import sys
+import shutil
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import multiprocessing
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+MB = 1024 * 1024
+
+
+def _measure(mode, size_mb, workdir, results):
+    # Runs in a fresh process so ru_maxrss reflects only this upload
+    os.environ["LOCAL_STORAGE_PATH"] = os.path.join(workdir, f"out-{mode}")
+    os.environ["SCREENSHOT_MAX_BYTES"] = str(1024 * MB)
+    os.environ.pop("AWS_BUCKET_NAME", None)
+    from app.storage import S3Client
+
+    client = S3Client()
+    source = os.path.join(workdir, f"source-{size_mb}.bin")
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    with open(source, "rb") as f:
+        if mode == "buffered":
+            # What upload_file used to do: read everything, then write it out
+            os.makedirs(os.environ["LOCAL_STORAGE_PATH"], exist_ok=True)
+            content = f.read()
+            with open(os.path.join(os.environ["LOCAL_STORAGE_PATH"], "bench.bin"), "wb") as out:
+                out.write(content)
+            del content
+        else:
+            client.upload_fileobj(f, "bench.bin", "application/octet-stream")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        "mode": mode,
+        "size_mb": size_mb,
+        "python_peak_mb": peak / MB,
+        "rss_growth_mb": (peak_rss - baseline_rss) / 1024,
+    })
+
+
+def run(sizes):
+    workdir = tempfile.mkdtemp(prefix="csat-upload-bench-")
+    for size_mb in sizes:
+        with open(os.path.join(workdir, f"source-{size_mb}.bin"), "wb") as f:
+            chunk = os.urandom(MB)
+            for _ in range(size_mb):
+                f.write(chunk)
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'mode':<10} {'size MB':>8} {'py peak MB':>11} {'RSS growth MB':>14}")
+    for mode in ("buffered", "streaming"):
+        for size_mb in sizes:
+            results = ctx.Queue()
+            proc = ctx.Process(target=_measure, args=(mode, size_mb, workdir, results))
+            proc.start()
+            row = results.get()
+            proc.join()
+            print(f"{row['mode']:<10} {row['size_mb']:>8} {row['python_peak_mb']:>11.2f} {row['rss_growth_mb']:>14.2f}")
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak memory of screenshot uploads by size (local storage path)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 8, 32, 128], help="upload sizes in MB")
+    args = parser.parse_args()
+    run(args.sizes)
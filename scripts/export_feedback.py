@@ -0,0 +1,56 @@
+
+import os
+import sys
+import argparse
+from datetime import datetime
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import SessionLocal
+from app.exporter import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, filter_conditions, iter_chunks, iter_export
+from app.archive import iter_archived_chunks
+
+
+def export(output, fmt, chunk_size, include_archive=True, **filters):
+    db = SessionLocal()
+    rows = 0
+    try:
+        def chunks():
+            nonlocal rows
+            if include_archive:
+                for chunk in iter_archived_chunks(db, chunk_size=chunk_size, **filters):
+                    rows += len(chunk)
+                    yield chunk
+            for chunk in iter_chunks(db, filter_conditions(**filters), chunk_size):
+                rows += len(chunk)
+                yield chunk
+
+        with (open(output, "wb") if output != "-" else sys.stdout.buffer) as out:
+            for data in iter_export(chunks(), fmt):
+                out.write(data)
+    except Exception as e:
+        print(f"Error exporting feedback: {e}", file=sys.stderr)
+        return False
+    finally:
+        db.close()
+
+    print(f"Exported {rows} rows as {fmt} to {output}", file=sys.stderr)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream feedback rows to CSV, NDJSON or Parquet")
+    parser.add_argument("output", help="output file, or - for stdout")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument("--start", type=datetime.fromisoformat, help="created_at >= START (ISO 8601)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="created_at < END (ISO 8601)")
+    parser.add_argument("--min-rating", type=float)
+    parser.add_argument("--max-rating", type=float)
+    parser.add_argument("--no-archive", action="store_true", help="leave out archived rows")
+    args = parser.parse_args()
+
+    ok = export(args.output, args.format, args.chunk_size, include_archive=not args.no_archive, start=args.start,
+                end=args.end, min_rating=args.min_rating, max_rating=args.max_rating)
+    sys.exit(0 if ok else 1)
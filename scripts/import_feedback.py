@@ -0,0 +1,69 @@
+
+import os
+import sys
+import argparse
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import SessionLocal
+from app.importer import IMPORT_CHUNK_SIZE, IMPORT_FORMATS, detect_format, import_feedback
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, line_number):
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(line_number))
+    os.replace(tmp_path, path)
+
+
+def run(path, fmt, chunk_size, checkpoint_path):
+    resume_after = read_checkpoint(checkpoint_path)
+    if resume_after:
+        print(f"Resuming {path} after line {resume_after} (checkpoint {checkpoint_path})")
+
+    db = SessionLocal()
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            result = import_feedback(
+                db, stream, fmt,
+                resume_after=resume_after,
+                chunk_size=chunk_size,
+                on_checkpoint=lambda line: write_checkpoint(checkpoint_path, line),
+            )
+    except Exception as e:
+        print(f"Import stopped: {e}")
+        print(f"Re-run the same command to resume from {checkpoint_path}")
+        return False
+    finally:
+        db.close()
+
+    for reject in result.rejected:
+        print(f"  line {reject['line']}: {reject['error']}")
+    print(f"Inserted {result.rows_inserted} rows, rejected {result.rejected_count} "
+          f"in {result.elapsed:.2f}s ({result.rows_per_second:,.0f} rows/s)")
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import feedback from CSV or NDJSON")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", help="defaults to <path>.checkpoint")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    checkpoint = args.checkpoint or f"{args.path}.checkpoint"
+    sys.exit(0 if run(args.path, fmt, args.chunk_size, checkpoint) else 1)
@@ -0,0 +1,397 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import seed_dataset
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(ROOT, 'bench-results')
+RESULTS_FORMAT = 1
+
+
+def _submit(rng, people):
+    rating = rng.choices(seed_dataset.RATINGS, weights=seed_dataset.RATING_WEIGHTS)[0]
+    person = rng.randrange(people)
+    return "POST", "/api/submit", {"data": {
+        "name": "Load Test", "email": f"load{person}@example.com", "rating": str(rating),
+        "description": rng.choice(seed_dataset.COMMENTS[rating]),
+    }}
+
+
+def _get(path):
+    return lambda rng, people: ("GET", path, {})
+
+
+def _export_last_day(rng, people):
+    since = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S")
+    return "GET", f"/api/feedback/export?format=ndjson&start={since}", {}
+
+
+def _mixed(rng, people):
+    # Mostly customers submitting, with the dashboard polling alongside
+    roll = rng.random()
+    if roll < 0.7:
+        return _submit(rng, people)
+    if roll < 0.9:
+        return "GET", "/api/report", {}
+    return "GET", "/api/feedback?limit=50", {}
+
+
+# name -> request(rng, people) returning (method, path, httpx kwargs)
+SCENARIOS = {
+    "report": _get("/api/report"),
+    "submit": _submit,
+    "listing": _get("/api/feedback?limit=50"),
+    "listing_email": None,  # filled in per dataset: one of the busiest emails
+    "trend_day": _get("/api/report/trend?granularity=day"),
+    "trend_week_tz": _get("/api/report/trend?granularity=week&tz=America/New_York"),
+    "unique_raters": _get("/api/report/unique-raters"),
+    "export_last_day": _export_last_day,
+    "mixed": _mixed,
+}
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def rss_mb(pid):
+    """Resident memory of pid in MB (Linux), or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemorySampler:
+    """Samples a process's RSS in the background and keeps the peak."""
+
+    def __init__(self, pid, interval=0.02):
+        self.pid = pid
+        self.interval = interval
+        self.start = rss_mb(pid)
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            value = rss_mb(self.pid)
+            if value is not None and (self.peak is None or value > self.peak):
+                self.peak = value
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(database, workdir, report_cache, env_overrides, log):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{database}",
+        "REPORT_CACHE_STAMP": os.path.join(workdir, "report-cache.stamp"),
+        "SCREENSHOT_INDEX_PATH": os.path.join(workdir, "content-index"),
+        "LOCAL_STORAGE_PATH": os.path.join(workdir, "screenshots"),
+        "UPLOAD_SPOOL_PATH": os.path.join(workdir, "spool"),
+        # Every simulated customer comes from 127.0.0.1
+        "ADMISSION_CONTROL": "false",
+    })
+    if not report_cache:
+        # Every report request builds the report
+        env["REPORT_CACHE_TTL"] = "0"
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    env.update(env_overrides)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode}")
+        try:
+            if (await client.get("/metrics")).status_code < 500:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not come up")
+
+
+async def run_scenario(client, request, concurrency, duration, warmup, people, seed):
+    rng = random.Random(seed)
+    latencies = []
+    errors = {}
+    response_bytes = 0
+
+    async def worker(deadline, record):
+        nonlocal response_bytes
+        while time.monotonic() < deadline:
+            method, path, kwargs = request(rng, people)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+                size = len(response.content)
+            except Exception as e:
+                status, size = type(e).__name__, 0
+            if not record:
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            response_bytes += size
+            if not isinstance(status, int) or status >= 400:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    if warmup:
+        deadline = time.monotonic() + warmup
+        await asyncio.gather(*(worker(deadline, False) for _ in range(concurrency)))
+    started = time.perf_counter()
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(worker(deadline, True) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2),
+        "latency_ms": {
+            "mean": round(sum(latencies) / count, 3) if count else None,
+            "p50": round(percentile(latencies, 50), 3) if count else None,
+            "p95": round(percentile(latencies, 95), 3) if count else None,
+            "p99": round(percentile(latencies, 99), 3) if count else None,
+            "max": round(max(latencies), 3) if count else None,
+        },
+        "response_bytes_mean": round(response_bytes / count) if count else 0,
+    }
+
+
+def busiest_email(database):
+    import sqlite3
+    conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+    try:
+        # The first rows are enough to find one of the regulars without a full scan
+        row = conn.execute("SELECT email FROM feedback WHERE id <= 1000 GROUP BY email ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+        return row[0] if row else "nobody@example.com"
+    finally:
+        conn.close()
+
+
+def git_state():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    commit = git("rev-parse", "HEAD")
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": commit, "dirty": bool(status) if status is not None else None,
+            "subject": git("log", "-1", "--format=%s")}
+
+
+def ensure_dataset(args):
+    if args.dataset:
+        return os.path.abspath(args.dataset), seed_dataset.describe(os.path.abspath(args.dataset)) or {}
+    rows = seed_dataset.parse_rows(args.rows)
+    path = seed_dataset.dataset_path(rows, args.seed)
+    # Generated in its own process: the app binds its engine to DATABASE_URL at import
+    subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), "seed_dataset.py"),
+                    "--rows", str(rows), "--seed", str(args.seed), "--years", str(args.years)], check=True)
+    return path, seed_dataset.describe(path)
+
+
+def run(args, server_log):
+    import httpx
+    from app.auth import create_token
+
+    dataset, meta = ensure_dataset(args)
+    workdir = tempfile.mkdtemp(prefix="csat-load-")
+    database = os.path.join(workdir, "feedback.db")
+    # Submits write to the database; keep the cached dataset pristine
+    shutil.copyfile(dataset, database)
+    people = max(50, (meta.get("rows") or 10_000) // 2)
+    scenarios = dict(SCENARIOS)
+    scenarios["listing_email"] = _get(f"/api/feedback?limit=50&email={busiest_email(database)}")
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+
+    token = create_token({"sub": "Raj Livingston"})
+    log = open(server_log, "w")
+    process, base_url = start_server(database, workdir, args.report_cache, env_overrides, log)
+    results = []
+    try:
+        async def drive():
+            limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"},
+                                         timeout=args.timeout, limits=limits) as client:
+                await wait_ready(client, process)
+                for name in args.scenarios:
+                    for concurrency in args.concurrency:
+                        with MemorySampler(process.pid) as memory:
+                            result = await run_scenario(client, scenarios[name], concurrency, args.duration,
+                                                        args.warmup, people, args.seed)
+                        result.update({
+                            "scenario": name,
+                            "concurrency": concurrency,
+                            "server_rss_mb": {
+                                "start": round(memory.start, 1) if memory.start else None,
+                                "peak": round(memory.peak, 1) if memory.peak else None,
+                            },
+                        })
+                        results.append(result)
+                        lat = result["latency_ms"]
+                        print(f"{name:<16} {concurrency:>4} {result['throughput_rps']:>9.1f} "
+                              f"{lat['p50'] or 0:>9.2f} {lat['p95'] or 0:>9.2f} {lat['p99'] or 0:>9.2f} "
+                              f"{result['errors']:>7} {result['server_rss_mb']['peak'] or 0:>9.1f}", flush=True)
+
+        print(f"{'scenario':<16} {'conc':>4} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'errors':>7} {'peak MB':>9}")
+        asyncio.run(drive())
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    import sqlite3
+    return {
+        "format": RESULTS_FORMAT,
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "git": git_state(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "dataset": {"path": dataset, **(meta or {})},
+        "config": {
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "concurrency": args.concurrency,
+            "report_cache": args.report_cache,
+            "env": env_overrides,
+        },
+        "results": results,
+    }
+
+
+def compare(base_path, new_path, threshold):
+    """Print per-scenario changes between two result files; True if nothing regressed past threshold %."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"base: {base['git'].get('commit', '?')[:10]} {base['git'].get('subject') or ''}")
+    print(f"new:  {new['git'].get('commit', '?')[:10]} {new['git'].get('subject') or ''}")
+    if base["dataset"].get("rows") != new["dataset"].get("rows"):
+        print(f"warning: datasets differ ({base['dataset'].get('rows')} vs {new['dataset'].get('rows')} rows)")
+
+    def change(old, current):
+        return (current - old) / old * 100 if old else 0.0
+
+    previous = {(r["scenario"], r["concurrency"]): r for r in base["results"]}
+    ok = True
+    matched = 0
+    print(f"{'scenario':<16} {'conc':>4} {'req/s':>17} {'p95 ms':>19} {'p99 ms':>19} {'peak MB':>15}")
+    for r in new["results"]:
+        old = previous.get((r["scenario"], r["concurrency"]))
+        if old is None:
+            continue
+        matched += 1
+        rps = change(old["throughput_rps"], r["throughput_rps"])
+        p95 = change(old["latency_ms"]["p95"] or 0, r["latency_ms"]["p95"] or 0)
+        p99 = change(old["latency_ms"]["p99"] or 0, r["latency_ms"]["p99"] or 0)
+        peak = change(old["server_rss_mb"]["peak"] or 0, r["server_rss_mb"]["peak"] or 0)
+        regressed = rps < -threshold or p95 > threshold or p99 > threshold or r["errors"] > old["errors"]
+        ok = ok and not regressed
+        print(f"{r['scenario']:<16} {r['concurrency']:>4} {r['throughput_rps']:>9.1f} {rps:+6.1f}% "
+              f"{r['latency_ms']['p95'] or 0:>10.2f} {p95:+6.1f}% {r['latency_ms']['p99'] or 0:>10.2f} {p99:+6.1f}% "
+              f"{r['server_rss_mb']['peak'] or 0:>7.1f} {peak:+6.1f}%{'  REGRESSION' if regressed else ''}")
+    if not matched:
+        print("(no scenario/concurrency pairs in common)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the API under concurrent load against a seeded SQLite dataset")
+    parser.add_argument("--rows", default="10k", help="dataset size: 10k, 1m, 10m or a row count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--dataset", help="use this database file instead of a generated one")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--report-cache", action="store_true",
+                        help="keep the report cache on (off by default so /api/report builds every time)")
+    parser.add_argument("--env", nargs="*", default=[], metavar="NAME=VALUE",
+                        help="extra environment for the server, e.g. DATABASE_PROFILE=web")
+    parser.add_argument("--output", help="results file (default bench-results/<commit>-<rows>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="compare two results files instead of running")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent change in throughput or p95/p99 counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        return 0 if compare(args.compare[0], args.compare[1], args.threshold) else 1
+
+    output = args.output
+    if not output:
+        state = git_state()
+        commit = (state["commit"] or "nogit")[:10] + ("-dirty" if state["dirty"] else "")
+        size = os.path.basename(args.dataset) if args.dataset else seed_dataset.parse_rows(args.rows)
+        output = os.path.join(RESULTS_DIR, f"{commit}-{size}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    # Server output (slow-request log, errors) goes next to the results
+    server_log = os.path.splitext(output)[0] + ".server.log"
+
+    report = run(args, server_log)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output} (server log: {server_log})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app import migrations
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument("--status", action="store_true", help="List migrations and whether they are applied")
+    parser.add_argument("--check", action="store_true", help="Only run the EXPLAIN index checks")
+    parser.add_argument("--to", type=int, default=None, help="Stop after this migration version")
+    args = parser.parse_args()
+
+    if args.status:
+        for version, name, applied in migrations.status():
+            print(f"{version:03d} {name:<30} {'applied' if applied else 'pending'}")
+        return 0
+
+    if not args.check:
+        applied = migrations.upgrade(target=args.to)
+        if applied:
+            print(f"Applied {len(applied)} migration(s).")
+        else:
+            print("Schema is up to date.")
+
+    failures = migrations.run_checks()
+    for failure in failures:
+        print(f"Index check failed: {failure}")
+    if failures:
+        return 1
+    print("Index checks passed.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
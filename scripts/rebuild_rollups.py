@@ -0,0 +1,58 @@
+
+import os
+import sys
+import argparse
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import SessionLocal
+from app import rollups, sketches
+
+
+def rebuild():
+    db = SessionLocal()
+    try:
+        print("Rebuilding feedback_daily_rollup from the feedback table...")
+        written = rollups.rebuild(db)
+        db.commit()
+        print(f"Done. {written} daily rollup rows written.")
+        # Rater sketches too (needed after switching to UNIQUE_RATERS_MODE=hll
+        # or changing HLL_PRECISION)
+        if not sketches.ENABLED:
+            print("Skipping rater sketches: UNIQUE_RATERS_MODE is not hll.")
+            return
+        print("Rebuilding rater sketches from the feedback table...")
+        written = sketches.rebuild(db)
+        db.commit()
+        print(f"Done. {written} daily sketch registers written.")
+    except Exception as e:
+        db.rollback()
+        print(f"Error rebuilding rollups: {e}")
+    finally:
+        db.close()
+
+
+def check():
+    db = SessionLocal()
+    try:
+        mismatches = rollups.check_consistency(db)
+        if not mismatches:
+            print("Rollups are consistent with the feedback table.")
+            return True
+        print(f"Found {len(mismatches)} mismatches (day, field, rollup, raw):")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the daily feedback rollups and rater sketches, or verify the rollups")
+    parser.add_argument("--check", action="store_true", help="only compare rollups against raw rows")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check() else 1)
+    rebuild()
@@ -0,0 +1,38 @@
+import os
+import sys
+import argparse
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import engine
+from app import search
+
+
+def rebuild():
+    try:
+        with engine.begin() as conn:
+            print("Rebuilding the feedback search index from the feedback table...")
+            search.rebuild(conn)
+        print("Done.")
+    except Exception as e:
+        print(f"Error rebuilding search index: {e}")
+
+
+def check():
+    with engine.connect() as conn:
+        if search.check(conn):
+            print("Search index is consistent with the feedback table.")
+            return True
+        print("Search index does not match the feedback table; run without --check to rebuild it.")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the full-text search index over feedback descriptions, or verify it")
+    parser.add_argument("--check", action="store_true", help="only run the index integrity check")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check() else 1)
+    rebuild()
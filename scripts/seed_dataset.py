@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta, timezone
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'bench-data')
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+# Bumped whenever the generator changes, so cached datasets are rebuilt
+GENERATOR_VERSION = 2
+
+# J-shaped, like most satisfaction surveys: mostly 5s, a bump at 1
+RATINGS = [1, 2, 3, 4, 5]
+RATING_WEIGHTS = [9, 5, 10, 24, 52]
+# Share of submissions that leave a comment, by rating
+COMMENT_RATE = {1: 0.85, 2: 0.75, 3: 0.55, 4: 0.3, 5: 0.2}
+COMMENTS = {
+    1: ["Waited over an hour and nobody answered.", "The app kept crashing during checkout.",
+        "Support closed my ticket without fixing anything.", "Charged twice, still no refund."],
+    2: ["Slow response from the team.", "Had to explain the issue three times.", "Delivery was late again."],
+    3: ["It was okay, nothing special.", "Resolved eventually, took a while.", "Average experience overall."],
+    4: ["Good service, minor delays.", "Helpful agent, would be nice to get updates.", "Quick fix, thanks."],
+    5: ["Excellent support, solved in minutes!", "Very friendly and professional.", "Perfect, thank you!",
+        "Best support experience I've had."],
+}
+# Most comments get a second sentence about one part of the product, and
+# some quote an order number, so full-text search sees common words, topic
+# words and near-unique tokens the way it would in real feedback
+TOPICS = ["checkout", "login", "password reset", "invoice", "refund", "delivery", "mobile app", "dashboard",
+          "notifications", "billing", "subscription", "live chat", "search", "export", "onboarding", "shipping",
+          "tracking", "returns", "coupon", "account settings", "profile page", "payment", "cart", "wishlist"]
+COMPLAINTS = ["keeps crashing", "is really slow", "shows an error", "never loads", "is confusing",
+              "logged me out", "lost my data", "charged me twice", "times out", "looks broken on my phone"]
+PRAISE = ["works great now", "is fast and simple", "was easy to use", "is much better than before",
+          "saved me a lot of time", "is very clear"]
+DETAIL_RATE = 0.7
+ORDER_RATE = 0.15
+FIRST_NAMES = ["Aarav", "Priya", "John", "Maria", "Wei", "Fatima", "Lucas", "Emma", "Kenji", "Amara",
+               "Diego", "Olivia", "Noah", "Zara", "Ivan", "Chloe", "Raj", "Sara", "Tom", "Mei"]
+LAST_NAMES = ["Sharma", "Smith", "Garcia", "Chen", "Khan", "Silva", "Brown", "Tanaka", "Okafor", "Muller",
+              "Kumar", "Rossi", "Novak", "Lee", "Haddad", "Jensen", "Costa", "Singh", "Walker", "Ito"]
+DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "example.com", "company.co", "mail.in"]
+# Submissions by UTC hour: office hours, a lunch dip and a quiet night
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 2, 3, 5, 8, 10, 10, 9, 7, 8, 10, 10, 9, 8, 6, 5, 4, 4, 3, 2]
+WEEKEND_FACTOR = 0.6
+# The last day gets this many times the first day's volume
+GROWTH = 3.0
+SCREENSHOT_RATE = 0.03
+
+
+def parse_rows(value: str) -> int:
+    value = value.lower().replace("_", "")
+    if value in SIZES:
+        return SIZES[value]
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * factor)
+    return int(value)
+
+
+def dataset_path(rows: int, seed: int) -> str:
+    return os.path.abspath(os.path.join(DATA_DIR, f"feedback-{rows}-s{seed}.db"))
+
+
+def describe(path: str) -> dict:
+    """Metadata written next to a generated dataset, or None if there is none."""
+    try:
+        with open(f"{path}.json") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def daily_counts(rows: int, start: datetime, days: int) -> list:
+    """Rows per day: linear growth over the range, fewer on weekends; sums to exactly rows."""
+    weights = []
+    for d in range(days):
+        weight = 1 + (GROWTH - 1) * d / max(days - 1, 1)
+        if (start + timedelta(days=d)).weekday() >= 5:
+            weight *= WEEKEND_FACTOR
+        weights.append(weight)
+    total = sum(weights)
+    counts, carried, assigned = [], 0.0, 0
+    for weight in weights:
+        carried += rows * weight / total
+        count = int(carried) - assigned
+        counts.append(count)
+        assigned += count
+    counts[-1] += rows - assigned
+    return counts
+
+
+def generate(rows: int, seed: int, years: float, now: datetime):
+    """Yield feedback rows in created_at order (ids follow time, as in production)."""
+    rng = random.Random(seed)
+    days = max(1, int(years * 365))
+    start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    # Most people rate once or twice; 2% of them are regulars who send 30%
+    # of all feedback (a few dozen submissions each)
+    people = max(50, rows // 2)
+    regulars = max(1, people // 50)
+    for d, count in enumerate(daily_counts(rows, start, days)):
+        if not count:
+            continue
+        day = start + timedelta(days=d)
+        hours = rng.choices(range(24), weights=HOUR_WEIGHTS, k=count)
+        seconds = sorted(h * 3600 + rng.randrange(3600) for h in hours)
+        ratings = rng.choices(RATINGS, weights=RATING_WEIGHTS, k=count)
+        for offset, rating in zip(seconds, ratings):
+            created_at = day + timedelta(seconds=offset, microseconds=rng.randrange(1_000_000))
+            if created_at >= now:
+                created_at = now - timedelta(microseconds=rng.randrange(1, 1_000_000))
+            person = rng.randrange(regulars) if rng.random() < 0.3 else rng.randrange(people)
+            first, last = FIRST_NAMES[person % 20], LAST_NAMES[(person // 20) % 20]
+            email = f"{first.lower()}.{last.lower()}{person}@{DOMAINS[person % len(DOMAINS)]}"
+            description = None
+            if rng.random() < COMMENT_RATE[rating]:
+                description = rng.choice(COMMENTS[rating])
+                if rng.random() < DETAIL_RATE:
+                    verdict = rng.choice(COMPLAINTS if rating <= 3 else PRAISE)
+                    description += f" The {rng.choice(TOPICS)} {verdict}."
+                if rng.random() < ORDER_RATE:
+                    description += f" Order {rng.randrange(10_000_000, 100_000_000)}."
+            screenshot = None
+            if rng.random() < SCREENSHOT_RATE:
+                screenshot = f"https://csat-screenshots.s3.us-east-1.amazonaws.com/{rng.getrandbits(128):032x}.png"
+            ip = f"{10 + person % 200}.{(person >> 8) % 256}.{person % 256}.{rng.randrange(1, 255)}"
+            yield (f"{first} {last}", email, rating, description, ip, screenshot,
+                   created_at.strftime("%Y-%m-%d %H:%M:%S.%f"))
+
+
+def build(path: str, rows: int, seed: int, years: float, log=print):
+    """Create a migrated SQLite database at path holding rows generated feedback rows."""
+    for suffix in ("", "-journal", "-wal", "-shm", ".json"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["DATABASE_PROFILE"] = "default"
+    from app import migrations, rollups, search, sketches
+    from app.database import SessionLocal, engine
+    from app.models import Feedback
+
+    started = time.perf_counter()
+    migrations.upgrade(log=lambda message: None)
+    # Bulk load without indexes, then build them once
+    indexes = [index for index in Feedback.__table__.indexes]
+    with engine.begin() as conn:
+        for index in indexes:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+        search.drop_triggers(conn)
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-262144")
+        insert = ("INSERT INTO feedback (name, email, rating, description, ip_address, screenshot, created_at) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)")
+        batch, done = [], 0
+        for row in generate(rows, seed, years, now):
+            batch.append(row)
+            if len(batch) == 50_000:
+                conn.executemany(insert, batch)
+                done += len(batch)
+                batch = []
+                if done % 1_000_000 == 0:
+                    log(f"  {done:,} rows ({time.perf_counter() - started:.0f}s)")
+        if batch:
+            conn.executemany(insert, batch)
+        conn.commit()
+    finally:
+        conn.close()
+    log(f"  rows inserted ({time.perf_counter() - started:.0f}s)")
+
+    with engine.begin() as conn:
+        for index in indexes:
+            index.create(bind=conn)
+        if search.has_sqlite_index(conn):
+            search.create_triggers(conn)
+            search.rebuild(conn)
+    log(f"  indexes and search index built ({time.perf_counter() - started:.0f}s)")
+    db = SessionLocal()
+    try:
+        rollups.rebuild(db)
+        if sketches.ENABLED:
+            sketches.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    engine.dispose()
+    log(f"  rollups and rater sketches built ({time.perf_counter() - started:.0f}s)")
+
+    meta = {
+        "rows": rows, "seed": seed, "years": years, "generator_version": GENERATOR_VERSION,
+        "generated_at": now.isoformat(), "schema_version": migrations.MIGRATIONS[-1].version,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+    with open(f"{path}.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def is_current(path: str, rows: int, seed: int, years: float) -> bool:
+    """True if path holds a dataset this generator would produce for these settings."""
+    from app.migrations import MIGRATIONS
+    meta = describe(path)
+    return bool(meta) and os.path.exists(path) and meta["rows"] == rows and meta["seed"] == seed \
+        and meta["years"] == years and meta.get("generator_version") == GENERATOR_VERSION \
+        and meta.get("schema_version") == MIGRATIONS[-1].version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a realistic feedback dataset (SQLite) for benchmarks")
+    parser.add_argument("--rows", default="10k", help="10k, 1m, 10m or a row count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--years", type=float, default=3.0, help="timestamps spread over this many years")
+    parser.add_argument("--out", help="database file (default bench-data/feedback-<rows>-s<seed>.db)")
+    parser.add_argument("--force", action="store_true", help="regenerate even if an identical dataset exists")
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    path = os.path.abspath(args.out) if args.out else dataset_path(rows, args.seed)
+    # The app reads its database URL at import
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    if not args.force and is_current(path, rows, args.seed, args.years):
+        print(f"{path} is up to date ({rows:,} rows)")
+        return
+    print(f"Generating {rows:,} rows over {args.years:g} years into {path}")
+    meta = build(path, rows, args.seed, args.years)
+    print(f"Done in {meta['seconds']}s ({os.path.getsize(path) / 1e6:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
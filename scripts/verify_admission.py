@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+import statistics
+import tempfile
+import multiprocessing
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+WORKDIR = tempfile.mkdtemp(prefix="csat-admission-")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'feedback.db')}"
+os.environ["LOCAL_STORAGE_PATH"] = os.path.join(WORKDIR, "screenshots")
+os.environ["REPORT_STREAM_LOG"] = os.path.join(WORKDIR, "events.log")
+os.environ["REPORT_CACHE_STAMP"] = os.path.join(WORKDIR, "stamp")
+os.environ["ADMISSION_STORE"] = os.path.join(WORKDIR, "admission.db")
+# Small limits with a negligible refill, so the counts below are exact
+os.environ["ADMISSION_IP_BURST"] = "10"
+os.environ["ADMISSION_IP_PER_MINUTE"] = "0.01"
+os.environ["ADMISSION_EMAIL_BURST"] = "3"
+os.environ["ADMISSION_EMAIL_PER_MINUTE"] = "0.01"
+os.environ["SCREENSHOT_MAX_BYTES"] = "1024"
+# Stands in for the load balancer's network (see TRUSTED_PROXIES)
+os.environ["TRUSTED_PROXIES"] = "10.0.0.0/8"
+
+
+def take_tokens(path, attempts, burst):
+    """One worker process hammering a single IP bucket and a single content key."""
+    from app.admission import AdmissionControl
+
+    control = AdmissionControl(path, ip_per_minute=0.01, ip_burst=burst, email_per_minute=0)
+    admitted = sum(control.check(control.ticket("203.0.113.9", f"w{os.getpid()}-{i}@example.com")).admitted
+                   for i in range(attempts))
+    same = control.check(control.ticket(f"198.51.100.{os.getpid() % 250}", "same@example.com", "same-content"))
+    return admitted, same.admitted
+
+
+def main():
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, func, select
+    from app import migrations
+    from app.admission import AdmissionControl, admission_control
+    from app.database import SessionLocal, engine
+    from app.main import app
+    from app.models import Feedback
+
+    migrations.upgrade(log=lambda message: None)
+    client = TestClient(app)
+    ok = True
+
+    def check(label, condition, detail=""):
+        nonlocal ok
+        ok = ok and bool(condition)
+        print(f"  {'ok  ' if condition else 'FAIL'} {label}{f' ({detail})' if detail != '' else ''}")
+
+    def rows():
+        db = SessionLocal()
+        try:
+            return db.execute(select(func.count(Feedback.id))).scalar()
+        finally:
+            db.close()
+
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+    def submit(i, email="a@example.com", http=client, headers=None, files=None):
+        del queries[:]
+        return http.post("/api/submit", headers=headers or {}, files=files, data={
+            "name": "Admission", "email": email, "rating": "4", "description": f"Feedback number {i}",
+        })
+
+    print("Duplicates:")
+    first = submit(1)
+    again = submit(1)
+    untouched = not queries
+    check("a double submit is answered like the first and stored once, with no database work",
+          first.status_code == again.status_code == 200 and untouched and rows() == 1)
+    keyed = submit(2, headers={"Idempotency-Key": "order-42"})
+    retried = submit(3, headers={"Idempotency-Key": "order-42"})
+    check("a repeated Idempotency-Key is stored once, whatever the body",
+          keyed.status_code == retried.status_code == 200 and rows() == 2)
+
+    print("Token buckets:")
+    submit(4)
+    limited = submit(5)
+    check("the 4th distinct submission from one email gets 429 with Retry-After",
+          limited.status_code == 429 and int(limited.headers.get("Retry-After", 0)) > 0 and rows() == 3,
+          limited.headers.get("Retry-After"))
+    before = admission_control.memory_rejections
+    limited = submit(6)
+    untouched = not queries
+    check("the next one is turned away from memory, with no database work",
+          limited.status_code == 429 and admission_control.memory_rejections == before + 1 and untouched)
+    responses = [submit(i, email=f"ip{i}@example.com").status_code for i in range(10)]
+    check("the per-IP bucket admits its burst of 10 across emails, then 429",
+          responses == [200] * 7 + [429] * 3 and rows() == 10, responses)
+
+    print("Forwarded addresses:")
+    proxy = TestClient(app, client=("10.0.0.5", 50000))
+    responses = [
+        submit(100 + i, email=f"fwd{i}@example.com", http=proxy,
+               headers={"X-Forwarded-For": f"203.0.113.{i}, 198.51.100.77"}).status_code
+        for i in range(12)
+    ]
+    check("a forged X-Forwarded-For entry does not get a fresh bucket behind a trusted proxy",
+          responses == [200] * 10 + [429] * 2, responses)
+    db = SessionLocal()
+    try:
+        stored = {ip for (ip,) in db.execute(select(Feedback.ip_address).where(Feedback.email.like("fwd%")))}
+    finally:
+        db.close()
+    check("the stored ip_address is the hop the proxy saw", stored == {"198.51.100.77"}, stored)
+    direct = TestClient(app, client=("192.0.2.60", 50000))
+    responses = [
+        submit(200 + i, email=f"direct{i}@example.com", http=direct,
+               headers={"X-Forwarded-For": f"203.0.113.{100 + i}"}).status_code
+        for i in range(12)
+    ]
+    check("X-Forwarded-For from an untrusted peer is ignored", responses == [200] * 10 + [429] * 2, responses)
+
+    print("Failed submissions:")
+    other = TestClient(app, client=("192.0.2.7", 50000))
+    too_large = [("screenshot", ("big.png", b"x" * 2048, "image/png"))]
+    statuses = [submit(20, email="big@example.com", http=other, files=too_large).status_code for _ in range(2)]
+    check("a rejected upload does not make its retry a duplicate", statuses == [413, 413], statuses)
+
+    print("Workers sharing the store:")
+    path = os.path.join(WORKDIR, "shared.db")
+    AdmissionControl(path).check_store(AdmissionControl(path).ticket("192.0.2.1", "warm@example.com"))
+    with multiprocessing.get_context("spawn").Pool(8) as pool:
+        results = pool.starmap(take_tokens, [(path, 40, 50)] * 8)
+    admitted = sum(count for count, _ in results)
+    check("8 processes x 40 attempts on one IP bucket admit exactly its burst of 50", admitted == 50, admitted)
+    check("the same content from 8 processes is admitted once", sum(same for _, same in results) == 1)
+
+    print("Released claims across workers:")
+    worker_a, worker_b = AdmissionControl(path), AdmissionControl(path)
+    first = worker_a.check(worker_a.ticket("192.0.2.8", "released@example.com", "released-content"))
+    seen = worker_b.check(worker_b.ticket("192.0.2.9", "released@example.com", "released-content"))
+    worker_a.release(first)
+    retry_b = worker_b.check(worker_b.ticket("192.0.2.9", "released@example.com", "released-content"))
+    check("a claim released by one worker is not still a duplicate on another",
+          first.admitted and seen.duplicate and retry_b.admitted)
+
+    print("Store unavailable:")
+    broken = AdmissionControl("/proc/csat-no-such-dir/admission.db")
+    check("submissions are let through and the error is counted",
+          broken.check(broken.ticket("192.0.2.2", "x@example.com", "c")).admitted and broken.store_errors == 1)
+
+    stats = client.get("/metrics").text
+    check("rejections are exported to Prometheus", 'csat_admission_rejections_total{path="memory",reason="email_rate"}'
+          in stats)
+    print(f"\nadmission stats: {admission_control.stats()}")
+
+    print("\nCost per check, median of 2000:")
+    control = AdmissionControl(os.path.join(WORKDIR, "timing.db"), ip_per_minute=1e9, ip_burst=10 ** 9,
+                               email_per_minute=1e9, email_burst=10 ** 9)
+    # Another worker on the same store: it learns of each claim from the store
+    other_worker = AdmissionControl(control.path)
+    timings = {"store, admitted": [], "store, duplicate": [], "memory, duplicate": []}
+    for i in range(2000):
+        started = time.perf_counter()
+        control.check(control.ticket("192.0.2.3", f"t{i}@example.com", f"content-{i}"))
+        timings["store, admitted"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        other_worker.check(other_worker.ticket("192.0.2.3", f"t{i}@example.com", f"content-{i}"))
+        timings["store, duplicate"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        control.check(control.ticket("192.0.2.3", f"t{i}@example.com", f"content-{i}"))
+        timings["memory, duplicate"].append(time.perf_counter() - started)
+    for label, samples in timings.items():
+        print(f"  {label:<18} {statistics.median(samples) * 1e6:7.1f} us")
+    submit_ms = []
+    for i in range(200):
+        started = time.perf_counter()
+        submit(1000 + i, email=f"timing{i}@example.com", http=TestClient(app, client=(f"10.1.{i}.1", 1)))
+        submit_ms.append((time.perf_counter() - started) * 1000)
+    print(f"  whole /api/submit  {statistics.median(submit_ms) * 1000:7.1f} us")
+
+    print("\nPASS" if ok else "\nFAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import os
+import re
+import sys
+import time
+import json
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import seed_dataset
+
+WORKDIR = tempfile.mkdtemp(prefix="csat-archive-")
+DATABASE = os.path.join(WORKDIR, "feedback.db")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE}"
+os.environ["LOCAL_STORAGE_PATH"] = os.path.join(WORKDIR, "storage")
+os.environ["REPORT_CACHE_STAMP"] = os.path.join(WORKDIR, "stamp")
+os.environ["REPORT_CACHE_TTL"] = "0"
+# Small row groups, so the min/max pruning has something to skip
+os.environ.setdefault("ARCHIVE_ROW_GROUP_ROWS", "2000")
+# Rater sketches are only built in hll mode
+os.environ["UNIQUE_RATERS_MODE"] = "hll"
+
+QUERIES = ["refund", "checkout crashing", "wishlist", "invoice error"]
+
+
+def snapshot(db, now):
+    """Everything archiving must leave unchanged."""
+    from app.report_engine import build_report
+    from app.trend import build_trend
+    from app import sketches
+
+    years_ago = now - timedelta(days=3 * 366)
+    return {
+        "report (raw)": build_report(db, now=now, use_rollups=False).payload,
+        "report (rollups)": build_report(db, now=now, use_rollups=True).payload,
+        "unique raters, exact window into the archive": sketches.unique_raters(
+            db, (now - timedelta(days=800)).date(), (now - timedelta(days=200)).date(), exact=True),
+        "unique raters, hll": sketches.unique_raters(db),
+        "trend by month, UTC (raw)": build_trend(db, "month", years_ago, now, "UTC", use_rollups=False).payload,
+        "trend by week, Asia/Kolkata (raw)": build_trend(db, "week", years_ago, now, "Asia/Kolkata",
+                                                         use_rollups=False).payload,
+        "trend by month, UTC (rollups)": build_trend(db, "month", years_ago, now, "UTC", use_rollups=True).payload,
+    }
+
+
+def export_rows(client, **params):
+    response = client.get("/api/feedback/export", params={"format": "ndjson", **params})
+    assert response.status_code == 200, response.text
+    return sorted((json.loads(line) for line in response.text.splitlines() if line), key=lambda row: row["id"])
+
+
+def search_all(client, q, **params):
+    items, cursor, pages = [], None, 0
+    while True:
+        response = client.get("/api/feedback/search", params={"q": q, "limit": 50, "cursor": cursor, **params})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        items.extend(page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            return items, pages
+
+
+def prefix_match(description, terms):
+    words = [word.lower() for word in re.findall(r"\w+", description or "")]
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that archiving old feedback changes no figures")
+    parser.add_argument("--rows", default="10k", help="dataset size (see seed_dataset.py)")
+    parser.add_argument("--days", type=int, default=365, help="archive rows older than this many days")
+    parser.add_argument("--segment-rows", type=int, default=3000)
+    args = parser.parse_args()
+
+    seed_dataset.build(DATABASE, seed_dataset.parse_rows(args.rows), seed=1, years=3.0, log=lambda *a: None)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+    from app.database import SessionLocal, engine
+    from app.main import app
+    from app.models import Feedback, utc_now
+    from app.routes.reports import get_current_admin
+    from app.archive import archive_before
+    from app.report_engine import build_report
+    from app.search import parse_terms
+    from app import rollups, sketches
+
+    app.dependency_overrides[get_current_admin] = lambda: "verify"
+    client = TestClient(app)
+    ok = True
+
+    def check(label, condition, detail=""):
+        nonlocal ok
+        ok = ok and bool(condition)
+        print(f"  {'ok  ' if condition else 'FAIL'} {label}{f' ({detail})' if detail != '' else ''}")
+
+    now = utc_now()
+    before = datetime.combine((utc_now() - timedelta(days=args.days)).date(), datetime.min.time())
+    db = SessionLocal()
+    try:
+        total = db.execute(select(func.count(Feedback.id))).scalar()
+        old = db.execute(select(func.count(Feedback.id)).where(Feedback.created_at < before)).scalar()
+        started = time.perf_counter()
+        build_report(db, now=now, use_rollups=False)
+        report_ms_before = (time.perf_counter() - started) * 1000
+        expected = snapshot(db, now)
+    finally:
+        db.close()
+    exported_before = export_rows(client)
+    searched_before = {q: search_all(client, q)[0] for q in QUERIES}
+    size_before = os.path.getsize(DATABASE)
+
+    print(f"Archiving {old} of {total} rows (before {before:%Y-%m-%d}):")
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        written = archive_before(db, before, args.segment_rows, log=lambda message: None)
+        elapsed = time.perf_counter() - started
+        live = db.execute(select(func.count(Feedback.id))).scalar()
+        archived_bytes = sum(segment.bytes for segment in written)
+        check("every old row moved, nothing else", sum(s.count for s in written) == old and live == total - old,
+              f"{len(written)} segments, {live} rows left, {elapsed:.1f}s")
+        check("segment files are in LOCAL_STORAGE_PATH",
+              all(s.location.startswith(os.environ["LOCAL_STORAGE_PATH"]) and os.path.exists(s.location)
+                  for s in written))
+        check("a second run finds nothing to do", archive_before(db, before, args.segment_rows, log=lambda m: None) == [])
+        after = snapshot(db, now)
+        started = time.perf_counter()
+        build_report(db, now=now, use_rollups=False)
+        report_ms_after = (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+
+    print("Report, unique raters and trend:")
+    for label, value in expected.items():
+        check(f"{label} unchanged", after[label] == value)
+
+    print("Export:")
+    exported = export_rows(client)
+    check("export returns the archived rows too, identical", exported == exported_before, f"{len(exported)} rows")
+    check("include_archive=false leaves them out", len(export_rows(client, include_archive="false")) == total - old)
+    start, end = before - timedelta(days=60), before + timedelta(days=30)
+    filtered = export_rows(client, start=start.isoformat(), end=end.isoformat(), max_rating=2)
+    check("filters apply across the archive and live rows", filtered == [
+        row for row in exported_before
+        if start <= datetime.fromisoformat(row["created_at"]) < end and row["rating"] <= 2
+    ], f"{len(filtered)} rows")
+
+    print("Search:")
+    archived_ids = {row["id"] for row in exported_before if datetime.fromisoformat(row["created_at"]) < before}
+    by_id = {row["id"]: row for row in exported_before}
+    for q in QUERIES:
+        items, pages = search_all(client, q)
+        ids = [item["id"] for item in items]
+        live_before = [item["id"] for item in searched_before[q] if item["id"] not in archived_ids]
+        live_after = [item["id"] for item in items if not item["archived"]]
+        archived_after = [item["id"] for item in items if item["archived"]]
+        terms = parse_terms(q)
+        expected_archived = sorted((i for i in archived_ids if prefix_match(by_id[i]["description"], terms)),
+                                   reverse=True)
+        # bm25 weighs terms by corpus statistics, which archiving changes: the
+        # live matches are the same, their order may not be
+        scores = [item["score"] for item in items if not item["archived"]]
+        check(f"'{q}': live matches as before (best first), then archived ones newest first, no repeats",
+              sorted(live_after) == sorted(live_before) and scores == sorted(scores, reverse=True)
+              and archived_after == expected_archived and len(set(ids)) == len(ids),
+              f"{len(live_after)} live + {len(archived_after)} archived over {pages} pages")
+    items, _ = search_all(client, "refund", start=start.isoformat(), end=end.isoformat(), min_rating=3)
+    check("search filters reach into the archive",
+          all(start <= datetime.fromisoformat(item["created_at"]) < end and item["rating"] >= 3 for item in items)
+          and any(item["archived"] for item in items), f"{len(items)} matches")
+    items, _ = search_all(client, "refund", include_archive="false")
+    check("include_archive=false searches live rows only", not any(item["archived"] for item in items))
+
+    print("Rollups and sketches:")
+    db = SessionLocal()
+    try:
+        check("rollups still match feedback plus the archive", rollups.check_consistency(db) == [])
+        rollups.rebuild(db)
+        sketches.rebuild(db)
+        db.commit()
+        check("full rollup and sketch rebuilds keep the archived days",
+              snapshot(db, now) == expected and rollups.check_consistency(db) == [])
+    finally:
+        db.close()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+    size_after = os.path.getsize(DATABASE)
+    print(f"\nDatabase {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB after VACUUM; "
+          f"archive {archived_bytes / 1e6:.1f} MB for {old} rows")
+    print(f"Report build (raw): {report_ms_before:.1f} ms -> {report_ms_after:.1f} ms")
+    print("\nPASS" if ok else "\nFAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
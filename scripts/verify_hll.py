@@ -0,0 +1,152 @@
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def check_in_memory(cardinalities, tolerance):
+    from app.hll import HyperLogLog
+
+    ok = True
+    print("In-memory sketch vs exact:")
+    for n in cardinalities:
+        sketch = HyperLogLog()
+        for i in range(n):
+            sketch.add(f"user{i}@example.com")
+        estimate = sketch.count()
+        error = (estimate - n) / n
+        passed = abs(error) <= tolerance
+        ok = ok and passed
+        print(f"  n={n:>9}  estimate={estimate:>9}  error={error:+.3%}  {'ok' if passed else 'FAIL'}")
+    return ok
+
+
+def seed(rows, days, emails, seed_value):
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import Feedback, utc_now
+
+    rng = random.Random(seed_value)
+    db = SessionLocal()
+    try:
+        now = utc_now()
+        batch = []
+        for i in range(rows):
+            # Skewed reuse: a few people rate often, most rate once or twice
+            email = f"rater{int(emails * rng.random() ** 2)}@example.com"
+            batch.append({
+                "name": "HLL", "email": email, "rating": rng.randint(1, 5),
+                "description": None, "ip_address": "127.0.0.1", "screenshot": None,
+                "created_at": now - timedelta(seconds=rng.randrange(days * 86400)),
+            })
+            if len(batch) == 10000:
+                db.execute(insert(Feedback), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Feedback), batch)
+        db.commit()
+        return now.date()
+    finally:
+        db.close()
+
+
+def check_database(args, tolerance):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='csat-hll-')}/hll.db"
+    os.environ["UNIQUE_RATERS_MODE"] = "hll"
+    from sqlalchemy import select
+    from app import migrations, sketches
+    from app.database import SessionLocal
+    from app.models import RaterDailySketch, RaterSketch
+
+    migrations.upgrade(log=lambda message: None)
+    today = seed(args.rows, args.days, args.emails, args.seed)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        written = sketches.rebuild(db)
+        db.commit()
+        print(f"\nRebuilt sketches from {args.rows} rows: {written} daily registers "
+              f"in {time.perf_counter() - started:.2f}s")
+
+        ok = True
+        tomorrow = today + timedelta(days=1)
+        windows = [("all time", None, None)] + [
+            (f"last {n} days", tomorrow - timedelta(days=n), tomorrow) for n in (1, 7, 30, 90)
+        ]
+        print("Stored sketch vs COUNT(DISTINCT email):")
+        for label, start, end in windows:
+            t0 = time.perf_counter()
+            exact = sketches.unique_raters(db, start, end, exact=True)
+            t1 = time.perf_counter()
+            estimate = sketches.unique_raters(db, start, end)
+            t2 = time.perf_counter()
+            error = (estimate - exact) / exact if exact else 0.0
+            passed = abs(error) <= tolerance
+            ok = ok and passed
+            print(f"  {label:<13} exact={exact:>8} ({(t1 - t0) * 1000:7.1f} ms)  "
+                  f"hll={estimate:>8} ({(t2 - t1) * 1000:7.1f} ms)  error={error:+.3%}  {'ok' if passed else 'FAIL'}")
+
+        # Incremental updates (as done on submit) must land on the same registers as a rebuild
+        rebuilt_daily = set(db.execute(select(RaterDailySketch.day, RaterDailySketch.register, RaterDailySketch.max_rank)).all())
+        rebuilt_total = set(db.execute(select(RaterSketch.register, RaterSketch.max_rank)).all())
+        db.query(RaterDailySketch).delete()
+        db.query(RaterSketch).delete()
+        by_day = {}
+        for created_at, email in db.execute(select(sketches.Feedback.created_at, sketches.Feedback.email)):
+            by_day.setdefault(created_at.date(), []).append(email)
+        sketches.apply_raters(db, by_day)
+        db.commit()
+        incremental_daily = set(db.execute(select(RaterDailySketch.day, RaterDailySketch.register, RaterDailySketch.max_rank)).all())
+        incremental_total = set(db.execute(select(RaterSketch.register, RaterSketch.max_rank)).all())
+        same = rebuilt_daily == incremental_daily and rebuilt_total == incremental_total
+        print(f"Incremental registers match rebuild: {'ok' if same else 'FAIL'}")
+
+        # Submits only write registers in hll mode
+        from app.routes.public import insert_feedback
+        day = today + timedelta(days=30)
+        registers = []
+        for enabled in (False, True):
+            sketches.ENABLED = enabled
+            insert_feedback(db, {
+                "name": "HLL", "email": f"late-{enabled}@example.com", "rating": 5, "description": None,
+                "ip_address": "127.0.0.1", "screenshot": None,
+                "created_at": datetime.combine(day, datetime.min.time()),
+            })
+            registers.append(db.query(RaterDailySketch).filter(RaterDailySketch.day == day).count())
+        gated = registers == [0, 1]
+        print(f"Submits skip the sketches outside hll mode: {'ok' if gated else 'FAIL'}")
+        return ok and same and gated
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check HyperLogLog unique-rater estimates against exact counts")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--emails", type=int, default=100000, help="size of the synthetic email pool")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    from app.hll import HLL_PRECISION, standard_error
+    # Three standard errors: a correct sketch stays inside this >99% of the time
+    tolerance = 3 * standard_error()
+    print(f"Precision {HLL_PRECISION} ({1 << HLL_PRECISION} registers), "
+          f"standard error {standard_error():.2%}, tolerance {tolerance:.2%}\n")
+
+    ok = check_in_memory([100, 1000, 10000, 50000, 100000, 1000000], tolerance)
+    ok = check_database(args, tolerance) and ok
+    print("\nPASS" if ok else "\nFAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
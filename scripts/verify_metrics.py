@@ -0,0 +1,175 @@
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta, timezone
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+WORKDIR = tempfile.mkdtemp(prefix="csat-metrics-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'metrics.db')}"
+os.environ["LOCAL_STORAGE_PATH"] = os.path.join(WORKDIR, "storage")
+
+
+def seed(rows, days, seed_value):
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import Feedback, utc_now
+    from app import rollups, sketches
+
+    rng = random.Random(seed_value)
+    # Skewed towards 4-5 like real CSAT, every half step present
+    ratings = [r / 2 for r in range(1, 11)]
+    weights = [3, 1, 4, 1, 6, 2, 12, 6, 25, 40]
+    db = SessionLocal()
+    try:
+        now = utc_now()
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "name": "Metrics", "email": f"metrics{i % 5000}@example.com",
+                "rating": rng.choices(ratings, weights)[0], "description": None,
+                "ip_address": "127.0.0.1", "screenshot": None,
+                "created_at": now - timedelta(seconds=rng.randrange(days * 86400)),
+            })
+            if len(batch) == 10000:
+                db.execute(insert(Feedback), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Feedback), batch)
+        rollups.rebuild(db)
+        sketches.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def reference(ratings):
+    """Sort every rating, the slow and obvious way."""
+    from app.rating_metrics import CSAT_MIN_RATING, PROMOTER_MIN_RATING, DETRACTOR_MAX_RATING
+
+    if not ratings:
+        return None
+    ratings = sorted(ratings)
+    n = len(ratings)
+    promoters = 100 * sum(1 for r in ratings if r >= PROMOTER_MIN_RATING) / n
+    detractors = 100 * sum(1 for r in ratings if r <= DETRACTOR_MAX_RATING) / n
+    return {
+        "count": n,
+        "median": statistics.median(ratings),
+        "p10": ratings[max(1, math.ceil(10 * n / 100)) - 1],
+        "p90": ratings[max(1, math.ceil(90 * n / 100)) - 1],
+        "csat_pct": round(100 * sum(1 for r in ratings if r >= CSAT_MIN_RATING) / n, 2),
+        "promoter_pct": round(promoters, 2),
+        "detractor_pct": round(detractors, 2),
+        "nps": round(promoters - detractors, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check report and trend metrics against a sort of every rating")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from app import migrations, rating_metrics, rollups
+    from app.archive import archive_before
+    from app.database import SessionLocal
+    from app.models import Feedback, utc_now
+    from app.report_engine import ROLLING_WINDOWS, build_report
+    from app.trend import build_trend
+
+    migrations.upgrade(log=lambda message: None)
+    seed(args.rows, args.days, args.seed)
+    ok = True
+
+    def check(label, condition, detail=""):
+        nonlocal ok
+        ok = ok and bool(condition)
+        print(f"  {'ok  ' if condition else 'FAIL'} {label}{f' ({detail})' if detail != '' else ''}")
+
+    # Small samples, where even counts and the percentile ranks fall between ratings
+    rng = random.Random(args.seed)
+    failures = 0
+    for _ in range(5000):
+        ratings = [rng.randint(0, 10) / 2 for _ in range(rng.randint(1, 25))]
+        hist = [0] * len(rollups.HIST_FIELDS)
+        for rating in ratings:
+            hist[rollups.histogram_index(rating)] += 1
+        failures += rating_metrics.summarize(hist) != reference(ratings)
+    print("Histogram metrics vs sorting:")
+    check("5000 random samples of 1-25 ratings", not failures, f"{failures} differ" if failures else "")
+    check("empty histogram", rating_metrics.summarize([0] * len(rollups.HIST_FIELDS))["median"] is None)
+
+    now = utc_now()
+    db = SessionLocal()
+    try:
+        rows = db.query(Feedback.created_at, Feedback.rating).all()
+        expected = {"all_time": reference([rating for _, rating in rows])}
+        for days in ROLLING_WINDOWS:
+            cutoff = now - timedelta(days=days)
+            expected[f"last_{days}_days"] = reference([rating for created_at, rating in rows if created_at >= cutoff])
+        histogram = {}
+        for _, rating in rows:
+            histogram[f"{rating:g}"] = histogram.get(f"{rating:g}", 0) + 1
+
+        print(f"Report metrics, {len(rows)} ratings:")
+        for use_rollups in (False, True):
+            payload = build_report(db, now=now, use_rollups=use_rollups).payload
+            source = "rollups" if use_rollups else "raw"
+            check(f"{source}: histogram", {k: n for k, n in payload["histogram"].items() if n} == histogram)
+            for window, metrics in expected.items():
+                check(f"{source}: {window}", payload["metrics"][window] == metrics,
+                      f"median {metrics['median']}, p10 {metrics['p10']}, p90 {metrics['p90']}, nps {metrics['nps']}")
+
+        print("Trend bucket metrics:")
+        trend_end = datetime.now(timezone.utc)
+        trend_start = trend_end - timedelta(days=400)
+        for use_rollups in (False, True):
+            payload = build_trend(db, "month", trend_start, trend_end, "UTC", use_rollups=use_rollups).payload
+            start = datetime.fromisoformat(payload["start"]).astimezone(timezone.utc).replace(tzinfo=None)
+            end = datetime.fromisoformat(payload["end"]).astimezone(timezone.utc).replace(tzinfo=None)
+            by_month = {}
+            for created_at, rating in rows:
+                if start <= created_at < end:
+                    by_month.setdefault(created_at.date().replace(day=1), []).append(rating)
+            mismatched = [
+                bucket["start"] for bucket in payload["buckets"]
+                if (bucket["metrics"] if bucket["count"] else None)
+                != reference(by_month.get(datetime.fromisoformat(bucket["start"]).date(), []))
+            ]
+            check(f"{payload['source']}: {len(payload['buckets'])} monthly buckets", not mismatched,
+                  f"mismatched: {mismatched[:3]}" if mismatched else "")
+
+        print("With rows older than a year archived:")
+        before = datetime.combine((utc_now() - timedelta(days=365)).date(), datetime.min.time())
+        written = archive_before(db, before, log=lambda message: None)
+        for use_rollups in (False, True):
+            payload = build_report(db, now=now, use_rollups=use_rollups).payload
+            check(f"{'rollups' if use_rollups else 'raw'}: all windows unchanged",
+                  payload["metrics"] == expected, f"{sum(s.count for s in written)} rows archived")
+
+        print(f"\nReport build, median of {args.repeat}:")
+        for use_rollups in (False, True):
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                build = build_report(db, now=now, use_rollups=use_rollups)
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f"  {'rollups' if use_rollups else 'raw':<8} {statistics.median(samples):8.1f} ms  "
+                  f"{build.query_count} queries")
+    finally:
+        db.close()
+    print("\nPASS" if ok else "\nFAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
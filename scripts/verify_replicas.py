@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Two SQLite files stand in for the primary and its replica; "replication"
+# is an online backup of the primary into the replica file
+WORKDIR = tempfile.mkdtemp(prefix="csat-replicas-")
+PRIMARY = os.path.join(WORKDIR, "primary.db")
+REPLICA = os.path.join(WORKDIR, "replica.db")
+MAX_LAG = 1.0
+
+os.environ["DATABASE_URL"] = f"sqlite:///{PRIMARY}"
+# Opened read-only, so a missing file is an unreachable replica rather than a new empty database
+os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///file:{REPLICA}?mode=ro&uri=true"
+os.environ["REPLICA_MAX_LAG_SECONDS"] = str(MAX_LAG)
+os.environ["REPLICA_CHECK_SECONDS"] = "0"
+os.environ["REPORT_CACHE_TTL"] = "0"
+os.environ["REPORT_CACHE_STAMP"] = os.path.join(WORKDIR, "stamp")
+
+
+def replicate():
+    source, target = sqlite3.connect(PRIMARY), sqlite3.connect(REPLICA)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+def insert_rows(count):
+    from app.database import SessionLocal
+    from app.models import utc_now
+    from app.routes.public import insert_feedback
+
+    for i in range(count):
+        db = SessionLocal()
+        try:
+            insert_feedback(db, {
+                "name": "Replica", "email": f"replica{i}@example.com", "rating": 4, "description": None,
+                "ip_address": "127.0.0.1", "screenshot": None, "created_at": utc_now(),
+            })
+        finally:
+            db.close()
+
+
+def main():
+    from fastapi.testclient import TestClient
+    from app import migrations
+    from app.main import app
+    from app.replicas import read_router
+    from app.report_cache import report_cache
+    from app.routes.reports import get_current_admin
+
+    migrations.upgrade(log=lambda message: None)
+    replicate()
+    app.dependency_overrides[get_current_admin] = lambda: "verify"
+    replica = read_router.replicas[0]
+    ok = True
+
+    def check(label, condition, detail=""):
+        nonlocal ok
+        ok = ok and condition
+        print(f"  {'ok  ' if condition else 'FAIL'} {label}{f' ({detail})' if detail else ''}")
+
+    def counters():
+        stats = read_router.stats()
+        return stats["primary_reads"], stats["replicas"][0]["reads"]
+
+    with TestClient(app) as client:
+        def seen():
+            listing = client.get("/api/feedback").json()["items"]
+            report = client.get("/api/report").json()
+            return len(listing), len(report["recent_feedback"])
+
+        insert_rows(3)
+        print("Replica within tolerance, not yet replicated:")
+        before = counters()
+        check("listing and report read the replica (3 rows not there yet)", seen() == (0, 0), seen())
+        after = counters()
+        check("reads counted against the replica", after[1] - before[1] >= 4 and after[0] == before[0])
+        report_cache.ttl = 30
+        cached = client.get("/api/report").json()
+        check("a cached report is built on the primary", len(cached["recent_feedback"]) == 3)
+        report_cache.ttl = 0
+
+        print(f"Replica falls more than {MAX_LAG}s behind:")
+        time.sleep(MAX_LAG + 0.5)
+        read_router.refresh(force=True)
+        check("lag measured past the tolerance", replica.lag is not None and replica.lag > MAX_LAG,
+              f"lag {replica.lag:.2f}s")
+        check("reads fall back to the primary", seen() == (3, 3), seen())
+        db = read_router.session(max_lag=60)
+        check("a caller tolerating 60s still gets the replica", db.get_bind() is replica.engine)
+        db.close()
+
+        print("Replica catches up:")
+        replicate()
+        read_router.refresh(force=True)
+        check("lag back under the tolerance", replica.lag is not None and replica.lag <= MAX_LAG,
+              f"lag {replica.lag:.2f}s")
+        before = counters()
+        check("reads back on the replica", seen() == (3, 3) and counters()[1] > before[1])
+        export = client.get("/api/feedback/export?format=ndjson")
+        check("export streams from the replica", len(export.text.splitlines()) == 3)
+
+        print("Replica unreachable:")
+        os.remove(REPLICA)
+        replica.engine.dispose()
+        client.portal.call(replica.async_engine.dispose)
+        read_router.refresh(force=True)
+        check("health check marks it down", replica.lag is None and replica.error is not None, replica.error)
+        check("reads fall back to the primary", seen() == (3, 3), seen())
+
+        replicate()
+        read_router.refresh(force=True)
+        os.remove(REPLICA)
+        replica.engine.dispose()
+        client.portal.call(replica.async_engine.dispose)
+        read_router.check_seconds = 3600
+        before = read_router.stats()["fallbacks"]
+        check("lost between checks: falls back when connecting", seen() == (3, 3), seen())
+        check("fallbacks counted", read_router.stats()["fallbacks"] > before)
+
+        stats = client.get("/api/stats").json()["replicas"]
+        print(f"/api/stats replicas: primary_reads={stats['primary_reads']} fallbacks={stats['fallbacks']} "
+              f"replica reads={stats['replicas'][0]['reads']} failures={stats['replicas'][0]['failures']}")
+
+    print("\nPASS" if ok else "\nFAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
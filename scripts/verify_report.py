@@ -1,7 +1,7 @@
 
 import sys
 import os
-from datetime import datetime, timedelta
+from datetime import timedelta
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -9,8 +9,8 @@ from sqlalchemy.orm import sessionmaker
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.database import Base, SessionLocal
-from app.models import Feedback
-from app.routes.reports import get_report
+from app.models import Feedback, utc_now
+from app.report_engine import build_report
 
 def verify():
     db = SessionLocal()
@@ -19,7 +19,7 @@ def verify():
         # db.query(Feedback).delete()
         
         # Add mock data
-        now = datetime.now()
+        now = utc_now()
         
         feedback_data = [
             {"rating": 5, "created_at": now, "name": "A", "email": "a@example.com", "description": "Good"},
@@ -47,10 +47,11 @@ def verify():
         total_avg = db.query(Feedback).count()
         print(f"Total feedback count: {total_avg}")
         
-        report = get_report(db, username="admin")
+        build = build_report(db)
         print("\n--- Report Output ---")
-        for k, v in report.items():
+        for k, v in build.payload.items():
             print(f"{k}: {v}")
+        print(f"\nBuilt with {build.query_count} queries in {build.elapsed_ms:.2f} ms")
             
     except Exception as e:
         print(f"Error during verification: {e}")
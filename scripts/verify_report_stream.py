@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import tempfile
+import subprocess
+from datetime import datetime
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WORKDIR = tempfile.mkdtemp(prefix="csat-stream-")
+DATABASE = os.path.join(WORKDIR, "feedback.db")
+MAX_SECONDS = 4
+
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE}"
+os.environ["REPORT_STREAM_LOG"] = os.path.join(WORKDIR, "events.log")
+os.environ["REPORT_CACHE_STAMP"] = os.path.join(WORKDIR, "stamp")
+
+# Two servers on one database and event log stand in for two gunicorn
+# workers; "buffered" commits through the write buffer, so its rows have no id
+SERVER_ENV = {
+    "REPORT_STREAM_POLL_SECONDS": "0.1",
+    "REPORT_STREAM_HEARTBEAT_SECONDS": "1",
+    "REPORT_STREAM_MAX_SECONDS": str(MAX_SECONDS),
+    "LOCAL_STORAGE_PATH": os.path.join(WORKDIR, "screenshots"),
+    "SCREENSHOT_INDEX_PATH": os.path.join(WORKDIR, "content-index"),
+    "UPLOAD_SPOOL_PATH": os.path.join(WORKDIR, "spool"),
+    "ADMISSION_STORE": os.path.join(WORKDIR, "admission.db"),
+}
+
+
+def start_server(log, **env_overrides):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, **SERVER_ENV, **env_overrides)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/api/stats")
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not come up")
+
+
+class Stream:
+    """Collects the events of one /api/report/stream connection in the background."""
+
+    def __init__(self, client, last_event_id=None):
+        self.events = []
+        self.pings = 0
+        self.closed_after = None
+        headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+        self.task = asyncio.create_task(self._read(client, headers))
+
+    async def _read(self, client, headers):
+        started = time.monotonic()
+        async with client.stream("GET", "/api/report/stream", headers=headers, timeout=None) as response:
+            self.status = response.status_code
+            fields = {}
+            async for line in response.aiter_lines():
+                if line.startswith(":"):
+                    self.pings += 1
+                elif line:
+                    name, _, value = line.partition(": ")
+                    fields[name] = value
+                elif "event" in fields:
+                    self.events.append((fields["event"], fields.get("id"), json.loads(fields["data"])))
+                    fields = {}
+        self.closed_after = time.monotonic() - started
+
+    def of(self, kind):
+        return [event for event in self.events if event[0] == kind]
+
+    async def until(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return condition()
+
+    async def close(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+
+async def submit(client, i, rating=4):
+    response = await client.post("/api/submit", data={
+        "name": f"Stream {i}", "email": f"stream{i}@example.com", "rating": str(rating), "description": "live",
+    })
+    response.raise_for_status()
+
+
+async def check_servers(check):
+    import httpx
+    from app.auth import create_token
+
+    token = create_token({"sub": "Raj Livingston"})
+    log = open(os.path.join(WORKDIR, "servers.log"), "w")
+    direct, direct_url = start_server(log)
+    buffered, buffered_url = start_server(log, FEEDBACK_WRITE_BUFFER="true")
+    auth = {"Authorization": f"Bearer {token}"}
+    try:
+        async with httpx.AsyncClient(base_url=direct_url, headers=auth) as a, \
+                httpx.AsyncClient(base_url=buffered_url, headers=auth) as b:
+            await wait_ready(a)
+            await wait_ready(b)
+
+            print("Authentication:")
+            response = await a.get("/api/report/stream", headers={"Authorization": ""})
+            check("no token is rejected", response.status_code == 401, response.status_code)
+
+            print("Fan-out across workers:")
+            on_a, on_b = Stream(a), Stream(b)
+            ready = await on_a.until(lambda: on_a.of("ready")) and await on_b.until(lambda: on_b.of("ready"))
+            check("both streams open with a ready event", ready)
+            await submit(a, 1, rating=5)
+            await submit(b, 2, rating=3)
+            await submit(b, 3, rating=1)
+            got = await on_a.until(lambda: len(on_a.of("feedback")) == 3) and \
+                await on_b.until(lambda: len(on_b.of("feedback")) == 3)
+            check("every submission reaches both workers' clients", got,
+                  f"{len(on_a.of('feedback'))} and {len(on_b.of('feedback'))}")
+            check("both workers number the events the same way",
+                  [e[1] for e in on_a.of("feedback")] == [e[1] for e in on_b.of("feedback")])
+            first = on_a.of("feedback")[0][2]
+            check("delta carries the row and its counters",
+                  first["feedback"]["name"] == "Stream 1" and first["feedback"]["id"] is not None
+                  and first["delta"] == {"count": 1, "rating_sum": 5.0, "distribution": {"5": 1},
+                                          "histogram": {"5": 1}}, first)
+            buffered_row = next(e[2] for e in on_a.of("feedback") if e[2]["feedback"]["name"] == "Stream 3")
+            check("write-buffered rows are published after their batch commits",
+                  buffered_row["feedback"]["id"] is None and buffered_row["delta"]["distribution"] == {"1": 1})
+
+            print("Heartbeats and stream lifetime:")
+            await asyncio.sleep(1.5)
+            check("idle stream gets heartbeats", on_a.pings >= 1, f"{on_a.pings} pings")
+            await on_a.until(lambda: on_a.closed_after is not None, timeout=MAX_SECONDS + 2)
+            check(f"stream closes after REPORT_STREAM_MAX_SECONDS ({MAX_SECONDS}s)",
+                  on_a.closed_after is not None and MAX_SECONDS - 0.5 < on_a.closed_after < MAX_SECONDS + 1.5,
+                  on_a.closed_after and f"{on_a.closed_after:.1f}s")
+            await on_b.close()
+
+            print("Reconnect with Last-Event-ID:")
+            last_seen = on_a.of("feedback")[0][1]
+            resumed = Stream(b, last_seen)
+            got = await resumed.until(lambda: len(resumed.of("feedback")) == 2)
+            check("replays the events after the given id, on the other worker", got,
+                  [e[2]["feedback"]["name"] for e in resumed.of("feedback")])
+            await resumed.close()
+            offline = on_a.of("feedback")[-1][1]
+            await submit(a, 4)
+            await submit(a, 5)
+            resumed = Stream(b, offline)
+            got = await resumed.until(lambda: len(resumed.of("feedback")) == 2)
+            check("missed while disconnected: replayed on reconnect", got,
+                  [e[2]["feedback"]["name"] for e in resumed.of("feedback")])
+            await submit(a, 6)
+            got = await resumed.until(lambda: len(resumed.of("feedback")) == 3)
+            check("then continues live without gaps or repeats", got and
+                  [e[2]["feedback"]["name"] for e in resumed.of("feedback")] == ["Stream 4", "Stream 5", "Stream 6"])
+            await resumed.close()
+            unknown = Stream(a, "1:999999999")
+            got = await unknown.until(lambda: unknown.of("reset"))
+            check("unknown id gets a reset", got)
+            await unknown.close()
+
+            stats = (await a.get("/api/stats")).json()["report_stream"]
+            print(f"/api/stats report_stream: {stats}")
+    finally:
+        for process in (direct, buffered):
+            process.terminate()
+            process.wait(10)
+        log.close()
+
+
+async def check_in_process(check):
+    from app.report_stream import EventLog, ReportStream, feedback_event
+    from app.responses import dumps
+
+    print("Slow client (in process):")
+    stream = ReportStream(EventLog(os.path.join(WORKDIR, "slow.log"), 1024 * 1024), poll_seconds=0.01, client_buffer=5)
+    slow = stream.subscribe()
+    row = {"name": "Slow", "email": "slow@example.com", "rating": 4.0, "description": None,
+           "created_at": datetime(2026, 1, 1)}
+    for _ in range(20):
+        stream.publish_feedback([row])
+    await asyncio.sleep(0.1)
+    frames = []
+    while not slow.queue.empty():
+        frames.append(slow.queue.get_nowait())
+    check("queue never holds more than the client buffer", len(frames) <= 5, f"{len(frames)} frames")
+    check("the slow client is sent a reset instead", any(b"event: reset" in frame for frame in frames))
+    stream.close()
+
+    print("Log rotation (in process):")
+    # Rotates once, after the 9th event; the 3 after it go to a new file
+    line_bytes = len(dumps(feedback_event(row))) + 1
+    stream = ReportStream(EventLog(os.path.join(WORKDIR, "rotate.log"), line_bytes * 8 + 1),
+                          poll_seconds=0.01, client_buffer=100)
+    watcher = stream.subscribe()
+    await asyncio.sleep(0.05)
+    ids = []
+    for _ in range(12):
+        stream.publish_feedback([row])
+        await asyncio.sleep(0.03)
+        while not watcher.queue.empty():
+            frame = watcher.queue.get_nowait()
+            if b"event: feedback" in frame:
+                ids.append(frame.split(b"\n")[0][4:].decode())
+    files = list(dict.fromkeys(event_id.split(":")[0] for event_id in ids))
+    check("every event delivered across the rotation", len(ids) == 12 and len(files) == 2,
+          f"{len(ids)} events in {len(files)} files")
+    resumed = stream.subscribe(ids[5])
+    replayed = []
+    while not resumed.queue.empty():
+        replayed.append(resumed.queue.get_nowait().split(b"\n")[0][4:].decode())
+    check("resume replays from the previous file into the current one", replayed == ids[6:],
+          f"{len(replayed)} replayed")
+    stream.close()
+
+
+def main():
+    from app import migrations
+
+    migrations.upgrade(log=lambda message: None)
+    ok = True
+
+    def check(label, condition, detail=""):
+        nonlocal ok
+        ok = ok and bool(condition)
+        print(f"  {'ok  ' if condition else 'FAIL'} {label}{f' ({detail})' if detail != '' else ''}")
+
+    asyncio.run(check_servers(check))
+    asyncio.run(check_in_process(check))
+    print("\nPASS" if ok else "\nFAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
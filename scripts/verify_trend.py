@@ -0,0 +1,130 @@
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def seed(rows, days, seed_value):
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import Feedback, utc_now
+    from app import rollups
+
+    rng = random.Random(seed_value)
+    db = SessionLocal()
+    try:
+        now = utc_now()
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "name": "Trend", "email": f"trend{i % 1000}@example.com",
+                "rating": rng.randint(1, 10) / 2, "description": None,
+                "ip_address": "127.0.0.1", "screenshot": None,
+                "created_at": now - timedelta(seconds=rng.randrange(days * 86400)),
+            })
+            if len(batch) == 10000:
+                db.execute(insert(Feedback), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Feedback), batch)
+        rollups.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def reference(db, payload):
+    """Bucket every row in Python with zoneinfo, the slow and obvious way."""
+    from app.models import Feedback
+    from app.trend import _bucket_floor
+
+    tz = ZoneInfo(payload["timezone"])
+    start = datetime.fromisoformat(payload["start"]).astimezone(timezone.utc).replace(tzinfo=None)
+    end = datetime.fromisoformat(payload["end"]).astimezone(timezone.utc).replace(tzinfo=None)
+    counts = {}
+    for created_at, rating in db.query(Feedback.created_at, Feedback.rating).filter(
+            Feedback.created_at >= start, Feedback.created_at < end):
+        local = created_at.replace(tzinfo=timezone.utc).astimezone(tz)
+        key = _bucket_floor(local.date(), payload["granularity"])
+        count, total = counts.get(key, (0, 0.0))
+        counts[key] = (count + 1, total + rating)
+    return counts
+
+
+def check(db, granularity, tz_name, start, end, use_rollups):
+    from app.trend import build_trend
+
+    build = build_trend(db, granularity, start, end, tz_name, use_rollups=use_rollups)
+    payload = build.payload
+    expected = reference(db, payload)
+    ok = True
+    for bucket in payload["buckets"]:
+        day = datetime.fromisoformat(bucket["start"]).date()
+        count, total = expected.pop(day, (0, 0.0))
+        avg = round(total / count, 2) if count else None
+        if (bucket["count"] != count or bucket["avg_rating"] != avg or sum(bucket["distribution"].values()) != count
+                or sum(bucket["histogram"].values()) != count):
+            ok = False
+            print(f"    mismatch at {bucket['start']}: got {bucket['count']}/{bucket['avg_rating']}, expected {count}/{avg}")
+    if expected:
+        ok = False
+        print(f"    rows outside the returned buckets: {sorted(expected)[:5]}")
+    print(f"  {granularity:<6} {tz_name:<20} {payload['source']:<8} {len(payload['buckets']):>4} buckets "
+          f"{build.elapsed_ms:8.1f} ms  {'ok' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check /api/report/trend bucketing and time multi-year ranges")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='csat-trend-')}/trend.db"
+    from app import migrations
+    from app.database import SessionLocal
+    from app.trend import build_trend
+
+    migrations.upgrade(log=lambda message: None)
+    seed(args.rows, args.days, args.seed)
+
+    db = SessionLocal()
+    ok = True
+    try:
+        now = datetime.now(timezone.utc)
+        # Covers both US DST transitions, a half-hour zone and a southern-hemisphere zone
+        print("Bucketing vs per-row zoneinfo reference:")
+        for tz_name in ("UTC", "America/New_York", "Asia/Kolkata", "Australia/Sydney"):
+            for granularity in ("day", "week", "month"):
+                start = now - timedelta(days=400 if granularity != "day" else 120)
+                ok = check(db, granularity, tz_name, start, now, use_rollups=False) and ok
+        print("Rollup source (UTC) vs reference:")
+        for granularity in ("day", "week", "month"):
+            ok = check(db, granularity, "UTC", now - timedelta(days=400), now, use_rollups=True) and ok
+
+        print(f"Full {args.days}-day range:")
+        start = now - timedelta(days=args.days)
+        for granularity, tz_name, use_rollups in (
+                ("day", "UTC", True), ("week", "UTC", True), ("month", "UTC", True),
+                ("day", "America/New_York", False), ("month", "America/New_York", False)):
+            started = time.perf_counter()
+            build = build_trend(db, granularity, start, now, tz_name, use_rollups=use_rollups)
+            print(f"  {granularity:<6} {tz_name:<20} {build.payload['source']:<8} "
+                  f"{len(build.payload['buckets']):>4} buckets {(time.perf_counter() - started) * 1000:8.1f} ms")
+    finally:
+        db.close()
+    print("\nPASS" if ok else "\nFAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+
+import io
+import os
+import sys
+import stat
+import time
+import tempfile
+from datetime import timedelta
+
+# Ensure we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Exercise the LOCAL_STORAGE_PATH fallback, never a real bucket
+os.environ["LOCAL_STORAGE_PATH"] = tempfile.mkdtemp(prefix="csat-screenshots-")
+os.environ.pop("AWS_BUCKET_NAME", None)
+
+from app.database import SessionLocal
+from app.models import Feedback, utc_now
+from app.storage import S3Client
+from app.uploads import UploadQueue, UploadJob, SCREENSHOT_PENDING, SCREENSHOT_FAILED
+
+
+class FakeUpload:
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.file = io.BytesIO(content)
+
+
+def verify():
+    queue = UploadQueue(S3Client(), workers=2, maxsize=4, spool_path=tempfile.mkdtemp(prefix="csat-spool-"))
+    db = SessionLocal()
+    ids = []
+    try:
+        for i in range(10):
+            fb = Feedback(name="Upload", email="upload@example.com", rating=5,
+                          screenshot=SCREENSHOT_PENDING, created_at=utc_now())
+            db.add(fb)
+            db.commit()
+            ids.append(fb.id)
+
+            job = UploadJob(fb.id, queue.spool(FakeUpload(f"verify-{i}.png", b"png" * 1000)),
+                            f"verify-{i}.png", "image/png")
+            if not queue.submit(job):
+                queue.run_inline(job)
+
+        queue.drain()
+        db.expire_all()
+        rows = db.query(Feedback).filter(Feedback.id.in_(ids)).all()
+        pending = [f.id for f in rows if f.screenshot == SCREENSHOT_PENDING]
+        print(f"Uploaded: {len(rows) - len(pending)}/{len(rows)}")
+        print(f"Queue stats: {queue.stats()}")
+        if pending:
+            print(f"Still pending: {pending}")
+
+        # A worker dies with jobs queued: the next one recovers them from the spool
+        spool_path = os.path.join(tempfile.mkdtemp(prefix="csat-spool-"), "spool")
+        crashed = UploadQueue(S3Client(), workers=1, spool_path=spool_path)
+        lost = []
+        for state in (SCREENSHOT_PENDING, SCREENSHOT_FAILED, SCREENSHOT_PENDING):
+            fb = Feedback(name="Upload", email="upload@example.com", rating=5, screenshot=state,
+                          created_at=utc_now() - timedelta(hours=2))
+            db.add(fb)
+            db.commit()
+            lost.append(fb.id)
+        for feedback_id in lost[:2]:
+            job = UploadJob(None, crashed.spool(FakeUpload("lost.png", b"png" * 1000)), "lost.png", "image/png")
+            crashed.assign(job, feedback_id)
+        orphan = crashed.spool(FakeUpload("orphan.png", b"png"))
+        modes = {oct(stat.S_IMODE(os.stat(path).st_mode))
+                 for path in [spool_path] + [os.path.join(spool_path, name) for name in os.listdir(spool_path)]}
+        print(f"Spool modes: {sorted(modes)}")
+        two_hours_ago = time.time() - 7200
+        for name in os.listdir(spool_path):
+            os.utime(os.path.join(spool_path, name), (two_hours_ago, two_hours_ago))
+
+        restarted = UploadQueue(S3Client(), workers=1, spool_path=spool_path)
+        queued = restarted.recover()
+        restarted.drain()
+        db.expire_all()
+        states = [db.get(Feedback, feedback_id).screenshot for feedback_id in lost]
+        recovered = queued == 2 and states[2] == SCREENSHOT_FAILED and all(
+            state not in (SCREENSHOT_PENDING, SCREENSHOT_FAILED) for state in states[:2])
+        print(f"Recovered after a crash: {'ok' if recovered else 'FAIL'} ({queued} queued, states {states})")
+        print(f"Spool emptied: {'ok' if not os.listdir(spool_path) and not os.path.exists(orphan) else 'FAIL'}")
+        ids += lost
+
+        # Clean up
+        db.query(Feedback).filter(Feedback.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        print(f"Verification failed: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    verify()
@@ -1,36 +1,45 @@
 
 import os
 import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+import argparse
 import pandas as pd
 
 # Ensure we can import from app
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-load_dotenv()
+from app.database import SessionLocal
+from app.exporter import EXPORT_COLUMNS, iter_chunks
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+PAGE_SIZE = 1000
 
-def view_data():
+
+def view_data(limit):
+    db = SessionLocal()
     try:
-        engine = create_engine(DATABASE_URL)
-        with engine.connect() as connection:
-            df = pd.read_sql("SELECT * FROM feedback", connection)
-            
-            if df.empty:
-                print("No feedback data found.")
-            else:
+        # Page through the table (see app/exporter.py) instead of loading it
+        # whole, and stop once `limit` rows are printed
+        shown = 0
+        for chunk in iter_chunks(db, chunk_size=min(limit, PAGE_SIZE) if limit else PAGE_SIZE):
+            rows = chunk[:limit - shown] if limit else chunk
+            if not shown:
                 print("\n=== Feedback Data ===\n")
-                # Adjust display options for better readability
-                pd.set_option('display.max_columns', None)
-                pd.set_option('display.width', 1000)
-                pd.set_option('display.max_colwidth', 50)
-                print(df)
-            
+            df = pd.DataFrame(rows, columns=EXPORT_COLUMNS)
+            print(df.to_string(index=False, header=not shown, max_colwidth=50))
+            shown += len(rows)
+            if limit and shown >= limit:
+                break
+
+        if not shown:
+            print("No feedback data found.")
     except Exception as e:
         print(f"Error fetching data: {e}")
+    finally:
+        db.close()
+
 
 if __name__ == "__main__":
-    view_data()
+    parser = argparse.ArgumentParser(
+        description="Print feedback rows, oldest first (scripts/export_feedback.py writes full dumps)")
+    parser.add_argument("--limit", type=int, default=100, help="rows to print, 0 for all")
+    args = parser.parse_args()
+    view_data(args.limit)
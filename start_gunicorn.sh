@@ -4,5 +4,14 @@
 # Workers: 4 (adjust based on CPU cores)
 # Module: app.main:app
 
+echo "Applying database migrations..."
+poetry run python scripts/migrate.py || exit 1
+
+# Workers write metrics here so /metrics adds up all of them; stale files
+# from a previous run would be counted too
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/csat-prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 echo "Starting Gunicorn on port 8000..."
 poetry run gunicorn app.main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind 127.0.0.1:8000